@@ -1,11 +1,9 @@
 from langgraph.graph import StateGraph, START, END
 from langgraph.graph.state import CompiledStateGraph
 from langchain_core.messages import ToolMessage
-from langgraph.checkpoint.memory import InMemorySaver
+from src.config.checkpointer import checkpointer
 from .func import collection_info_agent, create_prompt, save_prompt, State
 
-checkpointer = InMemorySaver()
-
 
 class CustomChatBot:
     def __init__(self):
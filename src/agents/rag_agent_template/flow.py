@@ -1,17 +1,24 @@
+import os
 from langgraph.graph import StateGraph, START, END
 from .func import (
     State,
     trim_history,
     execute_tool,
     generate_answer,
+    prefetch_retrieval,
+    latest_user_text,
 )
 from langgraph.graph.state import CompiledStateGraph
-from langgraph.checkpoint.memory import InMemorySaver
+from src.config.checkpointer import checkpointer
+
+
+SPECULATIVE_RETRIEVAL = os.getenv("SPECULATIVE_RETRIEVAL", "false").lower() == "true"
 
 
 class RAGAgentTemplate:
-    def __init__(self):
+    def __init__(self, speculative_retrieval: bool = SPECULATIVE_RETRIEVAL):
         self.builder = StateGraph(State)
+        self.speculative_retrieval = speculative_retrieval
 
     @staticmethod
     def should_continue(state: State):
@@ -21,14 +28,33 @@ class RAGAgentTemplate:
             return "execute_tool"
         return END
 
+    @staticmethod
+    def should_prefetch(state: State):
+        """Start retrieval alongside the first LLM call for knowledge-base bots."""
+        if "retrieve_document" in (state.get("tools") or []) and latest_user_text(
+            state["messages"]
+        ):
+            return ["generate_answer", "prefetch_retrieval"]
+        return ["generate_answer"]
+
     def node(self):
         self.builder.add_node("trim_history", trim_history)
         self.builder.add_node("generate_answer", generate_answer)
         self.builder.add_node("execute_tool", execute_tool)
+        if self.speculative_retrieval:
+            self.builder.add_node("prefetch_retrieval", prefetch_retrieval)
 
     def edge(self):
         self.builder.add_edge(START, "trim_history")
-        self.builder.add_edge("trim_history", "generate_answer")
+        if self.speculative_retrieval:
+            self.builder.add_conditional_edges(
+                "trim_history",
+                self.should_prefetch,
+                ["generate_answer", "prefetch_retrieval"],
+            )
+            self.builder.add_edge("prefetch_retrieval", END)
+        else:
+            self.builder.add_edge("trim_history", "generate_answer")
         self.builder.add_conditional_edges(
             "generate_answer",
             self.should_continue,
@@ -44,7 +70,7 @@ class RAGAgentTemplate:
         self.node()
         self.edge()
 
-        return self.builder.compile(checkpointer=InMemorySaver())
+        return self.builder.compile(checkpointer=checkpointer)
 
 
 rag_agent_template_agent = RAGAgentTemplate()()
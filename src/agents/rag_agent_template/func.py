@@ -1,17 +1,51 @@
 from typing import TypedDict, Optional, List
-from langchain_core.messages import AnyMessage, ToolMessage
+from langchain_core.messages import AnyMessage, ToolMessage, HumanMessage
 from langgraph.graph.message import add_messages
 from typing import Sequence, Annotated
 from langchain_core.messages import RemoveMessage
 from langchain_core.documents import Document
-from .tools import retrieve_document, python_repl, duckduckgo_search
+from .tools import retrieve_document, python_repl, duckduckgo_search, search_documents
 from src.config.llm import get_llm
 from .prompt import template_prompt
 from src.utils.helper import trim_messages_function
 from langchain_core.runnables.config import RunnableConfig
 from src.utils.logger import logger
+from src.config.monitoring import (
+    observe_tool_duration,
+    increment_speculative_prefetch,
+    observe_speculative_time_saved,
+)
+from src.utils.cache import LRUCache
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+import asyncio
+import hashlib
+import os
+import re
+import time
 
 tools = [retrieve_document, python_repl, duckduckgo_search]
+tool_name_to_func = {tool.name: tool for tool in tools}
+
+TOOL_EXECUTOR_MAX_WORKERS = int(os.getenv("TOOL_EXECUTOR_MAX_WORKERS", "8"))
+# Sync-only tools (python_repl, duckduckgo_search) run here instead of on the event loop
+tool_executor = ThreadPoolExecutor(
+    max_workers=TOOL_EXECUTOR_MAX_WORKERS, thread_name_prefix="rag-tool"
+)
+
+# Minimum share of the tool query's words found in the user query to reuse a prefetch
+SPECULATIVE_MATCH_THRESHOLD = float(os.getenv("SPECULATIVE_MATCH_THRESHOLD", "0.6"))
+
+LLM_CHAIN_CACHE_SIZE = int(os.getenv("LLM_CHAIN_CACHE_SIZE", "256"))
+llm_chain_cache = LRUCache(LLM_CHAIN_CACHE_SIZE, name="llm_chain")
+system_prompt_cache = LRUCache(LLM_CHAIN_CACHE_SIZE, name="system_prompt")
+
+TOOL_INSTRUCTIONS = {
+    "retrieve_document": "Sử dụng tool `retrieve_document` để truy xuất tài liệu để bổ sung thông tin cho câu trả lời nếu câu hỏi liên quan đến domain knowledge của bạn",
+    "python_repl": "Sử dụng tool `python_repl` để thực hiện các tác vụ liên quan đến tính toán phức tạp",
+    "duckduckgo_search": "Sử dụng tool `duckduckgo_search` để tìm kiếm thông tin trên internet",
+}
+LANGUAGE_INSTRUCTION = "Note: Ngôn ngữ phản hồi/call tool dựa trên ngôn ngữ đầu vào của người dùng. Ví dụ: nếu người dùng nói tiếng Việt thì phản hồi/call tool cũng phải là tiếng Việt. Nếu người dùng nói tiếng Anh thì phản hồi/call tool cũng phải là tiếng Anh."
 
 
 class State(TypedDict):
@@ -20,10 +54,19 @@ class State(TypedDict):
     tools: Optional[List[str]]
     selected_ids: Optional[List[str]]
     selected_documents: Optional[List[Document]]
+    prefetch_query: Optional[str]
+    prefetch_result: Optional[dict]
+    prefetch_duration: Optional[float]
 
 
 def trim_history(state: State):
     history = state.get("messages", [])
+    # A prefetch from an earlier turn must never answer this one
+    reset_prefetch = {
+        "prefetch_query": None,
+        "prefetch_result": None,
+        "prefetch_duration": None,
+    }
 
     if len(history) > 20:
         num_to_remove = len(history) - 20
@@ -34,46 +77,136 @@ def trim_history(state: State):
             "messages": remove_messages,
             "selected_ids": [],
             "selected_documents": [],
+            **reset_prefetch,
         }
 
-    return {}
+    return reset_prefetch
+
+
+def latest_user_text(messages: Sequence[AnyMessage]) -> str:
+    for message in reversed(messages):
+        if isinstance(message, HumanMessage):
+            if isinstance(message.content, str):
+                return message.content
+            return " ".join(
+                part.get("text", "")
+                for part in message.content
+                if isinstance(part, dict) and part.get("type") == "text"
+            )
+    return ""
+
+
+def query_overlap(user_query: str, tool_query: str) -> float:
+    """Share of the tool query's words that already appear in the user query."""
+    user_terms = set(re.findall(r"\w+", user_query.lower()))
+    tool_terms = set(re.findall(r"\w+", tool_query.lower()))
+    if not tool_terms:
+        return 0.0
+    return len(user_terms & tool_terms) / len(tool_terms)
+
+
+async def prefetch_retrieval(state: State, config: RunnableConfig):
+    """Retrieve on the raw user query while the first generate_answer call runs."""
+    query = latest_user_text(state["messages"])
+    bot_id = config.get("configurable", {}).get("bot_id")
+    if not query or not bot_id:
+        return {}
+    increment_speculative_prefetch("started")
+    start_time = time.time()
+    try:
+        result = await search_documents(query, bot_id)
+    except Exception as e:
+        logger.warning(f"Speculative retrieval failed: {str(e)}")
+        return {}
+    return {
+        "prefetch_query": query,
+        "prefetch_result": result,
+        "prefetch_duration": time.time() - start_time,
+    }
+
+
+def take_prefetch(state: State, tool_query: str) -> Optional[dict]:
+    """Return the prefetched retrieval if it was made for a similar query."""
+    prefetch_query = state.get("prefetch_query")
+    if not prefetch_query or state.get("prefetch_result") is None:
+        return None
+    if query_overlap(prefetch_query, tool_query or "") < SPECULATIVE_MATCH_THRESHOLD:
+        increment_speculative_prefetch("miss")
+        return None
+    increment_speculative_prefetch("hit")
+    observe_speculative_time_saved(state.get("prefetch_duration") or 0.0)
+    return state["prefetch_result"]
 
 
-def execute_tool(state: State):
+async def run_tool(tool, tool_input, config: RunnableConfig):
+    """Await async tools directly and push sync-only tools to the bounded pool."""
+    if getattr(tool, "coroutine", None):
+        return await tool.ainvoke(tool_input, config)
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        tool_executor, partial(tool.invoke, tool_input, config)
+    )
+
+
+async def call_tool(tool_call: dict, state: State, config: RunnableConfig):
+    tool_name = tool_call["name"]
+    tool_args = tool_call["args"]
+    tool_func = tool_name_to_func.get(tool_name)
+    if not tool_func:
+        return None
+    if tool_name == "retrieve_document":
+        prefetched = take_prefetch(state, tool_args.get("query"))
+        if prefetched is not None:
+            return prefetched
+
+    start_time = time.time()
+    tool_status = "success"
+    try:
+        if tool_name == "retrieve_document":
+            return await run_tool(tool_func, tool_args.get("query"), config)
+        return await run_tool(tool_func, tool_args, config)
+    except Exception as e:
+        tool_status = "error"
+        logger.error(f"Error executing tool {tool_name}: {str(e)}")
+        return f"Error: {repr(e)}\n please fix your mistakes."
+    finally:
+        duration = time.time() - start_time
+        logger.info(f"Tool {tool_name} finished in {duration:.3f}s")
+        observe_tool_duration(tool_name, duration, status=tool_status)
+
+
+async def execute_tool(state: State, config: RunnableConfig):
     tool_calls = state["messages"][-1].tool_calls
-    tool_name_to_func = {tool.name: tool for tool in tools}
+    tool_responses = await asyncio.gather(
+        *(call_tool(tool_call, state, config) for tool_call in tool_calls)
+    )
 
     selected_ids = []
     selected_documents = []
     tool_messages = []
-    for tool_call in tool_calls:
-        tool_name = tool_call["name"]
-        tool_args = tool_call["args"]
-        tool_id = tool_call["id"]
-
-        tool_func = tool_name_to_func.get(tool_name)
-        if tool_func:
-            if tool_name == "retrieve_document":
-                documents = tool_func.invoke(tool_args.get("query"))
-                documents = dict(documents)
-                context_str = documents.get("context_str", "")
-                selected_documents = documents.get("selected_documents", [])
-                selected_ids = documents.get("selected_ids", [])
-                if documents:
-                    tool_messages.append(
-                        ToolMessage(
-                            tool_call_id=tool_id,
-                            content=context_str,
-                        )
-                    )
-                continue
-            tool_response = tool_func.invoke(tool_args)
+    for tool_call, tool_response in zip(tool_calls, tool_responses):
+        if tool_response is None:
+            continue
+        if tool_call["name"] == "retrieve_document" and isinstance(
+            tool_response, dict
+        ):
+            documents = dict(tool_response)
+            context_str = documents.get("context_str", "")
+            selected_documents = documents.get("selected_documents", [])
+            selected_ids = documents.get("selected_ids", [])
             tool_messages.append(
                 ToolMessage(
-                    tool_call_id=tool_id,
-                    content=tool_response,
+                    tool_call_id=tool_call["id"],
+                    content=context_str,
                 )
             )
+            continue
+        tool_messages.append(
+            ToolMessage(
+                tool_call_id=tool_call["id"],
+                content=tool_response,
+            )
+        )
 
     return {
         "selected_ids": selected_ids,
@@ -82,38 +215,59 @@ def execute_tool(state: State):
     }
 
 
+def api_key_fingerprint(api_key: Optional[str]) -> Optional[str]:
+    return hashlib.sha256(api_key.encode()).hexdigest()[:16] if api_key else None
+
+
+def get_llm_call(
+    model_name: str, api_key: Optional[str], reasoning: bool, tool_names: tuple
+):
+    """Return a cached `template_prompt | llm.bind_tools(...)` runnable."""
+    key = (model_name, api_key_fingerprint(api_key), reasoning, tool_names)
+    llm_call = llm_chain_cache.get(key)
+    if llm_call is None:
+        tool_functions = [tool_name_to_func[name] for name in tool_names]
+        llm_call = template_prompt | get_llm(
+            model_name, api_key, reasoning=reasoning
+        ).bind_tools(tool_functions)
+        llm_chain_cache.set(key, llm_call)
+    return llm_call
+
+
+def build_system_prompt(prompt: str, tool_names: tuple) -> str:
+    """Return the bot prompt with tool and language instructions appended."""
+    key = (hashlib.sha256(prompt.encode()).hexdigest(), tool_names)
+    system_prompt = system_prompt_cache.get(key)
+    if system_prompt is None:
+        system_prompt = (
+            prompt
+            + "".join(TOOL_INSTRUCTIONS.get(name, "") for name in tool_names)
+            + LANGUAGE_INSTRUCTION
+        )
+        system_prompt_cache.set(key, system_prompt)
+    return system_prompt
+
+
 async def generate_answer(state: State, config: RunnableConfig):
     configuration = config.get("configurable", {})
     messages = state["messages"]
-    tool_names = state.get("tools", [])
     prompt = state["prompt"]
     model_name = configuration.get("model_name", "gemini-2.0-flash")
     reasoning = configuration.get("reasoning", False)
     logger.info(f"model_name: {model_name}")
     api_key = configuration.get("api_key", None)
-    tool_name_to_func = {tool.name: tool for tool in tools}
-    tool_functions = [
-        tool_name_to_func[name] for name in tool_names if name in tool_name_to_func
-    ]
-
-    llm_call = template_prompt | get_llm(
-        model_name, api_key, reasoning=reasoning
-    ).bind_tools(tool_functions)
-
-    if tool_functions:
-        for tool in tool_functions:
-            if tool.name == "retrieve_document":
-                prompt += "Sử dụng tool `retrieve_document` để truy xuất tài liệu để bổ sung thông tin cho câu trả lời nếu câu hỏi liên quan đến domain knowledge của bạn"
-            if tool.name == "python_repl":
-                prompt += "Sử dụng tool `python_repl` để thực hiện các tác vụ liên quan đến tính toán phức tạp"
-            if tool.name == "duckduckgo_search":
-                prompt += "Sử dụng tool `duckduckgo_search` để tìm kiếm thông tin trên internet"
-    prompt += "Note: Ngôn ngữ phản hồi/call tool dựa trên ngôn ngữ đầu vào của người dùng. Ví dụ: nếu người dùng nói tiếng Việt thì phản hồi/call tool cũng phải là tiếng Việt. Nếu người dùng nói tiếng Anh thì phản hồi/call tool cũng phải là tiếng Anh."
+    tool_names = tuple(
+        dict.fromkeys(
+            name for name in state.get("tools", []) or [] if name in tool_name_to_func
+        )
+    )
+
+    llm_call = get_llm_call(model_name, api_key, reasoning, tool_names)
 
     response = await llm_call.ainvoke(
         {
             "messages": trim_messages_function(messages),
-            "prompt": prompt,
+            "prompt": build_system_prompt(prompt, tool_names),
         }
     )
     return {"messages": response}
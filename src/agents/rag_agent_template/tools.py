@@ -1,6 +1,6 @@
 from langchain_core.tools import tool
-from src.config.vector_store import test_rag_vector_store
-from src.utils.helper import convert_list_context_source_to_str
+from src.config.vector_store import rag_vector_store
+from src.utils.context_assembler import assemble_context
 from src.utils.logger import logger
 from langchain_core.runnables import RunnableConfig
 from langchain_experimental.utilities import PythonREPL
@@ -12,8 +12,26 @@ duckduckgo_search = DuckDuckGoSearchRun()
 python_exec = PythonREPL()
 
 
+async def search_documents(query: str, bot_id: str) -> dict:
+    """Retrieve the knowledge-base chunks of a bot and format them as tool context."""
+    scored_documents = await rag_vector_store.search_with_scores(
+        query, filter={"bot_id": bot_id}
+    )
+    documents = [document for document, _ in scored_documents]
+    selected_documents = [doc.__dict__ for doc in documents]
+    selected_ids = [doc["id"] for doc in selected_documents]
+    context = assemble_context(scored_documents)
+
+    return {
+        "context_str": context.context_str,
+        "context_tokens_saved": context.tokens_saved,
+        "selected_documents": selected_documents,
+        "selected_ids": selected_ids,
+    }
+
+
 @tool
-def retrieve_document(query: str, config: RunnableConfig):
+async def retrieve_document(query: str, config: RunnableConfig):
     """Ưu tiên truy xuất tài liệu từ vector store nếu câu hỏi liên quan đến vai trò của chatbot.
 
     Args:
@@ -26,20 +44,7 @@ def retrieve_document(query: str, config: RunnableConfig):
     if not bot_id:
         logger.error("Bot ID is not found")
         return {"context_str": "", "selected_documents": [], "selected_ids": []}
-    retriever = test_rag_vector_store.as_retriever(
-        search_type="similarity_score_threshold",
-        search_kwargs={"k": 5, "score_threshold": 0.3},
-    )
-    documents = retriever.invoke(query, filter={"bot_id": bot_id})
-    selected_documents = [doc.__dict__ for doc in documents]
-    selected_ids = [doc["id"] for doc in selected_documents]
-    context_str = convert_list_context_source_to_str(documents)
-
-    return {
-        "context_str": context_str,
-        "selected_documents": selected_documents,
-        "selected_ids": selected_ids,
-    }
+    return await search_documents(query, bot_id)
 
 
 @tool
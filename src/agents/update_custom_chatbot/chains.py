@@ -1,6 +1,8 @@
 from langchain_core.prompts import ChatPromptTemplate
 from src.config.llm import get_llm
 from src.config.mongo import bot_crud
+from src.config.semantic_cache import semantic_answer_cache
+from src.config.bot_cache import bot_config_cache
 from bson import ObjectId
 from src.utils.logger import logger, get_date_time
 from langchain_core.runnables.config import RunnableConfig
@@ -154,6 +156,8 @@ async def update_prompt(name: str, prompt: str, config: RunnableConfig):
                 {"$set": update_data},
                 upsert=True,
             )
+            bot_config_cache.invalidate(bot_id)
+            await semantic_answer_cache.invalidate_shared(bot_id)
         return "Cập nhật chatbot thành công với thông tin mới"
     except Exception as e:
         logger.error(f"Error updating prompt: {e}")
@@ -5,7 +5,7 @@ from .func import (
     generate_answer,
 )
 from langgraph.graph.state import CompiledStateGraph
-from langgraph.checkpoint.memory import InMemorySaver
+from src.config.checkpointer import checkpointer
 
 
 class UpdateCustomChatBot:
@@ -41,7 +41,7 @@ class UpdateCustomChatBot:
         self.node()
         self.edge()
 
-        return self.builder.compile(checkpointer=InMemorySaver())
+        return self.builder.compile(checkpointer=checkpointer)
 
 
 update_custom_chatbot = UpdateCustomChatBot()()
@@ -1,3 +1,4 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, APIRouter
 from fastapi.middleware.cors import CORSMiddleware
 from src.apis.routers.rag_agent_template import router as router_rag_agent_template
@@ -16,6 +17,10 @@ from src.apis.routers.prompt_optimization_router import router as prompt_optimiz
 # Monitoring imports
 from src.config.monitoring import setup_monitoring
 from src.apis.middlewares.monitoring_middleware import MonitoringMiddleware
+from src.config.bot_cache import bot_config_cache
+from src.config.ingestion_jobs import ingestion_jobs
+from src.data_preprocessing.file_ingestion import run_ingestion_job
+from src.data_preprocessing.parsing import shutdown_parse_pool
 
 api_router = APIRouter()
 api_router.include_router(router_rag_agent_template)
@@ -31,10 +36,21 @@ api_router.include_router(api_testing_router)
 api_router.include_router(image_generation_router)
 api_router.include_router(prompt_optimization_router)
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    bot_config_cache.start_watching()
+    ingestion_jobs.start(run_ingestion_job)
+    yield
+    await ingestion_jobs.stop()
+    shutdown_parse_pool()
+    await bot_config_cache.stop_watching()
+
+
 def create_app():
     app = FastAPI(
         docs_url="/docs",
         title="AI Service ABAOXOMTIEU",
+        lifespan=lifespan,
     )
 
     @app.get("/")
@@ -0,0 +1,41 @@
+from pydantic import Field
+from datetime import datetime
+from typing import Optional
+from .BaseDocument import BaseDocument
+
+
+class Chunk(BaseDocument):
+    chunk_id: str = Field(..., description="ID of the chunk in the vector store")
+    bot_id: str = Field(..., description="ID of the bot owning the chunk")
+    source: Optional[str] = Field(None, description="File the chunk was split from")
+    content_hash: str = Field(..., description="SHA-256 of the chunk text")
+    page: Optional[int] = Field(None, description="Page of the source the chunk is on")
+    start_index: Optional[int] = Field(
+        None, description="Character offset of the chunk in its page or file"
+    )
+
+
+class EmbeddingRoute(BaseDocument):
+    bot_id: str = Field(..., description="ID of the bot the route applies to")
+    model: Optional[str] = Field(
+        None, description="Embedding model serving reads, None for the default"
+    )
+    namespace: Optional[str] = Field(
+        None, description="Vector store namespace serving reads, None for the default"
+    )
+    target_model: Optional[str] = Field(
+        None, description="Model the bot is being re-embedded with"
+    )
+    target_namespace: Optional[str] = Field(
+        None, description="Shadow namespace receiving the re-embedded chunks"
+    )
+    cursor_created_at: Optional[datetime] = Field(
+        None, description="created_at of the last re-embedded registry entry"
+    )
+    cursor_chunk_id: Optional[str] = Field(
+        None, description="chunk_id of the last re-embedded registry entry"
+    )
+    embedded: int = Field(0, description="Chunks re-embedded so far")
+    previous_namespace: Optional[str] = Field(
+        None, description="Namespace served before the last flip, kept until cleanup"
+    )
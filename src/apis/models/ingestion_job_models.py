@@ -0,0 +1,42 @@
+from pydantic import Field
+from datetime import datetime
+from typing import Dict, List, Optional
+from .BaseDocument import BaseDocument
+
+
+class IngestionJob(BaseDocument):
+    key: str = Field(..., description="Hash of bot, file name and content, dedupes retries")
+    bot_id: str = Field(..., description="ID of the bot the file is indexed for")
+    user_id: str = Field(..., description="ID of the user who uploaded the file")
+    filename: str = Field(..., description="Name of the uploaded file or batch")
+    sha256: str = Field(..., description="SHA-256 of the uploaded file or batch")
+    spool_path: str = Field(..., description="Where the upload waits for a worker")
+    host: str = Field(..., description="Host whose spool directory holds the upload")
+    files: Optional[List[Dict]] = Field(
+        None, description="Files of a bulk job with their spool paths and results"
+    )
+    size: int = Field(0, description="Size of the upload in bytes")
+    status: str = Field("queued", description="queued, running, succeeded or failed")
+    stage: str = Field("queued", description="Pipeline step the job is at")
+    attempts: int = Field(0, description="Times a worker has claimed the job")
+    worker: Optional[str] = Field(None, description="Token of the worker running the job")
+    available_at: Optional[datetime] = Field(
+        None, description="Earliest time a worker may claim the job"
+    )
+    lease_until: Optional[datetime] = Field(
+        None, description="Running jobs whose lease expired are claimed again"
+    )
+    started_at: Optional[datetime] = Field(None, description="Start of the last attempt")
+    finished_at: Optional[datetime] = Field(
+        None, description="When the job succeeded or failed for good, expires it"
+    )
+    chunks_total: int = Field(0, description="Chunks the file was split into")
+    chunks_to_embed: int = Field(0, description="New or moved chunks to embed")
+    chunks_processed: int = Field(0, description="Chunks embedded and upserted so far")
+    chunks_per_second: Optional[float] = Field(
+        None, description="Embedding and upsert throughput of the finished run"
+    )
+    diff: Optional[Dict[str, int]] = Field(
+        None, description="Chunks added, updated, unchanged and deleted"
+    )
+    error: Optional[str] = Field(None, description="Error of the last failed attempt")
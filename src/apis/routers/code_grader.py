@@ -24,6 +24,7 @@ import json
 import resource
 import platform
 from loguru import logger
+from src.utils.uploads import UploadTooLarge, receive_uploads
 
 app = FastAPI(title="Code Grader API", version="1.0.0", docs_url="/")
 
@@ -720,17 +721,6 @@ def get_directory_size(directory_path: str) -> int:
     return total_size
 
 
-def validate_upload_size(files: List[UploadFile]) -> tuple[bool, int]:
-    """Validate total size of uploaded files"""
-    total_size = 0
-    for file in files:
-        if hasattr(file, "size") and file.size:
-            total_size += file.size
-        else:
-            return True, 0
-    return total_size <= MAX_TOTAL_SIZE, total_size
-
-
 # Create executor instance
 executor = CodeExecutor()
 
@@ -920,40 +910,22 @@ async def judge_code(
             # Clone repository
             await clone_repo(repo_url, workspace)
         else:
-            # Validate total upload size
-            total_upload_size = 0
-            file_contents = []
-
-            # Pre-read all files to check total size
-            for file in files:
-                content = await file.read()
-                if len(content) > MAX_FILE_SIZE:
-                    raise HTTPException(
-                        status_code=400,
-                        detail=f"File {file.filename} exceeds individual size limit",
-                    )
-
-                total_upload_size += len(content)
-                file_contents.append((file.filename, content))
-
-            # Check total size limit
-            if total_upload_size > MAX_TOTAL_SIZE:
-                raise HTTPException(
-                    status_code=400,
-                    detail=f"Total upload size ({total_upload_size / 1024 / 1024:.2f}MB) exceeds limit ({MAX_TOTAL_SIZE / 1024 / 1024:.2f}MB)",
-                )
+            # Stream uploads once, stopping at the first size limit exceeded
+            try:
+                uploads = await receive_uploads(files, MAX_FILE_SIZE, MAX_TOTAL_SIZE)
+            except UploadTooLarge as e:
+                detail = str(e)
+                if e.filename is not None:
+                    detail = f"File {e.filename} exceeds individual size limit"
+                raise HTTPException(status_code=400, detail=detail)
 
             # Save uploaded files maintaining structure
-            for filename, content in file_contents:
-                # Create file path
-                file_path = os.path.join(workspace, filename)
-
-                # Create directories if needed
-                os.makedirs(os.path.dirname(file_path), exist_ok=True)
-
-                # Write file
-                with open(file_path, "wb") as f:
-                    f.write(content)
+            try:
+                for upload in uploads:
+                    upload.save(os.path.join(workspace, upload.filename))
+            finally:
+                for upload in uploads:
+                    upload.cleanup()
 
         # Execute code with input data
         result = await executor.execute_code(
@@ -962,6 +934,8 @@ async def judge_code(
         logger.info(f"Execution result: {result}")
         return JSONResponse(content=result.model_dump())
 
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -1,7 +1,6 @@
 from fastapi import APIRouter, status, Depends, UploadFile, Form, HTTPException
 from fastapi.responses import JSONResponse, StreamingResponse
 from langchain_core.runnables import RunnableConfig
-import json
 from langchain_core.messages.ai import AIMessageChunk
 from src.utils.logger import logger
 from src.agents.custom_chatbot.flow import custom_chatbot
@@ -11,8 +10,9 @@ from src.apis.models.user_models import User
 from typing import Annotated, List, Optional, Literal
 from src.utils.helper import preprocess_messages
 from src.config.mongo import bot_crud
+from src.config.checkpointer import build_thread_id
 from bson import ObjectId
-import asyncio
+from src.utils.sse import SSEEncoder
 from src.config.monitoring import (
     increment_request_count,
     observe_request_duration,
@@ -27,8 +27,12 @@ user_dependency = Annotated[User, Depends(get_current_user)]
 
 
 async def message_generator(
-    input_graph: dict, config: RunnableConfig, type: Literal["create", "update"]
+    input_graph: dict,
+    config: RunnableConfig,
+    type: Literal["create", "update"],
+    started_at: Optional[float] = None,
 ):
+    encoder = SSEEncoder("/ai/custom_chatbot/update/stream", started_at=started_at)
     try:
         last_output_state = None
 
@@ -45,7 +49,7 @@ async def message_generator(
                             isinstance(message, AIMessageChunk)
                             and metadata.get("langgraph_node") == "execute_tool"
                         ):
-                            yield json.dumps(
+                            for frame in encoder.event(
                                 {
                                     "type": "tools_message",
                                     "content": message.content,
@@ -56,76 +60,68 @@ async def message_generator(
                                             "checkpoint_ns", ""
                                         ),
                                     },
-                                },
-                                ensure_ascii=False,
-                            ) + "\n\n"
+                                }
+                            ):
+                                yield frame
 
                         elif isinstance(message, AIMessageChunk) and metadata[
                             "langgraph_node"
                         ] in ["generate_answer"]:
-                            for char in message.content:
-                                yield json.dumps(
-                                    {
-                                        "type": "message",
-                                        "content": char,
-                                    },
-                                    ensure_ascii=False,
-                                ) + "\n\n"
-                                await asyncio.sleep(0.001)
+                            for frame in encoder.push(message.content):
+                                yield frame
 
                     if event_type == "values":
                         last_output_state = event_message
                 except Exception as e:
                     logger.error(f"Error processing stream event: {str(e)}")
-                    yield json.dumps(
+                    for frame in encoder.event(
                         {
                             "type": "error",
                             "content": "Error processing response " + str(e),
-                        },
-                        ensure_ascii=False,
-                    ) + "\n\n"
+                        }
+                    ):
+                        yield frame
                     return
 
             if last_output_state is None:
                 raise ValueError("No output state received from workflow")
 
             try:
-                final_response = json.dumps(
+                for frame in encoder.event(
                     {
                         "type": "final",
                         "content": {
                             "final_response": last_output_state["messages"][-1].content,
                             "done": last_output_state.get("done", False),
                         },
-                    },
-                    ensure_ascii=False,
-                )
-                yield final_response + "\n\n"
+                    }
+                ):
+                    yield frame
             except Exception as e:
                 logger.error(f"Error processing final response: {str(e)}")
-                yield json.dumps(
+                for frame in encoder.event(
                     {
                         "type": "error",
                         "content": "Error processing the final response" + str(e),
-                    },
-                    ensure_ascii=False,
-                )
+                    }
+                ):
+                    yield frame
                 return
 
         except Exception as e:
             logger.error(f"Error in workflow stream: {str(e)}")
-            yield json.dumps(
-                {"type": "error", "content": "Error processing stream" + str(e)},
-                ensure_ascii=False,
-            ) + "\n\n"
+            for frame in encoder.event(
+                {"type": "error", "content": "Error processing stream" + str(e)}
+            ):
+                yield frame
             return
 
     except Exception as e:
         logger.error(f"Unexpected error: {str(e)}")
-        yield json.dumps(
-            {"type": "error", "content": "An unexpected error occurred" + str(e)},
-            ensure_ascii=False,
-        ) + "\n\n"
+        for frame in encoder.event(
+            {"type": "error", "content": "An unexpected error occurred" + str(e)}
+        ):
+            yield frame
         return
 
 
@@ -160,7 +156,9 @@ async def update_chat_stream(
                 },
                 config={
                     "configurable": {
-                        "thread_id": bot_id,
+                        "thread_id": build_thread_id(
+                            "update_custom_chatbot", user["id"], bot_id
+                        ),
                         "model_name": model_name,
                         "api_key": api_key,
                         "bot_id": bot_id,
@@ -169,6 +167,7 @@ async def update_chat_stream(
                     }
                 },
                 type="update",
+                started_at=start_time,
             ),
             media_type="text/event-stream",
         )
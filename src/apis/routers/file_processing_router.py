@@ -1,25 +1,16 @@
 from fastapi import APIRouter, status, UploadFile, File, Form, Depends
 from fastapi.responses import JSONResponse
 from src.utils.logger import logger
-from src.apis.interfaces.file_processing_interface import (
-    FileProcessingBody,
-    FileIngressResponse,
-)
-from langchain_text_splitters import RecursiveCharacterTextSplitter
-from langchain_community.document_loaders import PyMuPDFLoader
-from langchain_community.document_loaders import Docx2txtLoader
-from langchain_community.document_loaders import TextLoader
+from src.apis.interfaces.file_processing_interface import FileProcessingBody
 import os
-import tempfile
-import shutil
-import fitz
-from docx import Document as DocxDoc
-from src.config.vector_store import test_rag_vector_store
+from src.data_preprocessing.parsing import SUPPORTED_EXTENSIONS
+from src.config.parsed_documents import parsed_document_cache
+from src.config.ingestion_jobs import ingestion_jobs
 from src.config.mongo import bot_crud
-from bson import ObjectId
+from src.utils.uploads import UploadTooLarge, receive_bulk, receive_upload
 from src.apis.middlewares.auth_middleware import get_current_user
 from src.apis.models.user_models import User
-from typing import Annotated
+from typing import Annotated, Dict, List, Optional
 from pydantic import BaseModel, Field
 from src.config.monitoring import (
     increment_request_count,
@@ -29,18 +20,72 @@ from src.config.monitoring import (
     observe_agent_duration,
 )
 import time
+from datetime import datetime
+
+INGEST_BULK_MAX_FILES = int(os.getenv("INGEST_BULK_MAX_FILES", "200"))
+INGEST_BULK_MAX_TOTAL_SIZE = int(
+    os.getenv("INGEST_BULK_MAX_TOTAL_SIZE", str(500 * 1024 * 1024))
+)
 
 router = APIRouter(prefix="/file", tags=["File Processing"])
 user_dependency = Annotated[User, Depends(get_current_user)]
 
 
-class FileIngressResponse(BaseModel):
+class IngestionFileResult(BaseModel):
+    file_path: str = Field(..., title="Name of the file, with its path in an archive")
+    size: int = Field(0, title="Size of the file in bytes")
+    status: str = Field(..., title="pending, parsed, indexed, failed or skipped")
+    chunks: int = Field(0, title="Chunks the file was split into")
+    diff: Optional[Dict[str, int]] = Field(
+        None, title="Chunks added, updated, unchanged and deleted for this file"
+    )
+    error: Optional[str] = Field(None, title="Why the file failed or was skipped")
+
+
+class IngestionJobResponse(BaseModel):
+    job_id: str = Field(..., title="ID of the ingestion job")
     bot_id: str = Field(..., title="Bot ID associated with the file")
-    file_path: str = Field(..., title="Path to the processed file")
-    chunks_count: int = Field(..., title="Number of chunks created")
-    success: bool = Field(..., title="Whether the ingestion was successful")
-    message: str = Field(
-        "File processed and indexed successfully", title="Status message"
+    file_path: str = Field(..., title="Name of the file being indexed")
+    status: str = Field(..., title="queued, running, succeeded or failed")
+    stage: str = Field(..., title="Pipeline step the job is at")
+    attempts: int = Field(0, title="Times a worker has started the job")
+    chunks_total: int = Field(0, title="Chunks the file was split into")
+    chunks_to_embed: int = Field(0, title="New or moved chunks to embed")
+    chunks_processed: int = Field(0, title="Chunks embedded and upserted so far")
+    chunks_per_second: Optional[float] = Field(
+        None, title="Embedding and upsert throughput"
+    )
+    diff: Optional[Dict[str, int]] = Field(
+        None, title="Chunks added, updated, unchanged and deleted for this file"
+    )
+    error: Optional[str] = Field(None, title="Error of the last failed attempt")
+    files: Optional[List[IngestionFileResult]] = Field(
+        None, title="Per-file results of a bulk job"
+    )
+    skipped: Optional[List[IngestionFileResult]] = Field(
+        None, title="Uploaded files left out of a bulk job"
+    )
+    created_at: Optional[datetime] = Field(None, title="When the job was queued")
+    started_at: Optional[datetime] = Field(None, title="Start of the last attempt")
+    finished_at: Optional[datetime] = Field(None, title="End of the last attempt")
+
+
+def job_response(job: Dict) -> IngestionJobResponse:
+    files = None
+    if job.get("files") is not None:
+        files = [
+            IngestionFileResult(
+                file_path=file["filename"],
+                size=file.get("size", 0),
+                status=file.get("status", "pending"),
+                chunks=file.get("chunks", 0),
+                diff=file.get("diff"),
+                error=file.get("error"),
+            )
+            for file in job["files"]
+        ]
+    return IngestionJobResponse(
+        **{**job, "files": files}, job_id=job["_id"], file_path=job["filename"]
     )
 
 
@@ -54,47 +99,37 @@ async def analyze_file(
 ):
     try:
         start_time = time.time()
-        temp_dir = tempfile.mkdtemp()
-        temp_file_path = os.path.join(temp_dir, file.filename)
-        with open(temp_file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
         file_extension = os.path.splitext(file.filename)[1].lower()
         file_type = file_extension.replace(".", "").upper()
-        word_count = 0
-        image_count = 0
-        if file_extension == ".pdf":
-            doc = fitz.open(temp_file_path)
-            for page in doc:
-                text = page.get_text("text")
-                word_count += len(text.split())
-                image_count += len(page.get_images(full=True))
-        elif file_extension == ".docx":
-            doc = DocxDoc(temp_file_path)
-            for para in doc.paragraphs:
-                word_count += len(para.text.split())
-            image_count = 0
-            for rel in doc.part._rels.values():
-                if "image" in rel.target_ref:
-                    image_count += 1
-        else:
-            shutil.rmtree(temp_dir)
+        if file_extension not in (".pdf", ".docx"):
             return JSONResponse(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 content={"error": f"Unsupported file type: {file_extension}"},
             )
-
-        shutil.rmtree(temp_dir)
+        upload = await receive_upload(file)
+        try:
+            # Small uploads are parsed from memory, larger ones where they were streamed
+            parsed = await parsed_document_cache.parse(
+                upload.path or upload.data, file_extension, upload.sha256
+            )
+        finally:
+            upload.cleanup()
 
         return JSONResponse(
             status_code=status.HTTP_200_OK,
             content={
                 "file_path": file.filename,
-                "word_count": word_count,
-                "image_count": image_count,
+                "word_count": parsed.word_count,
+                "image_count": parsed.image_count,
                 "file_type": file_type,
             },
         )
 
+    except UploadTooLarge as e:
+        return JSONResponse(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            content={"error": str(e)},
+        )
     except Exception as e:
         logger.error(f"Error analyzing file: {str(e)}")
         return JSONResponse(
@@ -105,101 +140,73 @@ async def analyze_file(
         end_time = time.time()
         duration = end_time - start_time
         observe_request_duration(
-            agent_type="analyze_file",
+            method="POST",
+            endpoint="/file/analyze",
             duration=duration,
         )
 
 
-@router.post("/ingress", response_model=FileIngressResponse)
+@router.post(
+    "/ingress",
+    response_model=IngestionJobResponse,
+    status_code=status.HTTP_202_ACCEPTED,
+)
 async def ingress_file(
     user: user_dependency,
     file: UploadFile = File(...),
     bot_id: str = Form(...),
 ):
+    """Queue a file for indexing and return its job at once.
+
+    Sending the same file again for the same bot returns the job already
+    queued or running for it; poll GET /file/ingress/{job_id} for progress.
+    """
     start_time = time.time()
-    chatbot = await bot_crud.find_by_id(bot_id)
-    if not chatbot:
-        return JSONResponse(
-            status_code=status.HTTP_404_NOT_FOUND,
-            content={"error": f"Chatbot with id {bot_id} not found"},
-        )
-    if chatbot["user_id"] != user["id"]:
-        return JSONResponse(
-            status_code=status.HTTP_403_FORBIDDEN,
-            content={"error": f"You are not authorized to access this chatbot"},
-        )
+    status_code = status.HTTP_202_ACCEPTED
     try:
-        logger.info(f"Processing and indexing file: {file.filename} for bot: {bot_id}")
-
-        temp_dir = tempfile.mkdtemp()
-        temp_file_path = os.path.join(temp_dir, file.filename)
-
-        with open(temp_file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-        if file.filename.endswith(".pdf"):
-            loader = PyMuPDFLoader(temp_file_path)
-        elif file.filename.endswith(".docx"):
-            loader = Docx2txtLoader(temp_file_path)
-        elif file.filename.endswith(".txt"):
-            loader = TextLoader(temp_file_path)
-        else:
-            raise ValueError(f"Unsupported file format: {file.filename}")
-
-        docs = loader.load()
-
-        splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200)
-        chunks = splitter.split_documents(docs)
-
-        for chunk in chunks:
-            chunk.metadata = {"bot_id": bot_id}
-
-        test_rag_vector_store.add_documents(chunks)
+        chatbot = await bot_crud.find_by_id(bot_id)
+        if not chatbot:
+            status_code = status.HTTP_404_NOT_FOUND
+            return JSONResponse(
+                status_code=status_code,
+                content={"error": f"Chatbot with id {bot_id} not found"},
+            )
+        if chatbot["user_id"] != user["id"]:
+            status_code = status.HTTP_403_FORBIDDEN
+            return JSONResponse(
+                status_code=status_code,
+                content={"error": f"You are not authorized to access this chatbot"},
+            )
+        if not file.filename.lower().endswith(SUPPORTED_EXTENSIONS):
+            status_code = status.HTTP_400_BAD_REQUEST
+            return JSONResponse(
+                status_code=status_code,
+                content={"error": f"Unsupported file format: {file.filename}"},
+            )
 
+        upload = await receive_upload(file)
         try:
-            chatbot = await bot_crud.find_by_id(bot_id)
-            if chatbot:
-                tools = chatbot.get("tools", [])
-                retrieve_document_exists = False
-                for tool in tools:
-                    if (
-                        isinstance(tool, dict)
-                        and tool.get("name") == "retrieve_document"
-                    ):
-                        retrieve_document_exists = True
-                        break
-                if not retrieve_document_exists:
-                    tools.append("retrieve_document")
-                    await bot_crud.update({"_id": ObjectId(bot_id)}, {"tools": tools})
-                    logger.info(f"Added retrieve_document tool to chatbot {bot_id}")
-        except Exception as e:
-            logger.error(f"Error updating chatbot tools: {str(e)}")
-
-        shutil.rmtree(temp_dir)
-        chunks_count = len(chunks)
-
-        return FileIngressResponse(
-            bot_id=bot_id,
-            file_path=file.filename,
-            chunks_count=chunks_count,
-            success=True,
-            message=f"File processed and indexed successfully. Created {chunks_count} chunks.",
+            job = await ingestion_jobs.submit(bot_id, user["id"], upload)
+        finally:
+            upload.cleanup()
+        return JSONResponse(
+            status_code=status_code,
+            content=job_response(job).model_dump(mode="json"),
         )
 
+    except UploadTooLarge as e:
+        status_code = status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+        return JSONResponse(status_code=status_code, content={"error": str(e)})
     except Exception as e:
-        logger.error(f"Error processing file: {str(e)}")
-        increment_request_count(
-            method="POST",
-            endpoint="/file/ingress",
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-        )
+        logger.error(f"Error queueing file: {str(e)}")
+        status_code = status.HTTP_500_INTERNAL_SERVER_ERROR
         return JSONResponse(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            status_code=status_code,
             content={
                 "bot_id": bot_id,
                 "file_path": file.filename if file else "unknown",
-                "chunks_count": 0,
                 "success": False,
-                "message": f"Error processing file: {str(e)}",
+                "message": f"Error queueing file: {str(e)}",
             },
         )
     finally:
@@ -213,5 +220,117 @@ async def ingress_file(
         increment_request_count(
             method="POST",
             endpoint="/file/ingress",
-            status_code=status.HTTP_200_OK,
+            status_code=status_code,
+        )
+
+
+@router.post(
+    "/ingress/bulk",
+    response_model=IngestionJobResponse,
+    status_code=status.HTTP_202_ACCEPTED,
+)
+async def bulk_ingress_files(
+    user: user_dependency,
+    files: List[UploadFile] = File(...),
+    bot_id: str = Form(...),
+):
+    """Queue many files, or zip archives of them, for indexing as one job.
+
+    Archive entries are streamed out one at a time, every file is parsed in
+    parallel and their chunks share embedding batches; the bot's tools are
+    updated once. Poll GET /file/ingress/{job_id} for the per-file results.
+    """
+    start_time = time.time()
+    status_code = status.HTTP_202_ACCEPTED
+    try:
+        chatbot = await bot_crud.find_by_id(bot_id)
+        if not chatbot:
+            status_code = status.HTTP_404_NOT_FOUND
+            return JSONResponse(
+                status_code=status_code,
+                content={"error": f"Chatbot with id {bot_id} not found"},
+            )
+        if chatbot["user_id"] != user["id"]:
+            status_code = status.HTTP_403_FORBIDDEN
+            return JSONResponse(
+                status_code=status_code,
+                content={"error": f"You are not authorized to access this chatbot"},
+            )
+
+        uploads, skipped = await receive_bulk(
+            files,
+            SUPPORTED_EXTENSIONS,
+            max_total_size=INGEST_BULK_MAX_TOTAL_SIZE,
+            max_files=INGEST_BULK_MAX_FILES,
+        )
+        skipped = [
+            IngestionFileResult(file_path=name, status="skipped", error=reason)
+            for name, reason in skipped
+        ]
+        if not uploads:
+            status_code = status.HTTP_400_BAD_REQUEST
+            return JSONResponse(
+                status_code=status_code,
+                content={
+                    "error": "No supported files to ingest",
+                    "skipped": [result.model_dump() for result in skipped],
+                },
+            )
+        name = files[0].filename if len(files) == 1 else f"{len(uploads)} files"
+        try:
+            job = await ingestion_jobs.submit_batch(bot_id, user["id"], name, uploads)
+        finally:
+            for upload in uploads:
+                upload.cleanup()
+        response = job_response(job)
+        response.skipped = skipped
+        return JSONResponse(
+            status_code=status_code, content=response.model_dump(mode="json")
+        )
+
+    except UploadTooLarge as e:
+        status_code = status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+        return JSONResponse(status_code=status_code, content={"error": str(e)})
+    except Exception as e:
+        logger.error(f"Error queueing files: {str(e)}")
+        status_code = status.HTTP_500_INTERNAL_SERVER_ERROR
+        return JSONResponse(
+            status_code=status_code,
+            content={"error": f"Error queueing files: {str(e)}"},
+        )
+    finally:
+        end_time = time.time()
+        duration = end_time - start_time
+        observe_request_duration(
+            method="POST",
+            endpoint="/file/ingress/bulk",
+            duration=duration,
+        )
+        increment_request_count(
+            method="POST",
+            endpoint="/file/ingress/bulk",
+            status_code=status_code,
+        )
+
+
+@router.get("/ingress/{job_id}", response_model=IngestionJobResponse)
+async def get_ingress_job(user: user_dependency, job_id: str):
+    try:
+        job = await ingestion_jobs.get(job_id)
+        if not job:
+            return JSONResponse(
+                status_code=status.HTTP_404_NOT_FOUND,
+                content={"error": f"Ingestion job {job_id} not found"},
+            )
+        if job["user_id"] != user["id"]:
+            return JSONResponse(
+                status_code=status.HTTP_403_FORBIDDEN,
+                content={"error": f"You are not authorized to access this job"},
+            )
+        return job_response(job)
+    except Exception as e:
+        logger.error(f"Error getting ingestion job: {str(e)}")
+        return JSONResponse(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            content={"error": f"Error getting ingestion job: {str(e)}"},
         )
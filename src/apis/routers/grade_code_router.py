@@ -24,6 +24,7 @@ from src.agents.grade_code_quality.prompt import grade_code_quality_chain
 from pydantic import BaseModel, Field
 from src.agents.grade_code_quality.flow import grade_streaming_fn
 from src.config.constants import SUPPORTED_EXTENSIONS
+from src.utils.uploads import UploadTooLarge, receive_uploads
 from src.apis.middlewares.auth_middleware import get_current_user
 from src.apis.models.user_models import User
 from typing import Annotated
@@ -49,19 +50,9 @@ def get_directory_size(directory_path: str) -> int:
     return total_size
 
 
-def validate_upload_size(files: List[UploadFile]) -> tuple[bool, int]:
-    """Validate total size of uploaded files"""
-    total_size = 0
-    for file in files:
-        if hasattr(file, "size") and file.size:
-            total_size += file.size
-        else:
-            # If size is not available, we'll check during read
-            return True, 0  # Let it proceed, check during processing
-    return total_size <= MAX_TOTAL_SIZE, total_size
-
-
-def process_uploaded_files(files: List[UploadFile], extensions: List[str]) -> List[str]:
+async def process_uploaded_files(
+    files: List[UploadFile], extensions: List[str]
+) -> List[str]:
     """
     Process uploaded files and save them to the repo directory for grading
 
@@ -82,65 +73,37 @@ def process_uploaded_files(files: List[UploadFile], extensions: List[str]) -> Li
         shutil.rmtree(upload_folder)
     os.makedirs(upload_folder, exist_ok=True)
 
+    # Files with other extensions are never read
+    if extensions:
+        files = [
+            file
+            for file in files
+            if os.path.splitext(file.filename)[1].lower() in extensions
+        ]
+
+    uploads = []
     try:
-        total_size = 0
+        # Streams each file once and stops at the first limit exceeded
+        uploads = await receive_uploads(files, MAX_FILE_SIZE, MAX_TOTAL_SIZE)
         file_paths = []
-
-        for file in files:
-            # Read file content
-            content = file.file.read()
-            file.file.seek(0)  # Reset file pointer
-
-            # Check individual file size
-            if len(content) > MAX_FILE_SIZE:
-                raise HTTPException(
-                    status_code=400,
-                    detail=f"File {file.filename} exceeds individual size limit ({MAX_FILE_SIZE / 1024 / 1024:.2f}MB)",
-                )
-
-            total_size += len(content)
-
-            # Check if file extension is allowed
-            if extensions:
-                file_ext = os.path.splitext(file.filename)[1].lower()
-                if file_ext not in extensions:
-                    continue
-
-            # Create file path in upload directory maintaining directory structure
-            file_path = os.path.join(upload_folder, file.filename)
-
-            # Create directories if needed
-            os.makedirs(os.path.dirname(file_path), exist_ok=True)
-
-            # Write file
-            with open(file_path, "wb") as f:
-                f.write(content)
-
+        for upload in uploads:
+            # Keep the uploaded directory structure
+            upload.save(os.path.join(upload_folder, upload.filename))
             # Store path relative to upload folder for consistency with cloned repos
-            file_paths.append(os.path.join("uploaded_project", file.filename))
-
-        # Check total size limit
-        if total_size > MAX_TOTAL_SIZE:
-            # Clean up on size limit exceeded
-            try:
-                if os.path.exists(upload_folder):
-                    shutil.rmtree(upload_folder)
-            except:
-                pass  # Ignore cleanup errors
-            raise HTTPException(
-                status_code=400,
-                detail=f"Total upload size ({total_size / 1024 / 1024:.2f}MB) exceeds limit ({MAX_TOTAL_SIZE / 1024 / 1024:.2f}MB)",
-            )
-
+            file_paths.append(os.path.join("uploaded_project", upload.filename))
         return file_paths
 
     except Exception as e:
         # Clean up on any error
+        for upload in uploads:
+            upload.cleanup()
         try:
             if os.path.exists(upload_folder):
                 shutil.rmtree(upload_folder)
         except:
             pass  # Ignore cleanup errors
+        if isinstance(e, UploadTooLarge):
+            raise HTTPException(status_code=400, detail=str(e))
         raise e
 
 
@@ -208,7 +171,7 @@ async def get_file_tree_upload(
 
     try:
         # Process uploaded files
-        file_paths = process_uploaded_files(files, extensions)
+        file_paths = await process_uploaded_files(files, extensions)
 
         if not file_paths:
             raise HTTPException(
@@ -262,7 +225,7 @@ async def get_file_tree_unified(
             return {"file_tree": file_tree, "source": "repository", "url": repo_url}
         else:
             # Handle file uploads
-            file_paths = process_uploaded_files(files, extensions)
+            file_paths = await process_uploaded_files(files, extensions)
 
             if not file_paths:
                 raise HTTPException(
@@ -2,20 +2,24 @@ from fastapi import APIRouter, status, Depends, UploadFile, Form
 from fastapi.responses import JSONResponse, StreamingResponse
 from pydantic import BaseModel, Field
 from typing import Optional, List, Any
-import json
 import datetime
+import uuid
 from bson import ObjectId
-from langchain_core.messages.ai import AIMessageChunk
+from langchain_core.messages.ai import AIMessage, AIMessageChunk
 from src.apis.interfaces.chat_interface import RagAgentBody
 from src.agents.rag_agent_template.flow import rag_agent_template_agent
 from src.config.mongo import bot_crud
+from src.config.checkpointer import build_thread_id
+from src.config.semantic_cache import SEMANTIC_CACHE_ENABLED, semantic_answer_cache
+from src.config.bot_cache import bot_config_cache
+from src.config.vector_store import rag_vector_store
 from src.utils.logger import logger
 from src.apis.middlewares.auth_middleware import get_current_user
 from src.apis.models.user_models import User
 from typing import Annotated
 from src.utils.helper import preprocess_messages
 from src.config.llm import get_llm
-import asyncio
+from src.utils.sse import SSEEncoder
 from src.config.monitoring import (
     increment_request_count,
     observe_request_duration,
@@ -29,7 +33,14 @@ router = APIRouter(prefix="/ai", tags=["AI"])
 user_dependency = Annotated[User, Depends(get_current_user)]
 
 
-async def message_generator(input_graph: dict, config: dict):
+async def message_generator(
+    input_graph: dict,
+    config: dict,
+    started_at: Optional[float] = None,
+    cache_vector: Optional[Any] = None,
+    cache_generation: Optional[Any] = None,
+):
+    encoder = SSEEncoder("/ai/rag_agent_template/stream", started_at=started_at)
     last_output_state = None
     async for event in rag_agent_template_agent.astream(
         input=input_graph,
@@ -42,15 +53,8 @@ async def message_generator(input_graph: dict, config: dict):
             if isinstance(message, AIMessageChunk) and metadata["langgraph_node"] in [
                 "generate_answer"
             ]:
-                for char in message.content:
-                    yield json.dumps(
-                        {
-                            "type": "message",
-                            "content": char,
-                        },
-                        ensure_ascii=False,
-                    ) + "\n\n"
-                    await asyncio.sleep(0.001)  # Small delay for smooth streaming
+                for frame in encoder.push(message.content):
+                    yield frame
         if event_type == "values":
             last_output_state = event_message
 
@@ -60,18 +64,66 @@ async def message_generator(input_graph: dict, config: dict):
     if "messages" not in last_output_state:
         raise ValueError("No LLM response in output")
 
-    final_response = json.dumps(
+    final_content = {
+        "final_response": last_output_state["messages"][-1].content,
+        "selected_ids": last_output_state.get("selected_ids", []),
+        "selected_documents": last_output_state.get("selected_documents", []),
+    }
+    for frame in encoder.event(
         {
             "type": "final",
             "content": {
-                "final_response": last_output_state["messages"][-1].content,
-                "selected_ids": last_output_state.get("selected_ids", []),
-                "selected_documents": last_output_state.get("selected_documents", []),
+                **final_content,
+                "conversation_id": config["configurable"]["conversation_id"],
             },
+        }
+    ):
+        yield frame
+
+    if cache_vector is not None and isinstance(final_content["final_response"], str):
+        semantic_answer_cache.store(
+            config["configurable"]["bot_id"],
+            cache_vector,
+            final_content,
+            cache_generation,
+        )
+
+
+async def cached_message_generator(
+    input_graph: dict,
+    config: dict,
+    cached: dict,
+    started_at: Optional[float] = None,
+):
+    encoder = SSEEncoder("/ai/rag_agent_template/stream", started_at=started_at)
+    for frame in encoder.push(cached["final_response"]):
+        yield frame
+    for frame in encoder.event(
+        {
+            "type": "final",
+            "content": {
+                **cached,
+                "conversation_id": config["configurable"]["conversation_id"],
+            },
+        }
+    ):
+        yield frame
+
+    # Record the exchange so follow-up questions keep their context
+    await rag_agent_template_agent.aupdate_state(
+        config,
+        {
+            "messages": [
+                input_graph["messages"],
+                AIMessage(content=cached["final_response"]),
+            ],
+            "prompt": input_graph["prompt"],
+            "tools": input_graph["tools"],
+            "selected_ids": cached["selected_ids"],
+            "selected_documents": cached["selected_documents"],
         },
-        ensure_ascii=False,
+        as_node="generate_answer",
     )
-    yield final_response + "\n\n"
 
 
 class RagAgentBody(BaseModel):
@@ -117,7 +169,7 @@ async def rag_agent_template_stream(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 content={"error": "Bot ID is required"},
             )
-        data = await bot_crud.read_one({"_id": ObjectId(bot_id)})
+        data = await bot_config_cache.get(bot_id)
         if not data or not data["prompt"]:
             return JSONResponse(
                 status_code=status.HTTP_404_NOT_FOUND,
@@ -135,9 +187,13 @@ async def rag_agent_template_stream(
 
         messages = await preprocess_messages(query, attachs)
 
+        conversation_id = conversation_id or uuid.uuid4().hex
         config = {
             "configurable": {
-                "thread_id": conversation_id if conversation_id else "1",
+                "thread_id": build_thread_id(
+                    "rag_agent_template", user["id"], conversation_id
+                ),
+                "conversation_id": conversation_id,
                 "bot_id": bot_id,
                 "model_name": model_name,
                 "api_key": api_key,
@@ -150,10 +206,34 @@ async def rag_agent_template_stream(
             "tools": tools,
         }
 
+        cache_vector, cache_generation = None, None
+        # Cached answers ignore history, so only fresh text-only threads use them
+        if SEMANTIC_CACHE_ENABLED and query and not attachs:
+            state = await rag_agent_template_agent.aget_state(config)
+            if not state.values.get("messages"):
+                cached, cache_vector, cache_generation = (
+                    await semantic_answer_cache.lookup(
+                        bot_id, query, data["answer_cache_version"]
+                    )
+                )
+                if cached:
+                    return StreamingResponse(
+                        cached_message_generator(
+                            input_graph=input_graph,
+                            config=config,
+                            cached=cached,
+                            started_at=start_time,
+                        ),
+                        media_type="text/event-stream",
+                    )
+
         return StreamingResponse(
             message_generator(
                 input_graph=input_graph,
                 config=config,
+                started_at=start_time,
+                cache_vector=cache_vector,
+                cache_generation=cache_generation,
             ),
             media_type="text/event-stream",
         )
@@ -440,6 +520,9 @@ async def update_chatbot(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                 content={"error": "Failed to update chatbot"},
             )
+        bot_config_cache.invalidate(chatbot_id)
+        if "prompt" in update_fields or "tools" in update_fields:
+            await semantic_answer_cache.invalidate_shared(chatbot_id)
 
         updated_chatbot = await bot_crud.find_by_id(chatbot_id)
         if "_id" in updated_chatbot:
@@ -494,6 +577,8 @@ async def delete_chatbot(chatbot_id: str, user: user_dependency):
             )
 
         deleted = await bot_crud.delete_one({"_id": ObjectId(chatbot_id)})
+        bot_config_cache.invalidate(chatbot_id)
+        semantic_answer_cache.invalidate(chatbot_id)
 
         if not deleted:
             return JSONResponse(
@@ -501,6 +586,11 @@ async def delete_chatbot(chatbot_id: str, user: user_dependency):
                 content={"error": "Failed to delete chatbot"},
             )
 
+        try:
+            await rag_vector_store.drop_bot(chatbot_id)
+        except Exception as e:
+            logger.error(f"Error deleting documents of chatbot {chatbot_id}: {str(e)}")
+
         logger.info(f"Deleted chatbot with ID: {chatbot_id}")
         return JSONResponse(
             status_code=status.HTTP_200_OK,
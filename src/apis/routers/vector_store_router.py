@@ -1,6 +1,6 @@
-from src.config.vector_store import test_rag_vector_store as vector_store
+from src.config.vector_store import rag_vector_store
 from typing import Optional, List
-from fastapi import APIRouter, Query, Depends
+from fastapi import APIRouter, Query, Depends, Response
 from langchain_core.documents import Document
 from src.apis.middlewares.auth_middleware import get_current_user
 from src.apis.models.user_models import User
@@ -8,6 +8,7 @@ from typing import Annotated
 from fastapi.responses import JSONResponse
 from fastapi import status
 from src.config.mongo import bot_crud
+from src.config.semantic_cache import semantic_answer_cache
 from bson import ObjectId
 from pydantic import Field, BaseModel
 
@@ -16,7 +17,16 @@ user_dependency = Annotated[User, Depends(get_current_user)]
 
 
 @router.get("/get-documents")
-async def get_documents(user: user_dependency, bot_id: Optional[str] = None):
+async def get_documents(
+    user: user_dependency,
+    response: Response,
+    bot_id: Optional[str] = None,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(0, ge=0, description="Page size, 0 returns every chunk"),
+    include_content: bool = Query(
+        True, description="Set to false to list chunk ids and metadata only"
+    ),
+):
     chatbot = await bot_crud.read_one({"_id": ObjectId(bot_id), "user_id": user["id"]})
     if not chatbot:
         return JSONResponse(
@@ -24,9 +34,10 @@ async def get_documents(user: user_dependency, bot_id: Optional[str] = None):
             content={"error": f"Chatbot with id {bot_id} not found"},
         )
 
-    documents = await vector_store.asimilarity_search(
-        "", 10000, filter={"bot_id": bot_id}
+    documents, total = await rag_vector_store.list_bot_documents(
+        bot_id, skip=skip, limit=limit, include_content=include_content
     )
+    response.headers["X-Total-Count"] = str(total)
     return [doc.__dict__ for doc in documents]
 
 
@@ -49,7 +60,11 @@ async def add_documents(
             status_code=status.HTTP_404_NOT_FOUND,
             content={"error": f"Chatbot with id {body.bot_id} not found"},
         )
-    return await vector_store.aadd_documents(body.documents, ids=body.ids)
+    for document in body.documents:
+        document.metadata["bot_id"] = body.bot_id
+    await rag_vector_store.add_documents(body.documents, ids=body.ids)
+    await semantic_answer_cache.invalidate_shared(body.bot_id)
+    return body.ids
 
 
 @router.delete("/delete-documents")
@@ -62,11 +77,7 @@ async def delete_documents(
             status_code=status.HTTP_404_NOT_FOUND,
             content={"error": f"Chatbot with id {bot_id} not found"},
         )
-    document_data = await vector_store.asimilarity_search(
-        "", 10000, filter={"bot_id": bot_id}
-    )
-    document_ids = [doc.id for doc in document_data]
-    if not ids:
-        ids = document_ids
-    delete_ids = [id for id in ids if id in document_ids]
-    return await vector_store.adelete(ids=delete_ids)
+    # Only ids registered to this bot are deleted
+    deleted = await rag_vector_store.delete_bot_documents(bot_id, ids=ids or None)
+    await semantic_answer_cache.invalidate_shared(bot_id)
+    return deleted
@@ -0,0 +1,331 @@
+"""Benchmark retrieval quality and latency of PineconeVectorStoreCRUD.
+
+Usage:
+    python -m src.benchmarks.retrieval [--corpus corpus.json] [--k 3 5 10]
+        [--score-threshold 0.3] [--mode vector hybrid] [--rerank off on]
+        [--chunk-size 1000] [--backend local] [--output results/retrieval]
+
+Every combination of the given settings is ingested into a throwaway store
+and queried with a labeled corpus, either loaded from JSON:
+
+    {"documents": [{"id": "d1", "text": "...", "source": "a.pdf"}],
+     "queries": [{"query": "...", "relevant": ["d1"]}]}
+
+or generated (--documents / --queries / --seed). Relevance is labeled per
+document, so a retrieved chunk counts as a hit when it belongs to a relevant
+document whatever the chunk size. Texts are embedded with a deterministic
+hashing model instead of the production one: scores and latencies measure
+the retrieval pipeline, not the embedding API.
+
+Latency is timed around each search; peak memory is the largest Python
+allocation total while the queries are replayed under tracemalloc. The
+report (recall@k, MRR, p50/p95 latency, memory) is printed as Markdown
+and written to <output>.json and <output>.md when --output is given.
+"""
+
+import os
+
+# Build the app's module-level stores offline; --backend picks the benchmarked one
+os.environ.setdefault("VECTOR_STORE_BACKEND", "local")
+
+import json
+import time
+import zlib
+import random
+import asyncio
+import argparse
+import itertools
+import tempfile
+import tracemalloc
+from dataclasses import asdict, dataclass
+from typing import Dict, List, Optional
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+from src.config.lexical_index import LexicalIndexStore
+from src.config.local_vector_store import LocalVectorStore
+from src.config.vector_store import (
+    API_PINCONE_KEY,
+    PineconeVectorStoreCRUD,
+    build_vector_store,
+)
+from src.utils.bm25 import tokenize
+from src.utils.context_assembler import assemble_context
+
+BENCHMARK_BOT_ID = "benchmark"
+SYLLABLES = [
+    "an", "ba", "cho", "da", "em", "gia", "ha", "khi", "la", "ma", "ngu", "nha",
+    "phi", "qua", "sa", "ta", "thu", "tra", "va", "xe", "yen", "hoc", "truong",
+    "lop", "mon", "thi", "diem", "ky", "nam", "sinh",
+]
+
+
+class HashingEmbedding(Embeddings):
+    """Deterministic bag-of-words embedding (feature hashing of BM25 tokens)."""
+
+    def __init__(self, size: int = 256):
+        self.size = size
+
+    def _embed(self, text: str) -> List[float]:
+        vector = np.zeros(self.size, dtype=np.float32)
+        for token in tokenize(text):
+            bucket = zlib.crc32(token.encode("utf-8"))
+            vector[bucket % self.size] += 1.0 if bucket & 1 << 31 else -1.0
+        norm = np.linalg.norm(vector)
+        return (vector / norm if norm else vector).tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed(text)
+
+
+@dataclass
+class BenchmarkConfig:
+    k: int
+    score_threshold: float
+    mode: str
+    rerank: bool
+    chunk_size: int
+
+
+@dataclass
+class BenchmarkResult:
+    config: BenchmarkConfig
+    chunks: int
+    ingest_seconds: float
+    recall_at_k: float
+    mrr: float
+    hit_rate: float
+    p50_ms: float
+    p95_ms: float
+    context_tokens: float
+    peak_memory_mb: float
+
+
+def generate_corpus(documents: int, queries: int, seed: int = 0) -> Dict:
+    """Synthetic documents sharing common words, each with its own topic words."""
+    rng = random.Random(seed)
+
+    def word() -> str:
+        return "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 3)))
+
+    common = [word() for _ in range(300)]
+    corpus = {"documents": [], "queries": []}
+    topics = []
+    for i in range(documents):
+        topic = [word() for _ in range(12)]
+        topics.append(topic)
+        sentences = []
+        for _ in range(rng.randint(20, 40)):
+            words = rng.sample(common, 8) + rng.sample(topic, 2)
+            rng.shuffle(words)
+            sentences.append(" ".join(words).capitalize() + ".")
+        corpus["documents"].append(
+            {"id": f"doc-{i}", "text": " ".join(sentences), "source": f"doc-{i}.txt"}
+        )
+    for _ in range(queries):
+        target = rng.randrange(documents)
+        words = rng.sample(topics[target], 3) + rng.sample(common, 2)
+        rng.shuffle(words)
+        corpus["queries"].append(
+            {"query": " ".join(words), "relevant": [f"doc-{target}"]}
+        )
+    return corpus
+
+
+def load_corpus(path: str) -> Dict:
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def split_corpus(corpus: Dict, chunk_size: int) -> List[Document]:
+    splitter = RecursiveCharacterTextSplitter(
+        chunk_size=chunk_size, chunk_overlap=chunk_size // 5, add_start_index=True
+    )
+    documents = [
+        Document(
+            page_content=document["text"],
+            metadata={
+                "bot_id": BENCHMARK_BOT_ID,
+                "doc_id": document["id"],
+                "source": document.get("source", document["id"]),
+            },
+        )
+        for document in corpus["documents"]
+    ]
+    return splitter.split_documents(documents)
+
+
+def build_store(
+    backend: str, directory: str, embedding: Embeddings, config: BenchmarkConfig
+) -> PineconeVectorStoreCRUD:
+    if backend == "local":
+        vector_store = LocalVectorStore(embedding, "benchmark", directory=directory)
+    else:
+        vector_store = build_vector_store(
+            os.getenv("BENCHMARK_INDEX_NAME", "rag-benchmark"),
+            embedding,
+            API_PINCONE_KEY,
+            backend,
+        )
+    return PineconeVectorStoreCRUD(
+        index_name="benchmark",
+        embedding=embedding,
+        pinecone_api_key=API_PINCONE_KEY,
+        k=config.k,
+        score_threshold=config.score_threshold,
+        retrieval_mode=config.mode,
+        vector_store=vector_store,
+        lexical_store=LexicalIndexStore(os.path.join(directory, "lexical")),
+        bot_namespaces=False,
+        rerank=config.rerank,
+        rerank_top_n=config.k,
+    )
+
+
+def reciprocal_rank(retrieved: List[str], relevant: set) -> float:
+    for rank, doc_id in enumerate(retrieved, start=1):
+        if doc_id in relevant:
+            return 1.0 / rank
+    return 0.0
+
+
+async def run_config(
+    corpus: Dict, config: BenchmarkConfig, backend: str, embedding: Embeddings
+) -> BenchmarkResult:
+    with tempfile.TemporaryDirectory() as directory:
+        store = build_store(backend, directory, embedding, config)
+        chunks = split_corpus(corpus, config.chunk_size)
+        ids = [f"chunk-{i}" for i in range(len(chunks))]
+        start_time = time.perf_counter()
+        await store.add_documents(chunks, ids)
+        ingest_seconds = time.perf_counter() - start_time
+
+        try:
+            latencies, recalls, ranks, context_tokens = [], [], [], []
+            for labeled in corpus["queries"]:
+                relevant = set(labeled["relevant"])
+                start_time = time.perf_counter()
+                scored_documents = await store.search_with_scores(
+                    labeled["query"], filter={"bot_id": BENCHMARK_BOT_ID}
+                )
+                latencies.append(time.perf_counter() - start_time)
+                retrieved = list(
+                    dict.fromkeys(
+                        document.metadata.get("doc_id")
+                        for document, _ in scored_documents
+                    )
+                )
+                recalls.append(len(relevant & set(retrieved)) / len(relevant))
+                ranks.append(reciprocal_rank(retrieved, relevant))
+                context_tokens.append(
+                    assemble_context(scored_documents).context_tokens
+                )
+            # Separate pass: tracing every allocation would skew the latencies
+            tracemalloc.start()
+            try:
+                for labeled in corpus["queries"]:
+                    await store.search_with_scores(
+                        labeled["query"], filter={"bot_id": BENCHMARK_BOT_ID}
+                    )
+                _, peak = tracemalloc.get_traced_memory()
+            finally:
+                tracemalloc.stop()
+        finally:
+            if backend != "local":
+                await store.vector_store.adelete(ids=ids)
+
+    latencies_ms = np.array(latencies) * 1000
+    return BenchmarkResult(
+        config=config,
+        chunks=len(chunks),
+        ingest_seconds=round(ingest_seconds, 3),
+        recall_at_k=round(float(np.mean(recalls)), 4),
+        mrr=round(float(np.mean(ranks)), 4),
+        hit_rate=round(float(np.mean([recall > 0 for recall in recalls])), 4),
+        p50_ms=round(float(np.percentile(latencies_ms, 50)), 3),
+        p95_ms=round(float(np.percentile(latencies_ms, 95)), 3),
+        context_tokens=round(float(np.mean(context_tokens)), 1),
+        peak_memory_mb=round(peak / 2**20, 2),
+    )
+
+
+def to_markdown(results: List[BenchmarkResult], corpus: Dict) -> str:
+    lines = [
+        "# Retrieval benchmark",
+        "",
+        f"{len(corpus['documents'])} documents, {len(corpus['queries'])} queries",
+        "",
+        "| chunk size | mode | rerank | k | threshold | chunks | recall@k | MRR "
+        "| hit rate | p50 ms | p95 ms | context tokens | peak MB |",
+        "|---|---|---|---|---|---|---|---|---|---|---|---|---|",
+    ]
+    for result in results:
+        config = result.config
+        lines.append(
+            f"| {config.chunk_size} | {config.mode} | "
+            f"{'on' if config.rerank else 'off'} | {config.k} | "
+            f"{config.score_threshold} | {result.chunks} | {result.recall_at_k} | "
+            f"{result.mrr} | {result.hit_rate} | {result.p50_ms} | {result.p95_ms} | "
+            f"{result.context_tokens} | {result.peak_memory_mb} |"
+        )
+    return "\n".join(lines) + "\n"
+
+
+async def run(
+    corpus: Dict,
+    configs: List[BenchmarkConfig],
+    backend: str = "local",
+    embedding: Optional[Embeddings] = None,
+) -> List[BenchmarkResult]:
+    embedding = embedding or HashingEmbedding()
+    results = []
+    for config in configs:
+        results.append(await run_config(corpus, config, backend, embedding))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--corpus", help="labeled corpus JSON (generated if omitted)")
+    parser.add_argument("--documents", type=int, default=200)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--k", type=int, nargs="+", default=[5])
+    parser.add_argument("--score-threshold", type=float, nargs="+", default=[0.3])
+    parser.add_argument(
+        "--mode", nargs="+", default=["vector"], choices=["vector", "lexical", "hybrid"]
+    )
+    parser.add_argument("--rerank", nargs="+", default=["off"], choices=["off", "on"])
+    parser.add_argument("--chunk-size", type=int, nargs="+", default=[1000])
+    parser.add_argument("--backend", default="local", choices=["local", "pinecone"])
+    parser.add_argument("--output", help="path prefix of the .json and .md reports")
+    args = parser.parse_args()
+
+    corpus = (
+        load_corpus(args.corpus)
+        if args.corpus
+        else generate_corpus(args.documents, args.queries, args.seed)
+    )
+    configs = [
+        BenchmarkConfig(k, threshold, mode, rerank == "on", chunk_size)
+        for chunk_size, mode, rerank, k, threshold in itertools.product(
+            args.chunk_size, args.mode, args.rerank, args.k, args.score_threshold
+        )
+    ]
+    results = asyncio.run(run(corpus, configs, args.backend))
+    report = to_markdown(results, corpus)
+    print(report)
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(f"{args.output}.json", "w", encoding="utf-8") as f:
+            json.dump([asdict(result) for result in results], f, indent=2)
+        with open(f"{args.output}.md", "w", encoding="utf-8") as f:
+            f.write(report)
+
+
+if __name__ == "__main__":
+    main()
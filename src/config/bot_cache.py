@@ -0,0 +1,145 @@
+import os
+import asyncio
+from typing import Dict, Optional
+from bson import ObjectId
+from motor.motor_asyncio import AsyncIOMotorCollection
+from pymongo.errors import OperationFailure, PyMongoError
+from src.config.mongo import bot_crud
+from src.config.monitoring import increment_database_queries
+from src.config.semantic_cache import semantic_answer_cache
+from src.utils.cache import LRUCache
+from src.utils.logger import logger
+
+BOT_CACHE_TTL_SECONDS = int(os.getenv("BOT_CACHE_TTL_SECONDS", "300"))
+BOT_CACHE_SIZE = int(os.getenv("BOT_CACHE_SIZE", "1000"))
+# Backoff between attempts to reopen the bot change stream
+BOT_WATCH_RETRY_SECONDS = float(os.getenv("BOT_WATCH_RETRY_SECONDS", "1"))
+BOT_WATCH_MAX_RETRY_SECONDS = float(os.getenv("BOT_WATCH_MAX_RETRY_SECONDS", "60"))
+# Server error code of a change stream opened on a standalone server
+CHANGE_STREAM_UNSUPPORTED = 40573
+BOT_CONFIG_FIELDS = {
+    "prompt": 1,
+    "tools": 1,
+    "public": 1,
+    "user_id": 1,
+    "answer_cache_version": 1,
+}
+
+
+class BotConfigCache:
+    """Read-through TTL/LRU cache of the bot fields needed on every chat turn.
+
+    Entries are dropped explicitly by the paths that modify a bot and, when the
+    deployment is a replica set, by a change-stream listener so that other
+    workers see updates before the TTL runs out.
+    """
+
+    def __init__(
+        self,
+        collection: AsyncIOMotorCollection,
+        ttl_seconds: int = BOT_CACHE_TTL_SECONDS,
+        maxsize: int = BOT_CACHE_SIZE,
+    ):
+        self.collection = collection
+        self.cache = LRUCache(maxsize, ttl=ttl_seconds, name="bot_config")
+        self._watch_task: Optional[asyncio.Task] = None
+
+    async def get(self, bot_id: str) -> Optional[Dict]:
+        """Return prompt, tools, public, user_id and answer_cache_version of a bot,
+        or None if it does not exist."""
+        config = self.cache.get(bot_id)
+        if config is None:
+            increment_database_queries(operation="read", collection="bot")
+            doc = await self.collection.find_one(
+                {"_id": ObjectId(bot_id)}, BOT_CONFIG_FIELDS
+            )
+            if not doc:
+                return None
+            config = {
+                "prompt": doc.get("prompt", ""),
+                "tools": doc.get("tools", []),
+                "public": doc.get("public", False),
+                "user_id": doc.get("user_id", ""),
+                "answer_cache_version": doc.get("answer_cache_version", 0),
+            }
+            self.cache.set(bot_id, config)
+        return {**config, "tools": list(config["tools"])}
+
+    def invalidate(self, bot_id: str) -> None:
+        self.cache.pop(bot_id)
+
+    def _apply_change(self, change: Dict) -> None:
+        bot_id = str(change.get("documentKey", {}).get("_id"))
+        self.invalidate(bot_id)
+        updated_fields = change.get("updateDescription", {}).get("updatedFields", {})
+        if change.get("operationType") != "update" or any(
+            field in updated_fields
+            for field in ("prompt", "tools", "answer_cache_version")
+        ):
+            semantic_answer_cache.invalidate(bot_id)
+
+    def _clear(self) -> None:
+        self.cache.clear()
+        semantic_answer_cache.clear()
+
+    async def watch(self):
+        """Invalidate entries from the Mongo change stream until cancelled.
+
+        After an error the stream is reopened with exponential backoff,
+        resuming after the last change seen. Changes may have been missed
+        when it cannot resume, so both caches are cleared then.
+        """
+        resume_token = None
+        delay = BOT_WATCH_RETRY_SECONDS
+        interrupted = False
+        while True:
+            opened = False
+            try:
+                async with self.collection.watch(resume_after=resume_token) as stream:
+                    opened = True
+                    if interrupted and resume_token is None:
+                        # Nothing to resume from, anything since the error is lost
+                        self._clear()
+                    interrupted = False
+                    delay = BOT_WATCH_RETRY_SECONDS
+                    logger.info("Listening to bot changes for cache invalidation")
+                    async for change in stream:
+                        self._apply_change(change)
+                        resume_token = stream.resume_token
+            except OperationFailure as e:
+                if e.code == CHANGE_STREAM_UNSUPPORTED:
+                    logger.warning(f"Bot change stream unavailable, relying on TTL: {e}")
+                    return
+                resume_token = self._on_watch_error(e, opened, resume_token, delay)
+            except PyMongoError as e:
+                resume_token = self._on_watch_error(e, opened, resume_token, delay)
+            interrupted = True
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, BOT_WATCH_MAX_RETRY_SECONDS)
+
+    def _on_watch_error(
+        self, error: Exception, opened: bool, resume_token: Optional[Dict], delay: float
+    ) -> Optional[Dict]:
+        """Log a change stream error, returning the token to resume from."""
+        if not opened and resume_token is not None:
+            logger.warning(f"Cannot resume bot change stream, clearing caches: {error}")
+            self._clear()
+            return None
+        logger.warning(f"Bot change stream interrupted, retrying in {delay:.0f}s: {error}")
+        return resume_token
+
+    def start_watching(self):
+        if self._watch_task is None:
+            self._watch_task = asyncio.create_task(self.watch())
+
+    async def stop_watching(self):
+        if self._watch_task is not None:
+            self._watch_task.cancel()
+            try:
+                await self._watch_task
+            except asyncio.CancelledError:
+                pass
+            self._watch_task = None
+
+
+bot_config_cache = BotConfigCache(bot_crud.collection)
@@ -0,0 +1,342 @@
+import os
+import random
+import uuid
+from datetime import timedelta
+from typing import Any, AsyncIterator, Dict, List, Optional, Sequence
+from motor.motor_asyncio import AsyncIOMotorCollection
+from pymongo import UpdateOne
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+    WRITES_IDX_MAP,
+    get_checkpoint_id,
+    get_checkpoint_metadata,
+)
+from src.config.mongo import database
+from src.utils.cache import LRUCache
+from src.utils.logger import get_date_time
+
+CHECKPOINT_TTL_SECONDS = int(os.getenv("CHECKPOINT_TTL_SECONDS", str(7 * 24 * 3600)))
+CHECKPOINT_CACHE_SIZE = int(os.getenv("CHECKPOINT_CACHE_SIZE", "1000"))
+# Serialized bytes of checkpoints and writes kept in memory across all threads
+CHECKPOINT_CACHE_BYTES = int(os.getenv("CHECKPOINT_CACHE_BYTES", str(64 << 20)))
+
+
+def build_thread_id(
+    agent: str, user_id: str, conversation_id: Optional[str] = None
+) -> str:
+    """Namespace a conversation by agent and owner so threads never collide.
+
+    A random conversation id is generated when none is given.
+    """
+    return f"{agent}:{user_id}:{conversation_id or uuid.uuid4().hex}"
+
+
+class MongoCheckpointSaver(BaseCheckpointSaver[str]):
+    """LangGraph checkpointer persisted in MongoDB with an LRU hot tier.
+
+    Checkpoints and pending writes live in two collections and expire through a
+    TTL index on `expire_at`. The latest checkpoint of recently active threads
+    is kept (serialized) in memory, bounded by count and bytes. A cached entry
+    is only served after a projected query confirms it is still the thread's
+    latest checkpoint with the same writes (`writes_seq` is bumped by every
+    put_writes), so workers sharing the collections never read stale state
+    and a hit skips loading the checkpoint and its writes.
+    """
+
+    def __init__(
+        self,
+        checkpoints: AsyncIOMotorCollection,
+        writes: AsyncIOMotorCollection,
+        ttl_seconds: int = CHECKPOINT_TTL_SECONDS,
+        cache_size: int = CHECKPOINT_CACHE_SIZE,
+        cache_bytes: int = CHECKPOINT_CACHE_BYTES,
+        serde=None,
+    ):
+        super().__init__(serde=serde)
+        self.checkpoints = checkpoints
+        self.writes = writes
+        self.ttl_seconds = ttl_seconds
+        self.hot = LRUCache(
+            cache_size,
+            ttl=ttl_seconds,
+            name="checkpoint",
+            maxbytes=cache_bytes,
+            sizeof=self._cached_size,
+        )
+        self._index_created = False
+
+    async def _ensure_indexes(self):
+        """Ensure lookup and TTL indexes exist"""
+        if self._index_created:
+            return
+        await self.checkpoints.create_index(
+            [("thread_id", 1), ("checkpoint_ns", 1), ("checkpoint_id", -1)],
+            unique=True,
+        )
+        await self.writes.create_index(
+            [
+                ("thread_id", 1),
+                ("checkpoint_ns", 1),
+                ("checkpoint_id", 1),
+                ("task_id", 1),
+                ("idx", 1),
+            ],
+            unique=True,
+        )
+        await self.checkpoints.create_index("expire_at", expireAfterSeconds=0)
+        await self.writes.create_index("expire_at", expireAfterSeconds=0)
+        self._index_created = True
+
+    def _expire_at(self):
+        return get_date_time().replace(tzinfo=None) + timedelta(
+            seconds=self.ttl_seconds
+        )
+
+    @staticmethod
+    def _cached_size(entry: tuple) -> int:
+        doc, write_docs = entry
+        return (
+            len(doc["checkpoint"])
+            + len(doc["metadata"])
+            + sum(len(write["value"]) for write in write_docs)
+        )
+
+    async def _is_latest(self, doc: Dict) -> bool:
+        """Whether a cached checkpoint is still the newest of its thread, unchanged."""
+        latest = await self.checkpoints.find_one(
+            {"thread_id": doc["thread_id"], "checkpoint_ns": doc["checkpoint_ns"]},
+            projection={"_id": 0, "checkpoint_id": 1, "writes_seq": 1},
+            sort=[("checkpoint_id", -1)],
+        )
+        return (
+            latest is not None
+            and latest["checkpoint_id"] == doc["checkpoint_id"]
+            and latest.get("writes_seq", 0) == doc.get("writes_seq", 0)
+        )
+
+    def _load_tuple(self, doc: Dict, write_docs: List[Dict]) -> CheckpointTuple:
+        thread_id = doc["thread_id"]
+        checkpoint_ns = doc["checkpoint_ns"]
+        parent_checkpoint_id = doc.get("parent_checkpoint_id")
+        return CheckpointTuple(
+            config={
+                "configurable": {
+                    "thread_id": thread_id,
+                    "checkpoint_ns": checkpoint_ns,
+                    "checkpoint_id": doc["checkpoint_id"],
+                }
+            },
+            checkpoint=self.serde.loads_typed((doc["type"], doc["checkpoint"])),
+            metadata=self.serde.loads_typed((doc["metadata_type"], doc["metadata"])),
+            parent_config=(
+                {
+                    "configurable": {
+                        "thread_id": thread_id,
+                        "checkpoint_ns": checkpoint_ns,
+                        "checkpoint_id": parent_checkpoint_id,
+                    }
+                }
+                if parent_checkpoint_id
+                else None
+            ),
+            pending_writes=[
+                (
+                    write["task_id"],
+                    write["channel"],
+                    self.serde.loads_typed((write["type"], write["value"])),
+                )
+                for write in write_docs
+            ],
+        )
+
+    async def _read_writes(
+        self, thread_id: str, checkpoint_ns: str, checkpoint_id: str
+    ) -> List[Dict]:
+        cursor = self.writes.find(
+            {
+                "thread_id": thread_id,
+                "checkpoint_ns": checkpoint_ns,
+                "checkpoint_id": checkpoint_id,
+            }
+        ).sort([("task_id", 1), ("idx", 1)])
+        return [write async for write in cursor]
+
+    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        configurable = config["configurable"]
+        thread_id = configurable["thread_id"]
+        checkpoint_ns = configurable.get("checkpoint_ns", "")
+        checkpoint_id = get_checkpoint_id(config)
+
+        if not checkpoint_id:
+            cached = self.hot.get((thread_id, checkpoint_ns))
+            if cached and await self._is_latest(cached[0]):
+                return self._load_tuple(*cached)
+
+        query = {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns}
+        if checkpoint_id:
+            query["checkpoint_id"] = checkpoint_id
+        doc = await self.checkpoints.find_one(query, sort=[("checkpoint_id", -1)])
+        if not doc:
+            return None
+        write_docs = await self._read_writes(
+            thread_id, checkpoint_ns, doc["checkpoint_id"]
+        )
+        if not checkpoint_id:
+            self.hot.set((thread_id, checkpoint_ns), (doc, write_docs))
+        return self._load_tuple(doc, write_docs)
+
+    async def alist(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> AsyncIterator[CheckpointTuple]:
+        query: Dict[str, Any] = {}
+        if config:
+            configurable = config["configurable"]
+            query["thread_id"] = configurable["thread_id"]
+            if "checkpoint_ns" in configurable:
+                query["checkpoint_ns"] = configurable["checkpoint_ns"]
+            if checkpoint_id := get_checkpoint_id(config):
+                query["checkpoint_id"] = checkpoint_id
+        if before and (before_id := get_checkpoint_id(before)):
+            query["checkpoint_id"] = {"$lt": before_id}
+
+        count = 0
+        cursor = self.checkpoints.find(query).sort("checkpoint_id", -1)
+        async for doc in cursor:
+            if limit is not None and count >= limit:
+                break
+            write_docs = await self._read_writes(
+                doc["thread_id"], doc["checkpoint_ns"], doc["checkpoint_id"]
+            )
+            checkpoint_tuple = self._load_tuple(doc, write_docs)
+            # Metadata is stored serialized, so filtering happens here
+            if filter and not all(
+                checkpoint_tuple.metadata.get(key) == value
+                for key, value in filter.items()
+            ):
+                continue
+            count += 1
+            yield checkpoint_tuple
+
+    async def aput(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        await self._ensure_indexes()
+        configurable = config["configurable"]
+        thread_id = configurable["thread_id"]
+        checkpoint_ns = configurable.get("checkpoint_ns", "")
+        type_, serialized_checkpoint = self.serde.dumps_typed(checkpoint)
+        metadata_type, serialized_metadata = self.serde.dumps_typed(
+            get_checkpoint_metadata(config, metadata)
+        )
+        doc = {
+            "thread_id": thread_id,
+            "checkpoint_ns": checkpoint_ns,
+            "checkpoint_id": checkpoint["id"],
+            "parent_checkpoint_id": configurable.get("checkpoint_id"),
+            "type": type_,
+            "checkpoint": serialized_checkpoint,
+            "metadata_type": metadata_type,
+            "metadata": serialized_metadata,
+            "expire_at": self._expire_at(),
+        }
+        await self.checkpoints.update_one(
+            {
+                "thread_id": thread_id,
+                "checkpoint_ns": checkpoint_ns,
+                "checkpoint_id": checkpoint["id"],
+            },
+            {"$set": doc},
+            upsert=True,
+        )
+        self.hot.set((thread_id, checkpoint_ns), (doc, []))
+        return {
+            "configurable": {
+                "thread_id": thread_id,
+                "checkpoint_ns": checkpoint_ns,
+                "checkpoint_id": checkpoint["id"],
+            }
+        }
+
+    async def aput_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        await self._ensure_indexes()
+        configurable = config["configurable"]
+        thread_id = configurable["thread_id"]
+        checkpoint_ns = configurable.get("checkpoint_ns", "")
+        checkpoint_id = configurable["checkpoint_id"]
+        expire_at = self._expire_at()
+
+        operations = []
+        for idx, (channel, value) in enumerate(writes):
+            write_idx = WRITES_IDX_MAP.get(channel, idx)
+            type_, serialized_value = self.serde.dumps_typed(value)
+            key = {
+                "thread_id": thread_id,
+                "checkpoint_ns": checkpoint_ns,
+                "checkpoint_id": checkpoint_id,
+                "task_id": task_id,
+                "idx": write_idx,
+            }
+            fields = {
+                "task_path": task_path,
+                "channel": channel,
+                "type": type_,
+                "value": serialized_value,
+                "expire_at": expire_at,
+            }
+            # Special writes (errors, interrupts) overwrite, regular ones are kept
+            operator = "$set" if write_idx < 0 else "$setOnInsert"
+            operations.append(UpdateOne(key, {operator: fields}, upsert=True))
+
+        if operations:
+            await self.writes.bulk_write(operations, ordered=False)
+            # Tells other workers their cached copy misses these writes
+            await self.checkpoints.update_one(
+                {
+                    "thread_id": thread_id,
+                    "checkpoint_ns": checkpoint_ns,
+                    "checkpoint_id": checkpoint_id,
+                },
+                {"$inc": {"writes_seq": 1}},
+            )
+        self.hot.pop((thread_id, checkpoint_ns))
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        await self.checkpoints.delete_many({"thread_id": thread_id})
+        await self.writes.delete_many({"thread_id": thread_id})
+        self.hot.pop_where(lambda key: key[0] == thread_id)
+
+    def get_next_version(self, current: Optional[str], channel: None) -> str:
+        if current is None:
+            current_v = 0
+        elif isinstance(current, int):
+            current_v = current
+        else:
+            current_v = int(current.split(".")[0])
+        next_v = current_v + 1
+        next_h = random.random()
+        return f"{next_v:032}.{next_h:016}"
+
+
+checkpointer = MongoCheckpointSaver(
+    database["checkpoints"], database["checkpoint_writes"]
+)
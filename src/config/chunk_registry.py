@@ -0,0 +1,148 @@
+import os
+import hashlib
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+from langchain_core.documents import Document
+from motor.motor_asyncio import AsyncIOMotorCollection
+from pymongo import UpdateOne
+from src.apis.models.chunk_models import Chunk
+from src.config.mongo import database
+from src.config.monitoring import increment_database_queries
+
+CHUNK_REGISTRY_BATCH_SIZE = int(os.getenv("CHUNK_REGISTRY_BATCH_SIZE", "1000"))
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class ChunkRegistry:
+    """Mongo collection recording every chunk written to the vector store.
+
+    The vector store cannot enumerate a bot's chunks cheaply, so listing,
+    paging and deletes read chunk ids from here instead of issuing an empty
+    similarity search.
+    """
+
+    def __init__(self, collection: AsyncIOMotorCollection):
+        self.collection = collection
+        self._index_created = False
+
+    async def _ensure_indexes(self):
+        if self._index_created:
+            return
+        await self.collection.create_index("chunk_id", unique=True)
+        await self.collection.create_index(
+            [("bot_id", 1), ("created_at", 1), ("chunk_id", 1)]
+        )
+        await self.collection.create_index([("bot_id", 1), ("source", 1)])
+        self._index_created = True
+
+    async def register(self, documents: List[Document], ids: List[str]) -> None:
+        """Upsert one entry per chunk; documents without a bot_id are skipped."""
+        await self._ensure_indexes()
+        operations = []
+        for chunk_id, document in zip(ids, documents):
+            bot_id = document.metadata.get("bot_id")
+            if not bot_id:
+                continue
+            chunk = Chunk(
+                chunk_id=chunk_id,
+                bot_id=bot_id,
+                source=document.metadata.get("source"),
+                content_hash=document.metadata.get("content_hash")
+                or content_hash(document.page_content),
+                page=document.metadata.get("page"),
+                start_index=document.metadata.get("start_index"),
+            ).model_dump(exclude={"expire_at", "updated_at"})
+            created_at = chunk.pop("created_at")
+            operations.append(
+                UpdateOne(
+                    {"chunk_id": chunk_id},
+                    {"$set": chunk, "$setOnInsert": {"created_at": created_at}},
+                    upsert=True,
+                )
+            )
+        for start in range(0, len(operations), CHUNK_REGISTRY_BATCH_SIZE):
+            increment_database_queries(operation="write", collection="chunks")
+            await self.collection.bulk_write(
+                operations[start : start + CHUNK_REGISTRY_BATCH_SIZE], ordered=False
+            )
+
+    async def unregister(self, ids: List[str]) -> int:
+        deleted = 0
+        for start in range(0, len(ids), CHUNK_REGISTRY_BATCH_SIZE):
+            increment_database_queries(operation="delete", collection="chunks")
+            result = await self.collection.delete_many(
+                {"chunk_id": {"$in": ids[start : start + CHUNK_REGISTRY_BATCH_SIZE]}}
+            )
+            deleted += result.deleted_count
+        return deleted
+
+    async def drop_bot(self, bot_id: str) -> int:
+        increment_database_queries(operation="delete", collection="chunks")
+        result = await self.collection.delete_many({"bot_id": bot_id})
+        return result.deleted_count
+
+    async def count(self, bot_id: str) -> int:
+        increment_database_queries(operation="read", collection="chunks")
+        return await self.collection.count_documents({"bot_id": bot_id})
+
+    async def list(
+        self,
+        bot_id: str,
+        skip: int = 0,
+        limit: int = 0,
+        source: Optional[str] = None,
+    ) -> List[Dict]:
+        """Entries of a bot in insertion order, `limit=0` returning all of them."""
+        increment_database_queries(operation="read", collection="chunks")
+        query = {"bot_id": bot_id}
+        if source is not None:
+            query["source"] = source
+        cursor = (
+            self.collection.find(query, {"_id": 0})
+            .sort([("created_at", 1), ("chunk_id", 1)])
+            .skip(skip)
+            .limit(limit)
+        )
+        return [doc async for doc in cursor]
+
+    async def list_after(
+        self,
+        bot_id: str,
+        after: Optional[Tuple[datetime, str]] = None,
+        limit: int = CHUNK_REGISTRY_BATCH_SIZE,
+    ) -> List[Dict]:
+        """Entries of a bot following the (created_at, chunk_id) position `after`."""
+        increment_database_queries(operation="read", collection="chunks")
+        query: Dict = {"bot_id": bot_id}
+        if after is not None:
+            created_at, chunk_id = after
+            query["$or"] = [
+                {"created_at": {"$gt": created_at}},
+                {"created_at": created_at, "chunk_id": {"$gt": chunk_id}},
+            ]
+        cursor = (
+            self.collection.find(query, {"_id": 0})
+            .sort([("created_at", 1), ("chunk_id", 1)])
+            .limit(limit)
+        )
+        return [doc async for doc in cursor]
+
+    async def chunk_ids(
+        self,
+        bot_id: str,
+        ids: Optional[List[str]] = None,
+        limit: int = CHUNK_REGISTRY_BATCH_SIZE,
+    ) -> List[str]:
+        """Up to `limit` chunk ids of a bot, restricted to `ids` when given."""
+        increment_database_queries(operation="read", collection="chunks")
+        query: Dict = {"bot_id": bot_id}
+        if ids is not None:
+            query["chunk_id"] = {"$in": ids}
+        cursor = self.collection.find(query, {"_id": 0, "chunk_id": 1}).limit(limit)
+        return [doc["chunk_id"] async for doc in cursor]
+
+
+chunk_registry = ChunkRegistry(database["chunks"])
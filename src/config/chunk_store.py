@@ -0,0 +1,323 @@
+import os
+import json
+import uuid
+import fcntl
+import asyncio
+import threading
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from typing import Dict, Iterable, List, Optional
+import zstandard
+from bson import Binary
+from motor.motor_asyncio import AsyncIOMotorCollection
+from pymongo import ReplaceOne
+from src.config.mongo import database
+from src.config.monitoring import increment_database_queries
+from src.utils.logger import BASE_DIR, logger
+
+# "" keeps chunk text in the vector metadata, "local" or "mongo" moves it out
+CHUNK_TEXT_STORE = os.getenv("CHUNK_TEXT_STORE", "")
+CHUNK_TEXT_DIR = os.getenv(
+    "CHUNK_TEXT_DIR", os.path.join(BASE_DIR, "cache", "chunk_texts")
+)
+CHUNK_TEXT_ZSTD_LEVEL = int(os.getenv("CHUNK_TEXT_ZSTD_LEVEL", "3"))
+CHUNK_TEXT_BATCH_SIZE = int(os.getenv("CHUNK_TEXT_BATCH_SIZE", "1000"))
+# Rewrite a bot's pack file once this share of its bytes belongs to deleted chunks
+CHUNK_TEXT_COMPACT_RATIO = float(os.getenv("CHUNK_TEXT_COMPACT_RATIO", "0.5"))
+PACK_FILE = "texts.zst"
+INDEX_FILE = "index.jsonl"
+LOCK_FILE = "pack.lock"
+
+
+def compress(text: str, level: int = CHUNK_TEXT_ZSTD_LEVEL) -> bytes:
+    return zstandard.compress(text.encode("utf-8"), level)
+
+
+def decompress(data: bytes) -> str:
+    return zstandard.decompress(data).decode("utf-8")
+
+
+class ChunkTextStore(ABC):
+    """Chunk bodies kept outside the vector store, zstd-compressed and keyed by chunk id."""
+
+    @abstractmethod
+    async def put(self, bot_id: str, texts: Dict[str, str]) -> None: ...
+
+    @abstractmethod
+    async def get(self, bot_id: str, ids: List[str]) -> Dict[str, str]: ...
+
+    @abstractmethod
+    async def delete(self, bot_id: str, ids: List[str]) -> None: ...
+
+    @abstractmethod
+    async def drop_bot(self, bot_id: str) -> None: ...
+
+
+class TextPack:
+    """Append-only file of one bot's compressed chunk bodies.
+
+    `index.jsonl` records the offset and size of every body written plus
+    tombstones for deleted ids, after a first line naming its generation.
+    Once CHUNK_TEXT_COMPACT_RATIO of the pack
+    is dead bytes, from deletes or from bodies rewritten under the same id,
+    the pack is compacted. Processes on one host share a pack through an
+    flock on `pack.lock`: writers hold it exclusively, readers shared, and
+    each first replays the index lines other processes appended, or the
+    whole index when its generation changed (compacted or recreated).
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.pack_path = os.path.join(directory, PACK_FILE)
+        self.index_path = os.path.join(directory, INDEX_FILE)
+        self.lock_path = os.path.join(directory, LOCK_FILE)
+        # chunk id -> (offset, size)
+        self.entries: Dict[str, tuple] = {}
+        self.dead_bytes = 0
+        # Generation of the index file read and how far into it
+        self._generation: Optional[str] = None
+        self._index_offset = 0
+        self.lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    @contextmanager
+    def _locked(self, exclusive: bool):
+        with self.lock, open(self.lock_path, "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            try:
+                self._refresh()
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _reset(self, generation: Optional[str] = None, offset: int = 0) -> None:
+        self.entries, self.dead_bytes = {}, 0
+        self._generation, self._index_offset = generation, offset
+
+    def _refresh(self):
+        try:
+            index = open(self.index_path, "rb")
+        except FileNotFoundError:
+            self._reset()
+            return
+        with index:
+            header = index.readline()
+            generation = json.loads(header)["generation"] if header else None
+            if generation != self._generation:
+                # Compacted or recreated by another process: replay from the start
+                self._reset(generation, index.tell())
+            index.seek(self._index_offset)
+            for line in index:
+                self._apply(json.loads(line))
+            self._index_offset = index.tell()
+
+    def _apply(self, record: Dict) -> None:
+        previous = self.entries.pop(record.get("deleted") or record["id"], None)
+        if previous is not None:
+            self.dead_bytes += previous[1]
+        if "deleted" not in record:
+            self.entries[record["id"]] = (record["offset"], record["size"])
+
+    @staticmethod
+    def _header() -> Dict:
+        return {"generation": uuid.uuid4().hex}
+
+    def _append_index(self, records: List[Dict]) -> None:
+        with open(self.index_path, "ab") as index:
+            if index.tell() == 0:
+                header = self._header()
+                index.write((json.dumps(header) + "\n").encode("utf-8"))
+                self._reset(header["generation"])
+            index.writelines(
+                (json.dumps(record) + "\n").encode("utf-8") for record in records
+            )
+            offset = index.tell()
+        for record in records:
+            self._apply(record)
+        # Our own lines are applied already, skip them on the next refresh
+        self._index_offset = offset
+
+    @property
+    def live_bytes(self) -> int:
+        return sum(size for _, size in self.entries.values())
+
+    def _compact_if_needed(self) -> None:
+        total = self.dead_bytes + self.live_bytes
+        if total and self.dead_bytes / total >= CHUNK_TEXT_COMPACT_RATIO:
+            self._compact()
+
+    def put(self, texts: Dict[str, str]) -> None:
+        blobs = {chunk_id: compress(text) for chunk_id, text in texts.items()}
+        with self._locked(exclusive=True):
+            with open(self.pack_path, "ab") as pack:
+                offset = pack.tell()
+                records = []
+                for chunk_id, blob in blobs.items():
+                    pack.write(blob)
+                    records.append({"id": chunk_id, "offset": offset, "size": len(blob)})
+                    offset += len(blob)
+            # Bodies land before the index lines that point at them
+            self._append_index(records)
+            # Re-upserted ids leave their previous bodies behind as dead bytes
+            self._compact_if_needed()
+
+    def get(self, ids: Iterable[str]) -> Dict[str, str]:
+        with self._locked(exclusive=False):
+            wanted = sorted(
+                (self.entries[chunk_id], chunk_id)
+                for chunk_id in ids
+                if chunk_id in self.entries
+            )
+            if not wanted:
+                return {}
+            blobs = {}
+            with open(self.pack_path, "rb") as pack:
+                for (offset, size), chunk_id in wanted:
+                    pack.seek(offset)
+                    blobs[chunk_id] = pack.read(size)
+        return {chunk_id: decompress(blob) for chunk_id, blob in blobs.items()}
+
+    def delete(self, ids: Iterable[str]) -> None:
+        with self._locked(exclusive=True):
+            deleted = [chunk_id for chunk_id in dict.fromkeys(ids) if chunk_id in self.entries]
+            if not deleted:
+                return
+            self._append_index([{"deleted": chunk_id} for chunk_id in deleted])
+            self._compact_if_needed()
+
+    def clear(self) -> None:
+        with self._locked(exclusive=True):
+            for path in (self.pack_path, self.index_path):
+                if os.path.exists(path):
+                    os.remove(path)
+            self._refresh()
+
+    def _compact(self):
+        pack_tmp, index_tmp = f"{self.pack_path}.tmp", f"{self.index_path}.tmp"
+        entries, header = {}, self._header()
+        with open(self.pack_path, "rb") as source, open(pack_tmp, "wb") as pack, open(
+            index_tmp, "w", encoding="utf-8"
+        ) as index:
+            index.write(json.dumps(header) + "\n")
+            for chunk_id, (offset, size) in sorted(
+                self.entries.items(), key=lambda item: item[1]
+            ):
+                source.seek(offset)
+                entries[chunk_id] = (pack.tell(), size)
+                index.write(
+                    json.dumps({"id": chunk_id, "offset": pack.tell(), "size": size})
+                    + "\n"
+                )
+                pack.write(source.read(size))
+        os.replace(pack_tmp, self.pack_path)
+        os.replace(index_tmp, self.index_path)
+        logger.info(
+            f"Compacted {self.directory}: dropped {self.dead_bytes} dead bytes"
+        )
+        self._reset(header["generation"], os.path.getsize(self.index_path))
+        self.entries = entries
+
+
+class LocalChunkTextStore(ChunkTextStore):
+    """One pack file per bot under `directory`.
+
+    Safe for several processes on the host that owns `directory`; the file
+    locks are not meant for a volume shared between hosts, use the "mongo"
+    store there.
+    """
+
+    def __init__(self, directory: str = CHUNK_TEXT_DIR):
+        self.directory = directory
+        self.packs: Dict[str, TextPack] = {}
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def pack(self, bot_id: str) -> TextPack:
+        with self._lock:
+            pack = self.packs.get(bot_id)
+            if pack is None:
+                pack = TextPack(os.path.join(self.directory, bot_id))
+                self.packs[bot_id] = pack
+            return pack
+
+    async def put(self, bot_id: str, texts: Dict[str, str]) -> None:
+        await asyncio.to_thread(self.pack(bot_id).put, texts)
+
+    async def get(self, bot_id: str, ids: List[str]) -> Dict[str, str]:
+        return await asyncio.to_thread(self.pack(bot_id).get, ids)
+
+    async def delete(self, bot_id: str, ids: List[str]) -> None:
+        await asyncio.to_thread(self.pack(bot_id).delete, ids)
+
+    async def drop_bot(self, bot_id: str) -> None:
+        await asyncio.to_thread(self.pack(bot_id).clear)
+
+
+class MongoChunkTextStore(ChunkTextStore):
+    """Compressed bodies in a Mongo collection, one document per chunk."""
+
+    def __init__(self, collection: AsyncIOMotorCollection):
+        self.collection = collection
+        self._index_created = False
+
+    async def put(self, bot_id: str, texts: Dict[str, str]) -> None:
+        if not self._index_created:
+            await self.collection.create_index("bot_id")
+            self._index_created = True
+        blobs = await asyncio.to_thread(
+            lambda: {chunk_id: compress(text) for chunk_id, text in texts.items()}
+        )
+        operations = [
+            ReplaceOne(
+                {"_id": chunk_id},
+                {"_id": chunk_id, "bot_id": bot_id, "text": Binary(blob)},
+                upsert=True,
+            )
+            for chunk_id, blob in blobs.items()
+        ]
+        for start in range(0, len(operations), CHUNK_TEXT_BATCH_SIZE):
+            increment_database_queries(operation="write", collection="chunk_texts")
+            await self.collection.bulk_write(
+                operations[start : start + CHUNK_TEXT_BATCH_SIZE], ordered=False
+            )
+
+    async def get(self, bot_id: str, ids: List[str]) -> Dict[str, str]:
+        blobs = {}
+        for start in range(0, len(ids), CHUNK_TEXT_BATCH_SIZE):
+            increment_database_queries(operation="read", collection="chunk_texts")
+            cursor = self.collection.find(
+                {
+                    "_id": {"$in": ids[start : start + CHUNK_TEXT_BATCH_SIZE]},
+                    "bot_id": bot_id,
+                },
+                {"text": 1},
+            )
+            async for document in cursor:
+                blobs[document["_id"]] = bytes(document["text"])
+        return await asyncio.to_thread(
+            lambda: {chunk_id: decompress(blob) for chunk_id, blob in blobs.items()}
+        )
+
+    async def delete(self, bot_id: str, ids: List[str]) -> None:
+        for start in range(0, len(ids), CHUNK_TEXT_BATCH_SIZE):
+            increment_database_queries(operation="delete", collection="chunk_texts")
+            await self.collection.delete_many(
+                {"_id": {"$in": ids[start : start + CHUNK_TEXT_BATCH_SIZE]}}
+            )
+
+    async def drop_bot(self, bot_id: str) -> None:
+        increment_database_queries(operation="delete", collection="chunk_texts")
+        await self.collection.delete_many({"bot_id": bot_id})
+
+
+def build_chunk_text_store(kind: str = CHUNK_TEXT_STORE) -> Optional[ChunkTextStore]:
+    if not kind:
+        return None
+    if kind == "local":
+        return LocalChunkTextStore()
+    if kind == "mongo":
+        return MongoChunkTextStore(database["chunk_texts"])
+    raise ValueError(f"Unsupported chunk text store: {kind}")
+
+
+chunk_text_store = build_chunk_text_store()
@@ -0,0 +1,174 @@
+import os
+import asyncio
+import hashlib
+import sqlite3
+import threading
+import unicodedata
+from typing import Dict, List, Optional
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from src.config.monitoring import increment_cache_request
+from src.utils.cache import LRUCache
+from src.utils.logger import BASE_DIR
+
+EMBEDDING_CACHE_SIZE = int(os.getenv("EMBEDDING_CACHE_SIZE", "10000"))
+EMBEDDING_CACHE_PATH = os.getenv(
+    "EMBEDDING_CACHE_PATH", os.path.join(BASE_DIR, "cache", "embeddings.sqlite3")
+)
+# Rows kept on disk, the oldest writes are evicted first (768-d vectors take ~3KB)
+EMBEDDING_CACHE_MAX_ROWS = int(os.getenv("EMBEDDING_CACHE_MAX_ROWS", "200000"))
+# SQLite limits the number of bound parameters per statement
+SQLITE_BATCH_SIZE = 500
+
+
+def normalize_text(text: str) -> str:
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+
+class CachedEmbeddings(Embeddings):
+    """Two-level (memory LRU + SQLite) cache in front of an embedding model.
+
+    Keys are sha256 of the model name, the task ("query" or "document", since
+    the model embeds them differently) and the whitespace/Unicode normalized
+    text. Vectors are held as float32 arrays and turned into lists only when
+    returned. The SQLite file keeps at most `max_rows` vectors, dropping the
+    oldest writes. Pass `path=None` to keep the cache in memory only.
+    """
+
+    def __init__(
+        self,
+        underlying: Embeddings,
+        model: str,
+        path: Optional[str] = EMBEDDING_CACHE_PATH,
+        maxsize: int = EMBEDDING_CACHE_SIZE,
+        max_rows: int = EMBEDDING_CACHE_MAX_ROWS,
+    ):
+        self.underlying = underlying
+        self.model = model
+        self.max_rows = max_rows
+        self.memory = LRUCache(maxsize, name="embedding_memory")
+        self._lock = threading.Lock()
+        self._conn = None
+        if path:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            self._conn = sqlite3.connect(path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB)"
+            )
+            self._conn.commit()
+
+    def _key(self, task: str, text: str) -> str:
+        return hashlib.sha256(
+            f"{self.model}\n{task}\n{normalize_text(text)}".encode("utf-8")
+        ).hexdigest()
+
+    def _disk_get(self, keys: List[str]) -> Dict[str, np.ndarray]:
+        found = {}
+        if self._conn is None or not keys:
+            return found
+        with self._lock:
+            for start in range(0, len(keys), SQLITE_BATCH_SIZE):
+                batch = keys[start : start + SQLITE_BATCH_SIZE]
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({','.join('?' * len(batch))})",
+                    batch,
+                ).fetchall()
+                for key, vector in rows:
+                    found[key] = np.frombuffer(vector, dtype=np.float32)
+        return found
+
+    def _disk_put(self, items: Dict[str, np.ndarray]) -> None:
+        if self._conn is None or not items:
+            return
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, vector) VALUES (?, ?)",
+                [(key, vector.tobytes()) for key, vector in items.items()],
+            )
+            # Writes get increasing rowids, so this drops the oldest beyond max_rows
+            self._conn.execute(
+                "DELETE FROM embeddings WHERE rowid <= "
+                "(SELECT MAX(rowid) FROM embeddings) - ?",
+                (self.max_rows,),
+            )
+            self._conn.commit()
+
+    def _disk_lookup(self, keys: List[str]) -> Dict[str, np.ndarray]:
+        """Read memory misses from disk and promote the hits to memory."""
+        if self._conn is None or not keys:
+            return {}
+        found = self._disk_get(keys)
+        for key in keys:
+            increment_cache_request("embedding_disk", "hit" if key in found else "miss")
+            if key in found:
+                self.memory.set(key, found[key])
+        return found
+
+    def _lookup(self, keys: List[str]) -> List[Optional[np.ndarray]]:
+        vectors = [self.memory.get(key) for key in keys]
+        from_disk = self._disk_lookup(
+            [key for key, vector in zip(keys, vectors) if vector is None]
+        )
+        return [
+            vector if vector is not None else from_disk.get(key)
+            for key, vector in zip(keys, vectors)
+        ]
+
+    def _store(self, keys: List[str], vectors: List[List[float]]) -> List[np.ndarray]:
+        arrays = [np.asarray(vector, dtype=np.float32) for vector in vectors]
+        for key, vector in zip(keys, arrays):
+            self.memory.set(key, vector)
+        self._disk_put(dict(zip(keys, arrays)))
+        return arrays
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys = [self._key("document", text) for text in texts]
+        vectors = self._lookup(keys)
+        missing = [i for i, vector in enumerate(vectors) if vector is None]
+        if missing:
+            computed = self.underlying.embed_documents([texts[i] for i in missing])
+            computed = self._store([keys[i] for i in missing], computed)
+            for i, vector in zip(missing, computed):
+                vectors[i] = vector
+        return [vector.tolist() for vector in vectors]
+
+    def embed_query(self, text: str) -> List[float]:
+        key = self._key("query", text)
+        vector = self._lookup([key])[0]
+        if vector is None:
+            vector = self._store([key], [self.underlying.embed_query(text)])[0]
+        return vector.tolist()
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys = [self._key("document", text) for text in texts]
+        vectors = [self.memory.get(key) for key in keys]
+        from_disk = await asyncio.to_thread(
+            self._disk_lookup,
+            [key for key, vector in zip(keys, vectors) if vector is None],
+        )
+        vectors = [
+            vector if vector is not None else from_disk.get(key)
+            for key, vector in zip(keys, vectors)
+        ]
+        missing = [i for i, vector in enumerate(vectors) if vector is None]
+        if missing:
+            computed = await self.underlying.aembed_documents(
+                [texts[i] for i in missing]
+            )
+            computed = await asyncio.to_thread(
+                self._store, [keys[i] for i in missing], computed
+            )
+            for i, vector in zip(missing, computed):
+                vectors[i] = vector
+        return [vector.tolist() for vector in vectors]
+
+    async def aembed_query(self, text: str) -> List[float]:
+        key = self._key("query", text)
+        vector = self.memory.get(key)
+        if vector is None:
+            vector = (await asyncio.to_thread(self._disk_lookup, [key])).get(key)
+        if vector is None:
+            vector = await self.underlying.aembed_query(text)
+            vector = (await asyncio.to_thread(self._store, [key], [vector]))[0]
+        return vector.tolist()
@@ -0,0 +1,158 @@
+import os
+import time
+import asyncio
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+from motor.motor_asyncio import AsyncIOMotorCollection
+from src.apis.models.chunk_models import EmbeddingRoute
+from src.config.mongo import database
+from src.config.monitoring import increment_database_queries
+from src.utils.logger import get_date_time, logger
+
+# How stale a process' view of the routes may get; a flip is seen within this delay
+EMBEDDING_ROUTES_REFRESH_SECONDS = float(
+    os.getenv("EMBEDDING_ROUTES_REFRESH_SECONDS", "30")
+)
+
+
+class EmbeddingRoutes:
+    """Per-bot embedding model and namespace, for bots moved off the defaults.
+
+    A route serves reads from `model`/`namespace` and, while the bot is being
+    re-embedded, names the `target_model`/`target_namespace` that writes are
+    mirrored to. Routes are cached in memory and re-read from Mongo at most
+    every `refresh_seconds`.
+    """
+
+    def __init__(
+        self,
+        collection: AsyncIOMotorCollection,
+        refresh_seconds: float = EMBEDDING_ROUTES_REFRESH_SECONDS,
+    ):
+        self.collection = collection
+        self.refresh_seconds = refresh_seconds
+        self.routes: Dict[str, Dict] = {}
+        self._loaded_at: Optional[float] = None
+        self._lock = asyncio.Lock()
+        self._index_created = False
+
+    async def refresh(self, force: bool = False) -> None:
+        if not force and self._fresh():
+            return
+        async with self._lock:
+            if not force and self._fresh():
+                return
+            increment_database_queries(operation="read", collection="embedding_routes")
+            self.routes = {
+                route["bot_id"]: route
+                async for route in self.collection.find({}, {"_id": 0})
+            }
+            self._loaded_at = time.monotonic()
+
+    def _fresh(self) -> bool:
+        return (
+            self._loaded_at is not None
+            and time.monotonic() - self._loaded_at < self.refresh_seconds
+        )
+
+    def get(self, bot_id: Optional[str]) -> Optional[Dict]:
+        return self.routes.get(bot_id) if bot_id else None
+
+    def serving(self, bot_id: Optional[str]) -> Optional[Tuple[str, str]]:
+        """(model, namespace) reads of the bot use, None for the defaults."""
+        route = self.get(bot_id)
+        if route and route.get("model"):
+            return route["model"], route["namespace"]
+        return None
+
+    def target(self, bot_id: Optional[str]) -> Optional[Tuple[str, str]]:
+        """(model, namespace) writes are mirrored to while the bot is re-embedded."""
+        route = self.get(bot_id)
+        if route and route.get("target_model"):
+            return route["target_model"], route["target_namespace"]
+        return None
+
+    async def start(self, bot_id: str, model: str, namespace: str) -> Dict:
+        """Begin (or resume) re-embedding a bot into `namespace`."""
+        if not self._index_created:
+            await self.collection.create_index("bot_id", unique=True)
+            self._index_created = True
+        await self.refresh(force=True)
+        route = self.get(bot_id)
+        if route and route.get("target_model") == model:
+            return route
+        fields = {
+            "target_model": model,
+            "target_namespace": namespace,
+            "cursor_created_at": None,
+            "cursor_chunk_id": None,
+            "embedded": 0,
+            "updated_at": get_date_time().replace(tzinfo=None),
+        }
+        defaults = EmbeddingRoute(bot_id=bot_id).model_dump(
+            exclude={"bot_id", "expire_at", *fields}
+        )
+        increment_database_queries(operation="write", collection="embedding_routes")
+        await self.collection.update_one(
+            {"bot_id": bot_id},
+            {"$set": fields, "$setOnInsert": defaults},
+            upsert=True,
+        )
+        await self.refresh(force=True)
+        return self.routes[bot_id]
+
+    async def checkpoint(
+        self, bot_id: str, model: str, after: Tuple[datetime, str], embedded: int
+    ) -> None:
+        increment_database_queries(operation="write", collection="embedding_routes")
+        await self.collection.update_one(
+            {"bot_id": bot_id, "target_model": model},
+            {
+                "$set": {
+                    "cursor_created_at": after[0],
+                    "cursor_chunk_id": after[1],
+                    "embedded": embedded,
+                    "updated_at": get_date_time().replace(tzinfo=None),
+                }
+            },
+        )
+
+    async def activate(
+        self, bot_id: str, model: str, namespace: str, previous_namespace: str
+    ) -> bool:
+        """Serve the bot from its target in one document update."""
+        increment_database_queries(operation="write", collection="embedding_routes")
+        result = await self.collection.update_one(
+            {"bot_id": bot_id, "target_model": model, "target_namespace": namespace},
+            {
+                "$set": {
+                    "model": model,
+                    "namespace": namespace,
+                    "previous_namespace": previous_namespace,
+                    "target_model": None,
+                    "target_namespace": None,
+                    "cursor_created_at": None,
+                    "cursor_chunk_id": None,
+                    "updated_at": get_date_time().replace(tzinfo=None),
+                }
+            },
+        )
+        await self.refresh(force=True)
+        if result.modified_count:
+            logger.info(f"Bot {bot_id} now reads embeddings of {model}")
+        return bool(result.modified_count)
+
+    async def clear_previous(self, bot_id: str) -> None:
+        increment_database_queries(operation="write", collection="embedding_routes")
+        await self.collection.update_one(
+            {"bot_id": bot_id}, {"$set": {"previous_namespace": None}}
+        )
+        await self.refresh(force=True)
+
+    async def drop_bot(self, bot_id: str) -> None:
+        increment_database_queries(operation="delete", collection="embedding_routes")
+        await self.collection.delete_one({"bot_id": bot_id})
+        self.routes.pop(bot_id, None)
+
+
+embedding_routes = EmbeddingRoutes(database["embedding_routes"])
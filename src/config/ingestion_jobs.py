@@ -0,0 +1,430 @@
+import os
+import time
+import uuid
+import asyncio
+import shutil
+import socket
+import hashlib
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Dict, List, Optional
+from motor.motor_asyncio import AsyncIOMotorCollection
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+from src.apis.models.ingestion_job_models import IngestionJob
+from src.config.mongo import database
+from src.config.monitoring import increment_database_queries, increment_ingestion_jobs
+from src.utils.logger import BASE_DIR, get_date_time, logger
+from src.utils.uploads import StoredUpload
+
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", "2"))
+INGEST_SPOOL_DIR = os.getenv(
+    "INGEST_SPOOL_DIR", os.path.join(BASE_DIR, "cache", "ingest_spool")
+)
+INGEST_JOB_MAX_ATTEMPTS = int(os.getenv("INGEST_JOB_MAX_ATTEMPTS", "3"))
+# A running job whose worker stops renewing its lease is claimed again
+INGEST_JOB_LEASE_SECONDS = float(os.getenv("INGEST_JOB_LEASE_SECONDS", "120"))
+INGEST_JOB_POLL_SECONDS = float(os.getenv("INGEST_JOB_POLL_SECONDS", "5"))
+INGEST_JOB_RETRY_SECONDS = float(os.getenv("INGEST_JOB_RETRY_SECONDS", "30"))
+# Finished jobs are deleted by a TTL index this long after they end
+INGEST_JOB_TTL_SECONDS = int(os.getenv("INGEST_JOB_TTL_SECONDS", str(7 * 24 * 3600)))
+# Set when INGEST_SPOOL_DIR is a volume shared by every host running workers;
+# otherwise a job is only claimed by workers on the host that spooled it
+INGEST_SPOOL_SHARED = os.getenv("INGEST_SPOOL_SHARED", "false").lower() == "true"
+INGEST_HOST = os.getenv("INGEST_HOST", socket.gethostname())
+ACTIVE_STATUSES = ("queued", "running")
+
+
+def _now() -> datetime:
+    return get_date_time().replace(tzinfo=None)
+
+
+def job_key(bot_id: str, filename: str, digest: str) -> str:
+    """Idempotency key of an upload: the same file sent twice maps to one job."""
+    return hashlib.sha256(f"{bot_id}\n{filename}\n{digest}".encode("utf-8")).hexdigest()
+
+
+class LeaseLost(Exception):
+    """Raised in a job handler once another worker has claimed its job."""
+
+
+class JobProgress:
+    """Stage and chunk counters of a running job, written through to Mongo.
+
+    Writes go through the worker's lease: once the job has been claimed by
+    another worker they raise LeaseLost, stopping the handler.
+    """
+
+    def __init__(self, queue: "IngestionJobQueue", job: Dict):
+        self.queue = queue
+        self.job = job
+        self.lease_lost = False
+        self._embedding_started: Optional[float] = None
+
+    async def _update(self, update: Dict) -> None:
+        if self.lease_lost or not await self.queue.update(self.job, update):
+            self.lease_lost = True
+            raise LeaseLost(f"Ingestion job {self.job['_id']} was claimed by another worker")
+
+    async def stage(self, stage: str, **fields) -> None:
+        await self._update({"$set": {"stage": stage, **fields}})
+
+    async def chunks(self, done: int, total: int) -> None:
+        """Record `done` of `total` chunks embedded and the throughput so far."""
+        if self._embedding_started is None:
+            self._embedding_started = time.perf_counter()
+        elapsed = time.perf_counter() - self._embedding_started
+        fields = {"chunks_to_embed": total}
+        if done and elapsed > 0:
+            fields["chunks_per_second"] = round(done / elapsed, 2)
+        # Batches finish out of order, never move the counter backwards
+        await self._update({"$set": fields, "$max": {"chunks_processed": done}})
+
+
+JobHandler = Callable[[Dict, JobProgress], Awaitable[Dict]]
+
+
+class IngestionJobQueue:
+    """Durable ingestion jobs in a Mongo collection, run by a bounded worker pool.
+
+    Uploads are moved to `spool_dir` under a key derived from the bot, file
+    name and content hash, so re-sending a file returns the job already
+    queued or running for it instead of starting another one. Workers claim
+    jobs with a lease they renew while running; jobs of a crashed process
+    are claimed again once their lease expires, and a worker that loses its
+    lease stops without touching the job or its spool. A failed attempt is
+    retried after a delay until `max_attempts`, except for ValueError (bad
+    input). Finished jobs expire `ttl_seconds` after they end.
+
+    The spool is local to a host unless `shared_spool` says `spool_dir` is
+    a volume every worker host mounts (INGEST_SPOOL_SHARED=true): jobs
+    record the host that spooled them and, without a shared spool, only
+    that host's workers claim them.
+    """
+
+    def __init__(
+        self,
+        collection: AsyncIOMotorCollection,
+        spool_dir: str = INGEST_SPOOL_DIR,
+        workers: int = INGEST_WORKERS,
+        max_attempts: int = INGEST_JOB_MAX_ATTEMPTS,
+        lease_seconds: float = INGEST_JOB_LEASE_SECONDS,
+        poll_seconds: float = INGEST_JOB_POLL_SECONDS,
+        retry_seconds: float = INGEST_JOB_RETRY_SECONDS,
+        ttl_seconds: int = INGEST_JOB_TTL_SECONDS,
+        shared_spool: bool = INGEST_SPOOL_SHARED,
+        host: str = INGEST_HOST,
+    ):
+        self.collection = collection
+        self.spool_dir = spool_dir
+        self.workers = max(1, workers)
+        self.max_attempts = max(1, max_attempts)
+        self.lease_seconds = lease_seconds
+        self.poll_seconds = poll_seconds
+        self.retry_seconds = retry_seconds
+        self.ttl_seconds = ttl_seconds
+        self.shared_spool = shared_spool
+        self.host = host
+        self._tasks: List[asyncio.Task] = []
+        self._wake = asyncio.Event()
+        self._index_created = False
+
+    async def _ensure_indexes(self):
+        if self._index_created:
+            return
+        await self.collection.create_index("key", unique=True)
+        await self.collection.create_index(
+            [("host", 1), ("status", 1), ("available_at", 1)]
+        )
+        # Only finished jobs have finished_at set, queued and running ones never expire
+        await self.collection.create_index(
+            "finished_at", expireAfterSeconds=self.ttl_seconds
+        )
+        self._index_created = True
+
+    def _spool(self, upload: StoredUpload, spool_path: str) -> None:
+        # Land the whole file before renaming, a running job may be reading it
+        os.makedirs(os.path.dirname(spool_path), exist_ok=True)
+        temp_path = os.path.join(self.spool_dir, f".{uuid.uuid4().hex}.part")
+        upload.save(temp_path)
+        os.replace(temp_path, spool_path)
+
+    async def submit(self, bot_id: str, user_id: str, upload: StoredUpload) -> Dict:
+        """Queue an upload for ingestion, or return the job already handling it."""
+        await self._ensure_indexes()
+        filename = upload.filename
+        key = job_key(bot_id, filename, upload.sha256)
+        spool_path = os.path.join(
+            self.spool_dir, key + os.path.splitext(filename)[1].lower()
+        )
+        await asyncio.to_thread(self._spool, upload, spool_path)
+        return await self._enqueue(
+            IngestionJob(
+                key=key,
+                bot_id=bot_id,
+                user_id=user_id,
+                filename=filename,
+                sha256=upload.sha256,
+                spool_path=spool_path,
+                host=self.host,
+                size=upload.size,
+                available_at=_now(),
+            )
+        )
+
+    async def submit_batch(
+        self, bot_id: str, user_id: str, name: str, uploads: List[StoredUpload]
+    ) -> Dict:
+        """Queue several files as one bulk job, or return the job already handling them."""
+        await self._ensure_indexes()
+        digest = hashlib.sha256(
+            "\n".join(
+                sorted(f"{upload.filename}\t{upload.sha256}" for upload in uploads)
+            ).encode("utf-8")
+        ).hexdigest()
+        key = job_key(bot_id, name, digest)
+        directory = os.path.join(self.spool_dir, key)
+        files = []
+        for upload in uploads:
+            spool_path = os.path.join(
+                directory, upload.sha256 + os.path.splitext(upload.filename)[1].lower()
+            )
+            await asyncio.to_thread(self._spool, upload, spool_path)
+            files.append(
+                {
+                    "filename": upload.filename,
+                    "sha256": upload.sha256,
+                    "size": upload.size,
+                    "spool_path": spool_path,
+                }
+            )
+        return await self._enqueue(
+            IngestionJob(
+                key=key,
+                bot_id=bot_id,
+                user_id=user_id,
+                filename=name,
+                sha256=digest,
+                spool_path=directory,
+                host=self.host,
+                size=sum(upload.size for upload in uploads),
+                files=files,
+                available_at=_now(),
+            )
+        )
+
+    async def _enqueue(self, job: IngestionJob) -> Dict:
+        document = job.model_dump()
+        document["_id"] = uuid.uuid4().hex
+        increment_database_queries(operation="write", collection="ingestion_jobs")
+        try:
+            current = await self.collection.find_one_and_update(
+                {"key": job.key},
+                {"$setOnInsert": document},
+                upsert=True,
+                return_document=ReturnDocument.AFTER,
+            )
+        except DuplicateKeyError:
+            current = await self.collection.find_one({"key": job.key})
+
+        if (
+            current["_id"] != document["_id"]
+            and current["status"] not in ACTIVE_STATUSES
+        ):
+            # Run a finished job again: sync_source only embeds what changed since
+            reset = {
+                field: document[field]
+                for field in (
+                    "user_id", "spool_path", "host", "size", "files", "status", "stage",
+                    "attempts", "worker", "available_at", "lease_until", "started_at",
+                    "finished_at", "chunks_total", "chunks_to_embed",
+                    "chunks_processed", "chunks_per_second", "diff", "error",
+                    "updated_at",
+                )
+            }
+            increment_database_queries(operation="write", collection="ingestion_jobs")
+            current = await self.collection.find_one_and_update(
+                {"_id": current["_id"], "status": current["status"]},
+                {"$set": reset},
+                return_document=ReturnDocument.AFTER,
+            ) or await self.collection.find_one({"_id": current["_id"]})
+        if not self.shared_spool and current["host"] != self.host:
+            # Active on another host, which has its own copy of the upload
+            await asyncio.to_thread(self._remove_spool, job.spool_path)
+        if current["status"] == "queued":
+            self._wake.set()
+        logger.info(
+            f"Ingestion job {current['_id']} for {job.filename} of bot {job.bot_id} "
+            f"is {current['status']}"
+        )
+        return current
+
+    async def get(self, job_id: str) -> Optional[Dict]:
+        increment_database_queries(operation="read", collection="ingestion_jobs")
+        return await self.collection.find_one({"_id": job_id})
+
+    async def update(self, job: Dict, update: Dict) -> int:
+        """Apply `update` to a job this worker still holds and renew its lease.
+
+        Returns 0 once another worker has claimed the job.
+        """
+        now = _now()
+        update = {**update}
+        update["$set"] = {
+            **update.get("$set", {}),
+            "lease_until": now + timedelta(seconds=self.lease_seconds),
+            "updated_at": now,
+        }
+        increment_database_queries(operation="write", collection="ingestion_jobs")
+        result = await self.collection.update_one(
+            {"_id": job["_id"], "worker": job["worker"]}, update
+        )
+        return result.modified_count
+
+    async def _claim(self, worker: str) -> Optional[Dict]:
+        now = _now()
+        claimable = {
+            "$or": [
+                {"status": "queued", "available_at": {"$lte": now}},
+                {"status": "running", "lease_until": {"$lt": now}},
+            ]
+        }
+        if not self.shared_spool:
+            claimable["host"] = self.host
+        increment_database_queries(operation="write", collection="ingestion_jobs")
+        return await self.collection.find_one_and_update(
+            claimable,
+            {
+                "$set": {
+                    "status": "running",
+                    "stage": "starting",
+                    "worker": worker,
+                    "lease_until": now + timedelta(seconds=self.lease_seconds),
+                    "started_at": now,
+                    "finished_at": None,
+                    "chunks_processed": 0,
+                    "updated_at": now,
+                },
+                "$inc": {"attempts": 1},
+            },
+            sort=[("available_at", 1)],
+            return_document=ReturnDocument.AFTER,
+        )
+
+    async def _heartbeat(self, job: Dict, progress: JobProgress, task: asyncio.Task):
+        while True:
+            await asyncio.sleep(self.lease_seconds / 3)
+            if not await self.update(job, {}):
+                progress.lease_lost = True
+                task.cancel()
+                return
+
+    @staticmethod
+    def _remove_spool(path: str) -> None:
+        if os.path.isdir(path):
+            shutil.rmtree(path, ignore_errors=True)
+        elif os.path.exists(path):
+            os.remove(path)
+
+    async def _finish(self, job: Dict, fields: Dict) -> None:
+        final = fields["status"] != "queued"
+        fields = {**fields, "worker": None, "lease_until": None}
+        if final:
+            fields["finished_at"] = _now()
+        if not await self.update(job, {"$set": fields}):
+            # The new owner of the job may be reading the spool
+            self._lease_lost(job)
+        elif final:
+            await asyncio.to_thread(self._remove_spool, job["spool_path"])
+
+    @staticmethod
+    def _lease_lost(job: Dict) -> None:
+        logger.warning(
+            f"Ingestion job {job['_id']} was claimed by another worker, "
+            "stopping this attempt"
+        )
+
+    async def _fail(self, job: Dict, error: Exception) -> None:
+        final = isinstance(error, ValueError) or job["attempts"] >= self.max_attempts
+        logger.error(
+            f"Ingestion job {job['_id']} attempt {job['attempts']} failed: {error}"
+        )
+        increment_ingestion_jobs("failed" if final else "retried")
+        await self._finish(
+            job,
+            {
+                "status": "failed" if final else "queued",
+                "error": str(error),
+                "available_at": _now()
+                + timedelta(seconds=self.retry_seconds * job["attempts"]),
+            },
+        )
+
+    async def _run(self, job: Dict, handler: JobHandler):
+        progress = JobProgress(self, job)
+        task = asyncio.create_task(handler(job, progress))
+        heartbeat = asyncio.create_task(self._heartbeat(job, progress, task))
+        try:
+            result = await task
+        except asyncio.CancelledError:
+            if progress.lease_lost and not asyncio.current_task().cancelling():
+                # Cancelled by the heartbeat, the job belongs to another worker
+                self._lease_lost(job)
+                return
+            task.cancel()
+            # Shutting down: hand the job back without spending an attempt
+            await asyncio.shield(
+                self.update(
+                    job,
+                    {
+                        "$set": {"status": "queued", "worker": None, "available_at": _now()},
+                        "$inc": {"attempts": -1},
+                    },
+                )
+            )
+            raise
+        except Exception as e:
+            if progress.lease_lost:
+                self._lease_lost(job)
+            else:
+                await self._fail(job, e)
+        else:
+            increment_ingestion_jobs("succeeded")
+            await self._finish(
+                job, {"status": "succeeded", "stage": "done", "error": None, **result}
+            )
+        finally:
+            heartbeat.cancel()
+
+    async def _work(self, handler: JobHandler):
+        worker = uuid.uuid4().hex
+        while True:
+            try:
+                self._wake.clear()
+                job = await self._claim(worker)
+                if job is None:
+                    try:
+                        await asyncio.wait_for(self._wake.wait(), self.poll_seconds)
+                    except asyncio.TimeoutError:
+                        pass
+                    continue
+                await self._run(job, handler)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Ingestion worker error: {e}")
+                await asyncio.sleep(self.poll_seconds)
+
+    def start(self, handler: JobHandler):
+        if not self._tasks:
+            self._tasks = [
+                asyncio.create_task(self._work(handler)) for _ in range(self.workers)
+            ]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+
+ingestion_jobs = IngestionJobQueue(database["ingestion_jobs"])
@@ -0,0 +1,202 @@
+import os
+import json
+import uuid
+import fcntl
+import threading
+from collections import Counter
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Set, Tuple
+from langchain_core.documents import Document
+from src.utils.bm25 import BM25Index, tokenize
+from src.utils.cache import LRUCache
+from src.utils.logger import BASE_DIR
+
+LEXICAL_INDEX_DIR = os.getenv(
+    "LEXICAL_INDEX_DIR", os.path.join(BASE_DIR, "cache", "lexical_index")
+)
+LEXICAL_INDEX_CACHE_SIZE = int(os.getenv("LEXICAL_INDEX_CACHE_SIZE", "100"))
+# BM25 hits below this score only share common words with the query
+LEXICAL_MIN_SCORE = float(os.getenv("LEXICAL_MIN_SCORE", "1.0"))
+# Rewrite a bot's log once this share of its records is superseded or deleted
+LEXICAL_INDEX_COMPACT_RATIO = float(os.getenv("LEXICAL_INDEX_COMPACT_RATIO", "0.3"))
+
+
+class BotLexicalIndex:
+    """BM25 index of one bot backed by an append-only log of its chunks' terms.
+
+    `{bot_id}.jsonl` starts with a line naming its generation, then holds
+    one record per indexed chunk with its term frequencies (its postings and
+    length) and tombstones for removed chunks, so a change only appends the
+    chunks it touches. Once LEXICAL_INDEX_COMPACT_RATIO of the records are
+    dead the log is rewritten under a new generation. Processes share the
+    log through an flock on `{bot_id}.lock`, exclusive for writers and
+    shared for readers, and each first replays the records other processes
+    appended, or the whole log when its generation changed.
+
+    Only chunk ids are indexed, their text stays in the vector store or the
+    chunk text store.
+    """
+
+    def __init__(self, directory: str, bot_id: str):
+        self.path = os.path.join(directory, f"{bot_id}.jsonl")
+        self.lock_path = os.path.join(directory, f"{bot_id}.lock")
+        self.index = BM25Index()
+        # Records in the log after its header, live or not
+        self.records = 0
+        # Generation of the log read and how far into it
+        self._generation: Optional[str] = None
+        self._offset = 0
+        self.lock = threading.Lock()
+
+    @contextmanager
+    def _locked(self, exclusive: bool = False):
+        with self.lock, open(self.lock_path, "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            try:
+                self._refresh()
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _reset(self, generation: Optional[str] = None, offset: int = 0) -> None:
+        self.index, self.records = BM25Index(), 0
+        self._generation, self._offset = generation, offset
+
+    def _refresh(self):
+        try:
+            log = open(self.path, "rb")
+        except FileNotFoundError:
+            if self._generation is not None:
+                self._reset()
+            return
+        with log:
+            header = log.readline()
+            generation = json.loads(header)["generation"] if header else None
+            if generation != self._generation:
+                # Compacted or recreated by another process: replay from the start
+                self._reset(generation, log.tell())
+            log.seek(self._offset)
+            for line in log:
+                self._apply(json.loads(line))
+            self._offset = log.tell()
+
+    def _apply(self, record: Dict) -> None:
+        self.records += 1
+        if "deleted" in record:
+            self.index.remove([record["deleted"]])
+        else:
+            self.index.add_terms(record["id"], record["terms"])
+
+    def _append(self, records: List[Dict]) -> None:
+        with open(self.path, "ab") as log:
+            if log.tell() == 0:
+                self._reset(uuid.uuid4().hex)
+                header = {"generation": self._generation}
+                log.write((json.dumps(header) + "\n").encode())
+            log.writelines(
+                (json.dumps(record, ensure_ascii=False) + "\n").encode()
+                for record in records
+            )
+            offset = log.tell()
+        for record in records:
+            self._apply(record)
+        # Our own records are applied already, skip them on the next refresh
+        self._offset = offset
+        dead = 1 - len(self.index) / self.records if self.records else 0
+        if dead >= LEXICAL_INDEX_COMPACT_RATIO:
+            self._compact()
+
+    def _compact(self) -> None:
+        generation = uuid.uuid4().hex
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, "wb") as log:
+            log.write((json.dumps({"generation": generation}) + "\n").encode())
+            for doc_id in list(self.index.lengths):
+                record = {"id": doc_id, "terms": self.index.frequencies(doc_id)}
+                log.write((json.dumps(record, ensure_ascii=False) + "\n").encode())
+            offset = log.tell()
+        os.replace(temp_path, self.path)
+        self._generation, self._offset = generation, offset
+        self.records = len(self.index)
+
+    def add(self, ids: List[str], texts: List[str]) -> None:
+        records = [
+            {"id": doc_id, "terms": Counter(tokenize(text))}
+            for doc_id, text in zip(ids, texts)
+        ]
+        with self._locked(exclusive=True):
+            self._append(records)
+
+    def delete(self, ids: List[str]) -> None:
+        with self._locked(exclusive=True):
+            deleted = [i for i in dict.fromkeys(ids) if i in self.index.lengths]
+            if deleted:
+                self._append([{"deleted": doc_id} for doc_id in deleted])
+
+    def drop(self) -> None:
+        with self._locked(exclusive=True):
+            if os.path.exists(self.path):
+                os.remove(self.path)
+            self._reset()
+
+    def ids(self) -> Set[str]:
+        with self._locked():
+            return set(self.index.lengths)
+
+    def search(self, query: str, k: int) -> List[Tuple[str, float]]:
+        with self._locked():
+            return self.index.search(query, k)
+
+
+class LexicalIndexStore:
+    """Per-bot BM25 indexes persisted as append-only logs and loaded on demand.
+
+    Each bot's index is updated incrementally as chunks are ingested or
+    deleted. Recently used indexes stay in memory (`cache_size` bots) and
+    catch up with the changes of other processes before each use.
+    """
+
+    def __init__(
+        self, directory: str = LEXICAL_INDEX_DIR, cache_size: int = LEXICAL_INDEX_CACHE_SIZE
+    ):
+        self.directory = directory
+        self.loaded = LRUCache(cache_size, name="lexical_index")
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def _bot(self, bot_id: str) -> BotLexicalIndex:
+        with self._lock:
+            bot_index = self.loaded.get(bot_id)
+            if bot_index is None:
+                bot_index = BotLexicalIndex(self.directory, bot_id)
+                self.loaded.set(bot_id, bot_index)
+            return bot_index
+
+    def add_documents(
+        self, bot_id: str, documents: List[Document], ids: List[str]
+    ) -> None:
+        self._bot(bot_id).add(ids, [document.page_content for document in documents])
+
+    def delete_documents(self, bot_id: str, ids: List[str]) -> None:
+        self._bot(bot_id).delete(ids)
+
+    def drop(self, bot_id: str) -> None:
+        self._bot(bot_id).drop()
+        self.loaded.pop(bot_id)
+
+    def ids(self, bot_id: str) -> Set[str]:
+        """Ids of the bot's indexed chunks."""
+        return self._bot(bot_id).ids()
+
+    def search(
+        self, bot_id: str, query: str, k: int = 5, min_score: float = LEXICAL_MIN_SCORE
+    ) -> List[Tuple[str, float]]:
+        """The `k` best (chunk id, BM25 score) pairs of the bot scoring `min_score`."""
+        return [
+            (doc_id, score)
+            for doc_id, score in self._bot(bot_id).search(query, k)
+            if score >= min_score
+        ]
+
+
+lexical_index = LexicalIndexStore()
@@ -1,6 +1,8 @@
+import os
 from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_google_genai.embeddings import GoogleGenerativeAIEmbeddings
 from src.utils.logger import logger
+from src.config.embedding_cache import CachedEmbeddings
 from langchain_core.language_models.chat_models import BaseChatModel
 from langchain_openai import ChatOpenAI
 
@@ -13,8 +15,21 @@ llm_2_5_flash_preview = ChatGoogleGenerativeAI(
 llm_2_0_flash_lite = ChatGoogleGenerativeAI(
     model="gemini-2.0-flash-lite", temperature=1
 )
-# Default embeddings model
-embeddings = GoogleGenerativeAIEmbeddings(model="models/text-embedding-004")
+# Default embeddings model, cached in memory and on local disk
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "models/text-embedding-004")
+embeddings = CachedEmbeddings(
+    GoogleGenerativeAIEmbeddings(model=EMBEDDING_MODEL), model=EMBEDDING_MODEL
+)
+_embedding_models = {EMBEDDING_MODEL: embeddings}
+
+
+def get_embeddings(model: str = EMBEDDING_MODEL) -> CachedEmbeddings:
+    """Cached embeddings of a model, shared by every caller."""
+    if model not in _embedding_models:
+        _embedding_models[model] = CachedEmbeddings(
+            GoogleGenerativeAIEmbeddings(model=model), model=model
+        )
+    return _embedding_models[model]
 
 
 def get_llm_provider(
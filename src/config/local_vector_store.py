@@ -0,0 +1,551 @@
+import os
+import json
+import fcntl
+import shutil
+import uuid
+import asyncio
+import threading
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+from src.utils.logger import BASE_DIR, logger
+
+LOCAL_VECTOR_STORE_DIR = os.getenv(
+    "LOCAL_VECTOR_STORE_DIR", os.path.join(BASE_DIR, "cache", "vector_store")
+)
+# Rewrite a partition once this share of its rows has been deleted
+LOCAL_VECTOR_COMPACT_RATIO = float(os.getenv("LOCAL_VECTOR_COMPACT_RATIO", "0.3"))
+DEFAULT_PARTITION = "_default"
+
+VECTORS_FILE = "vectors.f32"
+METADATA_FILE = "metadata.jsonl"
+LOCK_FILE = "partition.lock"
+
+
+def match_filter(metadata: Dict[str, Any], filter: Optional[Dict[str, Any]]) -> bool:
+    """Evaluate a Pinecone-style metadata filter ($eq, $ne, $in, $nin, $gt,
+    $gte, $lt, $lte, $and, $or) against one document's metadata."""
+    if not filter:
+        return True
+    for key, condition in filter.items():
+        if key == "$and":
+            if not all(match_filter(metadata, sub) for sub in condition):
+                return False
+            continue
+        if key == "$or":
+            if not any(match_filter(metadata, sub) for sub in condition):
+                return False
+            continue
+        value = metadata.get(key)
+        if not isinstance(condition, dict):
+            condition = {"$eq": condition}
+        for operator, operand in condition.items():
+            if operator == "$eq" and value != operand:
+                return False
+            if operator == "$ne" and value == operand:
+                return False
+            if operator == "$in" and value not in operand:
+                return False
+            if operator == "$nin" and value in operand:
+                return False
+            if operator in ("$gt", "$gte", "$lt", "$lte"):
+                if value is None:
+                    return False
+                if operator == "$gt" and not value > operand:
+                    return False
+                if operator == "$gte" and not value >= operand:
+                    return False
+                if operator == "$lt" and not value < operand:
+                    return False
+                if operator == "$lte" and not value <= operand:
+                    return False
+    return True
+
+
+def partition_of(filter: Optional[Dict[str, Any]]) -> Optional[str]:
+    """Return the bot id a filter is restricted to, if any."""
+    condition = (filter or {}).get("bot_id")
+    if isinstance(condition, dict):
+        condition = condition.get("$eq")
+    return condition if isinstance(condition, str) else None
+
+
+class VectorPartition:
+    """Append-only float32 matrix of one bot with a JSON lines sidecar.
+
+    Rows are L2-normalized on write so cosine similarity is a dot product
+    against the memory-mapped matrix. The sidecar holds one record per row
+    (id, text, metadata) plus tombstones for deleted ids, after a first line
+    naming its generation; `compact` rewrites both files without the dead
+    rows under a new generation. Processes share a partition through an
+    flock on `partition.lock`, exclusive for writers and shared for readers,
+    and each first replays the sidecar lines other processes appended, or
+    the whole sidecar when its generation changed.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.vectors_path = os.path.join(directory, VECTORS_FILE)
+        self.metadata_path = os.path.join(directory, METADATA_FILE)
+        self.lock_path = os.path.join(directory, LOCK_FILE)
+        self.dim: Optional[int] = None
+        self.records: List[Dict[str, Any]] = []
+        self.alive = np.zeros(0, dtype=bool)
+        self.row_of: Dict[str, int] = {}
+        self.matrix: Optional[np.ndarray] = None
+        # Generation of the sidecar read and how far into it
+        self._generation: Optional[str] = None
+        self._offset = 0
+        self.lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    @contextmanager
+    def _locked(self, exclusive: bool = False):
+        with self.lock:
+            try:
+                lock_file = open(self.lock_path, "a")
+            except FileNotFoundError:
+                # The partition was dropped by another process
+                os.makedirs(self.directory, exist_ok=True)
+                lock_file = open(self.lock_path, "a")
+            with lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+                try:
+                    self._refresh()
+                    yield
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _reset(self, generation: Optional[str] = None, offset: int = 0) -> None:
+        self.dim, self.records, self.row_of = None, [], {}
+        self.alive = np.zeros(0, dtype=bool)
+        self._generation, self._offset = generation, offset
+        self.matrix = None
+
+    def _refresh(self):
+        try:
+            metadata = open(self.metadata_path, "rb")
+        except FileNotFoundError:
+            if self._generation is not None:
+                self._reset()
+            return
+        with metadata:
+            header = metadata.readline()
+            generation = json.loads(header)["generation"] if header else None
+            if generation != self._generation:
+                # Compacted or recreated by another process: replay from the start
+                self._reset(generation, metadata.tell())
+            metadata.seek(self._offset)
+            lines = metadata.readlines()
+            self._offset = metadata.tell()
+        if lines:
+            self._apply([json.loads(line) for line in lines])
+            self._map()
+
+    def _apply(self, records: List[Dict[str, Any]]) -> None:
+        added = sum("deleted" not in record for record in records)
+        self.alive = np.concatenate([self.alive, np.zeros(added, dtype=bool)])
+        for record in records:
+            if "deleted" in record:
+                row = self.row_of.pop(record["deleted"], None)
+            else:
+                self.dim = record.get("dim", self.dim)
+                row = self.row_of.get(record["id"])
+                self.row_of[record["id"]] = len(self.records)
+                self.alive[len(self.records)] = True
+                self.records.append(record)
+            if row is not None:
+                self.alive[row] = False
+
+    def _append(self, records: List[Dict[str, Any]]) -> None:
+        """Write sidecar records and apply them (exclusive lock held)."""
+        with open(self.metadata_path, "ab") as f:
+            if f.tell() == 0:
+                self._reset(uuid.uuid4().hex)
+                f.write((json.dumps({"generation": self._generation}) + "\n").encode())
+            f.writelines(
+                (json.dumps(record, ensure_ascii=False) + "\n").encode()
+                for record in records
+            )
+            offset = f.tell()
+        self._apply(records)
+        # Our own lines are applied already, skip them on the next refresh
+        self._offset = offset
+
+    def _map(self):
+        rows = len(self.records)
+        if not rows or not self.dim:
+            self.matrix = None
+            return
+        self.matrix = np.memmap(
+            self.vectors_path, dtype=np.float32, mode="r", shape=(rows, self.dim)
+        )
+
+    @property
+    def size(self) -> int:
+        with self._locked():
+            return int(self.alive.sum())
+
+    def add(
+        self,
+        ids: List[str],
+        texts: List[str],
+        metadatas: List[Dict],
+        vectors: np.ndarray,
+    ):
+        vectors = np.asarray(vectors, dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        vectors = vectors / np.where(norms == 0, 1, norms)
+        with self._locked(exclusive=True):
+            dim = self.dim or vectors.shape[1]
+            if vectors.shape[1] != dim:
+                raise ValueError(
+                    f"Embedding dimension {vectors.shape[1]} does not match {dim}"
+                )
+            with open(self.vectors_path, "ab") as f:
+                # Drop rows a crash left without their sidecar records
+                f.truncate(len(self.records) * dim * 4)
+                f.write(vectors.tobytes())
+            self._append(
+                [
+                    {
+                        "id": doc_id,
+                        "page_content": text,
+                        "metadata": metadata,
+                        "dim": dim,
+                    }
+                    for doc_id, text, metadata in zip(ids, texts, metadatas)
+                ]
+            )
+            self._map()
+
+    def delete(self, ids: Iterable[str]) -> int:
+        with self._locked(exclusive=True):
+            deleted = [doc_id for doc_id in dict.fromkeys(ids) if doc_id in self.row_of]
+            if not deleted:
+                return 0
+            self._append([{"deleted": doc_id} for doc_id in deleted])
+            if 1 - self.alive.sum() / len(self.records) >= LOCAL_VECTOR_COMPACT_RATIO:
+                self._compact()
+            return len(deleted)
+
+    def compact(self):
+        """Rewrite the matrix and sidecar keeping only live rows."""
+        with self._locked(exclusive=True):
+            self._compact()
+
+    def _compact(self):
+        rows = np.flatnonzero(self.alive)
+        generation = uuid.uuid4().hex
+        vectors_tmp = f"{self.vectors_path}.tmp"
+        metadata_tmp = f"{self.metadata_path}.tmp"
+        with open(vectors_tmp, "wb") as f:
+            if self.matrix is not None and len(rows):
+                f.write(np.ascontiguousarray(self.matrix[rows]).tobytes())
+        with open(metadata_tmp, "wb") as f:
+            f.write((json.dumps({"generation": generation}) + "\n").encode())
+            f.writelines(
+                (json.dumps(self.records[row], ensure_ascii=False) + "\n").encode()
+                for row in rows
+            )
+            offset = f.tell()
+        self.matrix = None
+        os.replace(vectors_tmp, self.vectors_path)
+        os.replace(metadata_tmp, self.metadata_path)
+        logger.info(
+            f"Compacted {self.directory}: {len(self.records)} -> {len(rows)} rows"
+        )
+        records = [self.records[row] for row in rows]
+        self._reset(generation, offset)
+        self._apply(records)
+        self._map()
+
+    def document(self, row: int) -> Document:
+        record = self.records[row]
+        return Document(
+            id=record["id"],
+            page_content=record["page_content"],
+            metadata=record["metadata"],
+        )
+
+    def ids(self) -> List[str]:
+        """Ids of the live rows in insertion order."""
+        with self._locked():
+            return sorted(self.row_of, key=self.row_of.get)
+
+    def get(self, ids: Iterable[str]) -> List[Document]:
+        with self._locked():
+            return [self.document(self.row_of[i]) for i in ids if i in self.row_of]
+
+    def vectors(self, ids: Iterable[str]) -> Dict[str, np.ndarray]:
+        """Stored (normalized) vectors of the given ids."""
+        with self._locked():
+            if self.matrix is None:
+                return {}
+            return {
+                i: np.array(self.matrix[self.row_of[i]])
+                for i in ids
+                if i in self.row_of
+            }
+
+    def search(
+        self,
+        vector: Optional[np.ndarray],
+        k: int,
+        filter: Optional[Dict[str, Any]] = None,
+        score_threshold: Optional[float] = None,
+    ) -> List[Tuple[Document, float]]:
+        """Cosine top-k over live rows; `vector=None` lists rows without scoring."""
+        with self._locked():
+            if self.matrix is None:
+                return []
+            mask = self.alive.copy()
+            if filter:
+                for row in np.flatnonzero(mask):
+                    mask[row] = match_filter(self.records[row]["metadata"], filter)
+            candidates = np.flatnonzero(mask)
+            if vector is None:
+                return [(self.document(row), 0.0) for row in candidates[:k]]
+            if not len(candidates):
+                return []
+            query = np.asarray(vector, dtype=np.float32)
+            norm = np.linalg.norm(query)
+            scores = self.matrix[candidates] @ (query / norm if norm else query)
+            if score_threshold is not None:
+                keep = scores >= score_threshold
+                candidates, scores = candidates[keep], scores[keep]
+            if len(scores) > k:
+                top = np.argpartition(-scores, k)[:k]
+            else:
+                top = np.arange(len(scores))
+            top = top[np.argsort(-scores[top])]
+            return [(self.document(candidates[i]), float(scores[i])) for i in top]
+
+
+class LocalVectorStore(VectorStore):
+    """Offline vector store with one memory-mapped partition per bot.
+
+    Documents are partitioned by their `bot_id` metadata; searches whose
+    filter names a bot only touch that partition, others scan all of them.
+    Scores are cosine similarities, mapped to [0, 1] for relevance search
+    like Pinecone's cosine indexes.
+    """
+
+    def __init__(
+        self,
+        embedding: Embeddings,
+        index_name: str = "default",
+        directory: str = LOCAL_VECTOR_STORE_DIR,
+    ):
+        self.embedding = embedding
+        self.directory = os.path.join(directory, index_name)
+        self.partitions: Dict[str, VectorPartition] = {}
+        self._lock = threading.Lock()
+        os.makedirs(self.directory, exist_ok=True)
+
+    @property
+    def embeddings(self) -> Embeddings:
+        return self.embedding
+
+    def partition(self, bot_id: str) -> VectorPartition:
+        with self._lock:
+            partition = self.partitions.get(bot_id)
+            if partition is None:
+                partition = VectorPartition(os.path.join(self.directory, bot_id))
+                self.partitions[bot_id] = partition
+            return partition
+
+    def _all_partitions(self) -> List[VectorPartition]:
+        return [
+            self.partition(name)
+            for name in sorted(os.listdir(self.directory))
+            if os.path.isdir(os.path.join(self.directory, name))
+        ]
+
+    def _select_relevance_score_fn(self) -> Callable[[float], float]:
+        return lambda score: (score + 1) / 2
+
+    def add_vectors(
+        self,
+        texts: List[str],
+        vectors: List[List[float]],
+        metadatas: Optional[List[Dict]] = None,
+        ids: Optional[List[str]] = None,
+    ) -> List[str]:
+        """Store precomputed embeddings."""
+        metadatas = metadatas or [{} for _ in texts]
+        ids = [doc_id or str(uuid.uuid4()) for doc_id in (ids or [None] * len(texts))]
+        groups: Dict[str, List[int]] = {}
+        for i, metadata in enumerate(metadatas):
+            groups.setdefault(metadata.get("bot_id") or DEFAULT_PARTITION, []).append(i)
+        for bot_id, rows in groups.items():
+            self.partition(bot_id).add(
+                [ids[i] for i in rows],
+                [texts[i] for i in rows],
+                [metadatas[i] for i in rows],
+                np.asarray([vectors[i] for i in rows], dtype=np.float32),
+            )
+        return ids
+
+    def add_texts(
+        self,
+        texts: Iterable[str],
+        metadatas: Optional[List[Dict]] = None,
+        ids: Optional[List[str]] = None,
+        **kwargs: Any,
+    ) -> List[str]:
+        texts = list(texts)
+        if not texts:
+            return []
+        vectors = self.embedding.embed_documents(texts)
+        return self.add_vectors(texts, vectors, metadatas, ids)
+
+    async def aadd_texts(
+        self,
+        texts: Iterable[str],
+        metadatas: Optional[List[Dict]] = None,
+        ids: Optional[List[str]] = None,
+        **kwargs: Any,
+    ) -> List[str]:
+        texts = list(texts)
+        if not texts:
+            return []
+        vectors = await self.embedding.aembed_documents(texts)
+        return await asyncio.to_thread(self.add_vectors, texts, vectors, metadatas, ids)
+
+    def _search_vector(
+        self,
+        vector: Optional[List[float]],
+        k: int,
+        filter: Optional[Dict[str, Any]] = None,
+        score_threshold: Optional[float] = None,
+    ) -> List[Tuple[Document, float]]:
+        bot_id = partition_of(filter)
+        if bot_id is not None:
+            # The bot_id condition is implied by the partition itself
+            extra = {key: value for key, value in filter.items() if key != "bot_id"}
+            return self.partition(bot_id).search(vector, k, extra, score_threshold)
+        results = []
+        for partition in self._all_partitions():
+            results.extend(partition.search(vector, k, filter, score_threshold))
+        if vector is not None:
+            results.sort(key=lambda item: item[1], reverse=True)
+        return results[:k]
+
+    def similarity_search_with_score(
+        self,
+        query: str,
+        k: int = 4,
+        filter: Optional[Dict[str, Any]] = None,
+        score_threshold: Optional[float] = None,
+        **kwargs: Any,
+    ) -> List[Tuple[Document, float]]:
+        # An empty query lists documents without calling the embedding model
+        vector = self.embedding.embed_query(query) if query.strip() else None
+        return self._search_vector(vector, k, filter, score_threshold)
+
+    async def asimilarity_search_with_score(
+        self,
+        query: str,
+        k: int = 4,
+        filter: Optional[Dict[str, Any]] = None,
+        score_threshold: Optional[float] = None,
+        **kwargs: Any,
+    ) -> List[Tuple[Document, float]]:
+        vector = await self.embedding.aembed_query(query) if query.strip() else None
+        return await asyncio.to_thread(
+            self._search_vector, vector, k, filter, score_threshold
+        )
+
+    def similarity_search(
+        self, query: str, k: int = 4, filter: Optional[Dict[str, Any]] = None, **kwargs: Any
+    ) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score(query, k, filter)]
+
+    async def asimilarity_search(
+        self, query: str, k: int = 4, filter: Optional[Dict[str, Any]] = None, **kwargs: Any
+    ) -> List[Document]:
+        return [
+            doc for doc, _ in await self.asimilarity_search_with_score(query, k, filter)
+        ]
+
+    def similarity_search_by_vector(
+        self,
+        embedding: List[float],
+        k: int = 4,
+        filter: Optional[Dict[str, Any]] = None,
+        **kwargs: Any,
+    ) -> List[Document]:
+        return [doc for doc, _ in self._search_vector(embedding, k, filter)]
+
+    def similarity_search_with_vectors(
+        self,
+        embedding: List[float],
+        k: int = 4,
+        filter: Optional[Dict[str, Any]] = None,
+        score_threshold: Optional[float] = None,
+    ) -> List[Tuple[Document, float, np.ndarray]]:
+        """Like a cosine search by vector, also returning each match's stored vector."""
+        results = self._search_vector(embedding, k, filter, score_threshold)
+        vectors = {}
+        partitions = {doc.metadata.get("bot_id") or DEFAULT_PARTITION for doc, _ in results}
+        for bot_id in partitions:
+            vectors.update(
+                self.partition(bot_id).vectors(doc.id for doc, _ in results)
+            )
+        return [
+            (doc, score, vectors[doc.id]) for doc, score in results if doc.id in vectors
+        ]
+
+    def _partitions_of(self, bot_id: Optional[str]) -> List[VectorPartition]:
+        return [self.partition(bot_id)] if bot_id else self._all_partitions()
+
+    def delete(
+        self,
+        ids: Optional[List[str]] = None,
+        bot_id: Optional[str] = None,
+        **kwargs: Any,
+    ) -> Optional[bool]:
+        """Delete by id, from the bot's partition only when `bot_id` is given."""
+        if not ids:
+            return False
+        deleted = sum(
+            partition.delete(ids) for partition in self._partitions_of(bot_id)
+        )
+        return deleted > 0
+
+    def get_by_ids(
+        self, ids: List[str], bot_id: Optional[str] = None
+    ) -> List[Document]:
+        """Documents by id, from the bot's partition only when `bot_id` is given."""
+        found = {}
+        for partition in self._partitions_of(bot_id):
+            for document in partition.get(ids):
+                found[document.id] = document
+        return [found[doc_id] for doc_id in ids if doc_id in found]
+
+    def drop_partition(self, bot_id: str) -> None:
+        """Remove every document of a bot."""
+        with self._lock:
+            self.partitions.pop(bot_id, None)
+            shutil.rmtree(os.path.join(self.directory, bot_id), ignore_errors=True)
+
+    def compact(self) -> None:
+        for partition in self._all_partitions():
+            partition.compact()
+
+    @classmethod
+    def from_texts(
+        cls,
+        texts: List[str],
+        embedding: Embeddings,
+        metadatas: Optional[List[Dict]] = None,
+        ids: Optional[List[str]] = None,
+        **kwargs: Any,
+    ) -> "LocalVectorStore":
+        store = cls(embedding, **kwargs)
+        store.add_texts(texts, metadatas, ids)
+        return store
@@ -59,6 +59,65 @@ DATABASE_QUERIES = Counter(
     ["operation", "collection"],
 )
 
+STREAM_TIME_TO_FIRST_BYTE = Histogram(
+    "stream_time_to_first_byte_seconds",
+    "Time from request start to the first streamed event in seconds",
+    ["endpoint"],
+)
+
+TOOL_DURATION = Histogram(
+    "ai_tool_duration_seconds",
+    "AI agent tool execution duration in seconds",
+    ["tool_name", "status"],
+)
+
+SPECULATIVE_PREFETCH = Counter(
+    "speculative_retrieval_prefetch_total",
+    "Speculative retrieval prefetches by outcome (started, hit, miss)",
+    ["result"],
+)
+
+SPECULATIVE_TIME_SAVED = Histogram(
+    "speculative_retrieval_time_saved_seconds",
+    "Retrieval time overlapped with the first LLM call on prefetch hits",
+)
+
+RETRIEVAL_CONTEXT_TOKENS = Counter(
+    "retrieval_context_tokens_total",
+    "Retrieval context tokens sent to the LLM and saved by the context assembler",
+    ["result"],
+)
+
+INGESTION_CHUNKS = Counter(
+    "ingestion_chunks_total",
+    "Chunks embedded and upserted by the ingestion pipeline",
+    ["status"],
+)
+
+INGESTION_THROUGHPUT = Histogram(
+    "ingestion_chunks_per_second",
+    "Chunks per second of each ingestion run",
+    buckets=(1, 5, 10, 25, 50, 100, 250, 500, 1000),
+)
+
+INGESTION_JOBS = Counter(
+    "ingestion_jobs_total",
+    "Ingestion jobs by outcome (succeeded, retried, failed)",
+    ["status"],
+)
+
+CACHE_REQUESTS = Counter(
+    "cache_requests_total",
+    "Total number of in-process cache lookups",
+    ["cache", "result"],
+)
+
+RETRIEVAL_STAGE_DURATION = Histogram(
+    "retrieval_stage_duration_seconds",
+    "Duration of each retrieval stage in seconds (candidates, hydrate, rerank)",
+    ["stage"],
+)
+
 
 class MonitoringConfig:
     """Configuration class for monitoring setup"""
@@ -206,6 +265,55 @@ def increment_database_queries(operation: str, collection: str):
     DATABASE_QUERIES.labels(operation=operation, collection=collection).inc()
 
 
+def observe_stream_ttfb(endpoint: str, duration: float):
+    """Record time to first byte of a streaming response"""
+    STREAM_TIME_TO_FIRST_BYTE.labels(endpoint=endpoint).observe(duration)
+
+
+def observe_tool_duration(tool_name: str, duration: float, status: str = "success"):
+    """Record AI agent tool execution duration"""
+    TOOL_DURATION.labels(tool_name=tool_name, status=status).observe(duration)
+
+
+def increment_speculative_prefetch(result: str):
+    """Increment speculative retrieval counter"""
+    SPECULATIVE_PREFETCH.labels(result=result).inc()
+
+
+def observe_speculative_time_saved(duration: float):
+    """Record retrieval time saved by a speculative prefetch hit"""
+    SPECULATIVE_TIME_SAVED.observe(duration)
+
+
+def increment_context_tokens(sent: int, saved: int):
+    """Increment retrieval context token counters"""
+    RETRIEVAL_CONTEXT_TOKENS.labels(result="sent").inc(sent)
+    RETRIEVAL_CONTEXT_TOKENS.labels(result="saved").inc(saved)
+
+
+def observe_ingestion(chunks: int, failed: int, duration: float):
+    """Record chunks ingested and the throughput of an ingestion run"""
+    INGESTION_CHUNKS.labels(status="success").inc(chunks)
+    INGESTION_CHUNKS.labels(status="error").inc(failed)
+    if duration > 0 and chunks:
+        INGESTION_THROUGHPUT.observe(chunks / duration)
+
+
+def increment_ingestion_jobs(status: str):
+    """Increment ingestion job outcome counter"""
+    INGESTION_JOBS.labels(status=status).inc()
+
+
+def increment_cache_request(cache: str, result: str):
+    """Increment cache lookup counter (result is "hit" or "miss")"""
+    CACHE_REQUESTS.labels(cache=cache, result=result).inc()
+
+
+def observe_retrieval_stage(stage: str, duration: float):
+    """Record the duration of a retrieval stage"""
+    RETRIEVAL_STAGE_DURATION.labels(stage=stage).observe(duration)
+
+
 # Context managers for easy tracing
 class trace_operation:
     """Context manager for tracing operations"""
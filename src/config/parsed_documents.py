@@ -0,0 +1,56 @@
+import os
+import asyncio
+from typing import Dict, Tuple
+from src.data_preprocessing.parsing import (
+    DocumentSource,
+    ParsedDocument,
+    parse_document,
+)
+from src.utils.cache import LRUCache
+
+PARSED_DOCUMENT_CACHE_SIZE = int(os.getenv("PARSED_DOCUMENT_CACHE_SIZE", "32"))
+PARSED_DOCUMENT_CACHE_TTL_SECONDS = int(
+    os.getenv("PARSED_DOCUMENT_CACHE_TTL_SECONDS", "3600")
+)
+
+
+class ParsedDocumentCache:
+    """Parsed uploads keyed by content hash and extension.
+
+    The frontend analyzes a file right before ingesting it, so the text and
+    chunks /file/analyze extracts are kept for the ingestion job of the same
+    bytes. Concurrent requests for one document share a single parse.
+    """
+
+    def __init__(
+        self,
+        maxsize: int = PARSED_DOCUMENT_CACHE_SIZE,
+        ttl_seconds: int = PARSED_DOCUMENT_CACHE_TTL_SECONDS,
+    ):
+        self.cache = LRUCache(maxsize, ttl=ttl_seconds, name="parsed_document")
+        self._pending: Dict[Tuple[str, str], asyncio.Future] = {}
+
+    async def _parse(
+        self, source: DocumentSource, extension: str, key: Tuple[str, str]
+    ) -> ParsedDocument:
+        parsed = await parse_document(source, extension)
+        self.cache.set(key, parsed)
+        return parsed
+
+    async def parse(
+        self, source: DocumentSource, extension: str, sha256: str
+    ) -> ParsedDocument:
+        key = (sha256, extension)
+        parsed = self.cache.get(key)
+        if parsed is not None:
+            return parsed
+        task = self._pending.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._parse(source, extension, key))
+            self._pending[key] = task
+            task.add_done_callback(lambda _: self._pending.pop(key, None))
+        # A cancelled caller leaves the parse running for the others
+        return await asyncio.shield(task)
+
+
+parsed_document_cache = ParsedDocumentCache()
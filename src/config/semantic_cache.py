@@ -0,0 +1,152 @@
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+import numpy as np
+from bson import ObjectId
+from langchain_core.embeddings import Embeddings
+from src.config.llm import embeddings
+from src.config.mongo import bot_crud
+from src.config.monitoring import increment_cache_request
+from src.utils.logger import logger
+
+SEMANTIC_CACHE_ENABLED = os.getenv("SEMANTIC_CACHE_ENABLED", "false").lower() == "true"
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.95"))
+SEMANTIC_CACHE_TTL_SECONDS = int(os.getenv("SEMANTIC_CACHE_TTL_SECONDS", "3600"))
+SEMANTIC_CACHE_MAX_ENTRIES = int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES", "200"))
+SEMANTIC_CACHE_MAX_BOTS = int(os.getenv("SEMANTIC_CACHE_MAX_BOTS", "1000"))
+
+
+class SemanticAnswerCache:
+    """Per-bot cache of final answers keyed by the query embedding.
+
+    A lookup embeds the query and returns the stored answer of the most similar
+    earlier query when its cosine similarity reaches `threshold`. Entries expire
+    after `ttl_seconds`; each bot keeps at most `max_entries` answers and the
+    least recently hit ones are evicted first.
+
+    A lookup hands back a generation that `store` must present: an answer
+    whose bot was invalidated while it was being generated is not cached.
+    Entries also carry the bot's `answer_cache_version` from Mongo, which
+    `invalidate_shared` bumps so that other processes drop their answers,
+    through the bot change stream or, without one, once their bot config
+    cache reloads the new version.
+    """
+
+    def __init__(
+        self,
+        embedding: Embeddings,
+        threshold: float = SEMANTIC_CACHE_THRESHOLD,
+        ttl_seconds: int = SEMANTIC_CACHE_TTL_SECONDS,
+        max_entries: int = SEMANTIC_CACHE_MAX_ENTRIES,
+        max_bots: int = SEMANTIC_CACHE_MAX_BOTS,
+    ):
+        self.embedding = embedding
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.max_bots = max_bots
+        # bot_id -> OrderedDict[entry_id, (expire_at, vector, payload, version)]
+        self._bots: "OrderedDict[str, OrderedDict]" = OrderedDict()
+        # bot_id -> number of local invalidations, `_epoch` counts `clear` calls
+        self._generations: Dict[str, int] = {}
+        self._epoch = 0
+        self._next_id = 0
+
+    async def embed(self, query: str) -> np.ndarray:
+        vector = np.asarray(await self.embedding.aembed_query(query), dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _entries(self, bot_id: str, version: int) -> Optional[OrderedDict]:
+        entries = self._bots.get(bot_id)
+        if entries is None:
+            return None
+        now = time.monotonic()
+        for entry_id in [
+            k
+            for k, (expire_at, _, _, entry_version) in entries.items()
+            if expire_at < now or entry_version != version
+        ]:
+            del entries[entry_id]
+        return entries
+
+    async def lookup(
+        self, bot_id: str, query: str, version: int = 0
+    ) -> Tuple[Optional[Dict[str, Any]], np.ndarray, Tuple[int, int, int]]:
+        """Return the cached payload (or None), and the query vector and
+        generation for a later `store`.
+
+        `version` is the bot's answer_cache_version as last read from Mongo.
+        """
+        generation = (self._epoch, self._generations.get(bot_id, 0), version)
+        vector = await self.embed(query)
+        entries = self._entries(bot_id, version)
+        if entries:
+            entry_ids = list(entries.keys())
+            matrix = np.stack([entries[entry_id][1] for entry_id in entry_ids])
+            scores = matrix @ vector
+            best = int(np.argmax(scores))
+            if scores[best] >= self.threshold:
+                entries.move_to_end(entry_ids[best])
+                self._bots.move_to_end(bot_id)
+                increment_cache_request("semantic_answer", "hit")
+                logger.info(
+                    f"Semantic cache hit for bot {bot_id} (score={scores[best]:.3f})"
+                )
+                return entries[entry_ids[best]][2], vector, generation
+        increment_cache_request("semantic_answer", "miss")
+        return None, vector, generation
+
+    def store(
+        self,
+        bot_id: str,
+        vector: np.ndarray,
+        payload: Dict[str, Any],
+        generation: Tuple[int, int, int],
+    ) -> None:
+        epoch, local_generation, version = generation
+        if (epoch, local_generation) != (self._epoch, self._generations.get(bot_id, 0)):
+            # Knowledge base or prompt changed while the answer was generated
+            logger.info(f"Not caching a stale answer of bot {bot_id}")
+            return
+        entries = self._bots.setdefault(bot_id, OrderedDict())
+        self._bots.move_to_end(bot_id)
+        self._next_id += 1
+        entries[self._next_id] = (
+            time.monotonic() + self.ttl_seconds,
+            vector,
+            payload,
+            version,
+        )
+        while len(entries) > self.max_entries:
+            entries.popitem(last=False)
+        while len(self._bots) > self.max_bots:
+            self._bots.popitem(last=False)
+
+    def invalidate(self, bot_id: str) -> None:
+        """Drop every cached answer of a bot in this process (knowledge base or prompt changed)."""
+        self._generations[bot_id] = self._generations.get(bot_id, 0) + 1
+        if self._bots.pop(bot_id, None) is not None:
+            logger.info(f"Semantic cache invalidated for bot {bot_id}")
+
+    def clear(self) -> None:
+        """Drop every cached answer, e.g. after bot changes may have been missed."""
+        self._epoch += 1
+        self._bots.clear()
+        logger.info("Semantic cache cleared")
+
+    async def invalidate_shared(self, bot_id: str) -> None:
+        """Invalidate a bot here and, through its Mongo version, in every process."""
+        self.invalidate(bot_id)
+        if not SEMANTIC_CACHE_ENABLED:
+            return
+        try:
+            await bot_crud.update(
+                {"_id": ObjectId(bot_id)}, {"$inc": {"answer_cache_version": 1}}
+            )
+        except Exception as e:
+            logger.error(f"Cannot bump answer cache version of bot {bot_id}: {e}")
+
+
+semantic_answer_cache = SemanticAnswerCache(embeddings)
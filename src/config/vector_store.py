@@ -1,62 +1,823 @@
-from .llm import embeddings
+from .llm import embeddings, get_embeddings
 import os
+import time
+import asyncio
+import numpy as np
 from langchain_pinecone import PineconeVectorStore
-from pydantic import BaseModel
-from langchain_google_genai.embeddings import GoogleGenerativeAIEmbeddings
-from typing import List, Dict, Any, Optional
+from langchain_core.embeddings import Embeddings
+from typing import Iterator, List, Dict, Any, Optional, Tuple
 from langchain_core.documents import Document
 from langchain_core.vectorstores import VectorStore
+from src.config.lexical_index import LexicalIndexStore, lexical_index
+from src.config.local_vector_store import LocalVectorStore, partition_of
+from src.config.chunk_registry import ChunkRegistry, chunk_registry
+from src.config.chunk_store import ChunkTextStore, chunk_text_store
+from src.config.embedding_routes import EmbeddingRoutes, embedding_routes
+from src.utils.logger import logger
+from src.config.monitoring import observe_retrieval_stage
+from src.utils.bm25 import reciprocal_rank_fusion
+from src.utils.rerank import RerankWeights, rerank
 
 API_PINCONE_KEY = os.getenv("PINECONE_API_KEY")
-
-test_rag_vector_store = PineconeVectorStore(
-    index_name="rag-vector-store",
-    embedding=embeddings,
-    pinecone_api_key=API_PINCONE_KEY,
+# "pinecone" or "local" (memory-mapped store on disk, no network needed)
+VECTOR_STORE_BACKEND = os.getenv("VECTOR_STORE_BACKEND", "pinecone")
+# Keep each bot in its own Pinecone namespace (run migrate_namespaces first)
+BOT_NAMESPACES = os.getenv("BOT_NAMESPACES", "false").lower() == "true"
+# "vector", "lexical" or "hybrid" (BM25 and vector results fused with RRF)
+RETRIEVAL_MODE = os.getenv("RETRIEVAL_MODE", "vector")
+RETRIEVAL_MODES = ("vector", "lexical", "hybrid")
+# Candidates taken from each ranking before fusion
+HYBRID_CANDIDATES = int(os.getenv("HYBRID_CANDIDATES", "20"))
+RRF_K = int(os.getenv("RRF_K", "60"))
+# Second retrieval stage: over-fetch vector candidates and re-rank them locally
+RERANK_ENABLED = os.getenv("RERANK_ENABLED", "false").lower() == "true"
+RERANK_CANDIDATES = int(os.getenv("RERANK_CANDIDATES", "40"))
+# Fewer, better chunks than the single-stage k keep the prompt short
+RERANK_TOP_N = int(os.getenv("RERANK_TOP_N", "3"))
+RERANK_WEIGHTS = RerankWeights(
+    cosine=float(os.getenv("RERANK_COSINE_WEIGHT", "0.7")),
+    bm25=float(os.getenv("RERANK_BM25_WEIGHT", "0.3")),
+    mmr_lambda=float(os.getenv("RERANK_MMR_LAMBDA", "0.7")),
 )
+# Pinecone accepts at most 1000 ids per fetch/delete request
+VECTOR_BATCH_SIZE = int(os.getenv("VECTOR_BATCH_SIZE", "1000"))
+# Metadata kept on vectors whose text lives in the chunk text store
+SLIM_METADATA_FIELDS = ("bot_id", "source", "page", "start_index", "content_hash")
+# Vectors per Pinecone upsert request when writing slim vectors directly
+PINECONE_UPSERT_BATCH_SIZE = int(os.getenv("PINECONE_UPSERT_BATCH_SIZE", "100"))
+# Upper bound of the one-off listing used to register chunks indexed before the
+# registry, only for stores that cannot enumerate ids (Pinecone and local page by id)
+LEGACY_LISTING_LIMIT = 10000
+
+
+def build_vector_store(
+    index_name: str,
+    embedding: Embeddings,
+    pinecone_api_key: Optional[str] = API_PINCONE_KEY,
+    backend: str = VECTOR_STORE_BACKEND,
+) -> VectorStore:
+    """Create the vector store of the configured backend."""
+    if backend == "local":
+        return LocalVectorStore(embedding, index_name=index_name)
+    if backend == "pinecone":
+        return PineconeVectorStore(
+            index_name=index_name,
+            embedding=embedding,
+            pinecone_api_key=pinecone_api_key,
+        )
+    raise ValueError(f"Unsupported vector store backend: {backend}")
+
+
+def bot_namespace(bot_id: str) -> str:
+    return f"bot-{bot_id}"
+
+
+def slim_metadata(metadata: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        key: metadata[key]
+        for key in SLIM_METADATA_FIELDS
+        if metadata.get(key) is not None
+    }
+
+
+test_rag_vector_store = build_vector_store("rag-vector-store", embeddings)
+
+
+class PineconeVectorStoreCRUD:
+    """Vector store (Pinecone or local backend) with a per-bot BM25 index beside it.
+
+    Documents added through this class are indexed in both and recorded in the
+    chunk registry, which backs listing and deletion. `retrieval_mode`
+    selects how `search` ranks chunks: by vector similarity, by BM25, or by
+    reciprocal rank fusion of both. Lexical and hybrid search need a `bot_id`
+    in the filter since the BM25 indexes are per bot.
+
+    With `bot_namespaces` on a Pinecone backend, every bot lives in its own
+    namespace: the `bot_id` condition of a filter selects the namespace
+    instead of being evaluated per vector, and deleting a bot drops its
+    namespace in one request. The local backend is partitioned per bot
+    already.
 
+    With `rerank` on, vector and hybrid searches run in two stages: the
+    `rerank_candidates` nearest chunks are fetched with their vectors and
+    the best `rerank_top_n` are picked locally by cosine similarity, BM25
+    term overlap and MMR diversity (see `src.utils.rerank`). The BM25
+    overlap takes the place of hybrid fusion in that case.
 
-class PineconeVectorStoreCRUD(BaseModel):
-    index_name: str
-    embedding: GoogleGenerativeAIEmbeddings
-    pinecone_api_key: str
+    With a `text_store`, chunk bodies are written there (compressed, keyed by
+    chunk id) and vectors only carry the `SLIM_METADATA_FIELDS`. Documents
+    read back from the vector store are hydrated with one batched read per
+    bot; chunks written before the option was enabled keep their inline
+    text.
+
+    `routes` (Pinecone only) move single bots to another embedding model:
+    a routed bot is searched in its own namespace with query vectors of its
+    model, and while a bot is being re-embedded every write and delete is
+    mirrored to the target namespace (see `reembed`).
+    """
 
     def __init__(
         self,
         index_name: str,
-        embedding: GoogleGenerativeAIEmbeddings,
+        embedding: Embeddings,
         pinecone_api_key: str,
         k: int = 5,
         score_threshold: float = 0.3,
-    ) -> VectorStore:
-        self.vector_store = PineconeVectorStore(
-            index_name=index_name,
-            embedding=embedding,
-            pinecone_api_key=pinecone_api_key,
+        retrieval_mode: str = RETRIEVAL_MODE,
+        vector_store: Optional[VectorStore] = None,
+        lexical_store: LexicalIndexStore = lexical_index,
+        registry: Optional[ChunkRegistry] = None,
+        bot_namespaces: bool = BOT_NAMESPACES,
+        rerank: bool = RERANK_ENABLED,
+        rerank_candidates: int = RERANK_CANDIDATES,
+        rerank_top_n: int = RERANK_TOP_N,
+        rerank_weights: RerankWeights = RERANK_WEIGHTS,
+        text_store: Optional[ChunkTextStore] = None,
+        routes: Optional[EmbeddingRoutes] = None,
+    ):
+        if retrieval_mode not in RETRIEVAL_MODES:
+            raise ValueError(f"Unsupported retrieval mode: {retrieval_mode}")
+        self.vector_store = vector_store or build_vector_store(
+            index_name, embedding, pinecone_api_key
+        )
+        self.k = k
+        self.score_threshold = score_threshold
+        self.retrieval_mode = retrieval_mode
+        self.lexical_store = lexical_store
+        self.registry = registry
+        self.bot_namespaces = bot_namespaces and isinstance(
+            self.vector_store, PineconeVectorStore
         )
+        self.rerank = rerank
+        self.rerank_candidates = rerank_candidates
+        self.rerank_top_n = rerank_top_n
+        self.rerank_weights = rerank_weights
+        self.text_store = text_store
+        self.routes = (
+            routes if isinstance(self.vector_store, PineconeVectorStore) else None
+        )
+        self._registry_checked = set()
+        self._registry_lock = asyncio.Lock()
+        self._lexical_checked = set()
+        self._lexical_lock = asyncio.Lock()
         self.retriever = self.vector_store.as_retriever(
             search_type="similarity_score_threshold",
             search_kwargs={"k": k, "score_threshold": score_threshold},
         )
 
-    async def search(self, query: str, filter: Optional[Dict[str, Any]] = None):
-        return await self.retriever.ainvoke(query, filter=filter)
+    def namespace_kwargs(self, bot_id: Optional[str]) -> Dict[str, str]:
+        """Extra arguments routing a vector store call to the bot's namespace."""
+        serving = self.routes.serving(bot_id) if self.routes is not None else None
+        if serving:
+            return {"namespace": serving[1]}
+        if self.bot_namespaces and bot_id:
+            return {"namespace": bot_namespace(bot_id)}
+        return {}
+
+    def namespace_of(self, bot_id: Optional[str]) -> Optional[str]:
+        return self.namespace_kwargs(bot_id).get(
+            "namespace", getattr(self.vector_store, "_namespace", None)
+        )
+
+    def partition_kwargs(self, bot_id: Optional[str]) -> Dict[str, str]:
+        """Extra arguments limiting a fetch or delete by id to the bot's chunks."""
+        if isinstance(self.vector_store, LocalVectorStore):
+            return {"bot_id": bot_id} if bot_id else {}
+        return self.namespace_kwargs(bot_id)
+
+    def embeddings_for(self, bot_id: Optional[str]) -> Embeddings:
+        """Model of the vectors the bot's reads are served from."""
+        serving = self.routes.serving(bot_id) if self.routes is not None else None
+        return get_embeddings(serving[0]) if serving else self.vector_store.embeddings
+
+    async def refresh_routes(self):
+        if self.routes is not None:
+            await self.routes.refresh()
+
+    def _scope(
+        self, filter: Optional[Dict[str, Any]]
+    ) -> Tuple[Optional[Dict[str, Any]], Dict[str, str]]:
+        """Turn the bot_id condition of a filter into a namespace when enabled."""
+        bot_id = partition_of(filter)
+        kwargs = self.namespace_kwargs(bot_id)
+        if kwargs:
+            filter = {key: value for key, value in filter.items() if key != "bot_id"}
+        return filter or None, kwargs
+
+    async def vector_search(
+        self, query: str, k: int, filter: Optional[Dict[str, Any]] = None
+    ) -> List[Tuple[Document, float]]:
+        routed = self.routes is not None and self.routes.serving(partition_of(filter))
+        if self.text_store is not None or routed:
+            # LangChain's Pinecone search drops matches without inline text and
+            # embeds queries with the default model
+            _, matches = await self.vector_candidates(
+                query, k, filter, include_values=False
+            )
+            hydrated = await self.hydrate([document for document, _, _ in matches])
+            kept = {id(document) for document in hydrated}
+            return [
+                (document, score)
+                for document, score, _ in matches
+                if id(document) in kept
+            ]
+        filter, kwargs = self._scope(filter)
+        return await self.vector_store.asimilarity_search_with_relevance_scores(
+            query, k=k, score_threshold=self.score_threshold, filter=filter, **kwargs
+        )
+
+    async def vector_candidates(
+        self,
+        query: str,
+        k: int,
+        filter: Optional[Dict[str, Any]] = None,
+        include_values: bool = True,
+    ) -> Tuple[List[float], List[Tuple[Document, float, Optional[np.ndarray]]]]:
+        """Embed `query` and return its `k` nearest chunks with their stored vectors."""
+        query_vector = await self.embeddings_for(partition_of(filter)).aembed_query(
+            query
+        )
+        # The relevance threshold of a plain search, as a cosine similarity
+        min_cosine = 2 * self.score_threshold - 1
+        filter, kwargs = self._scope(filter)
+        if isinstance(self.vector_store, LocalVectorStore):
+            matches = await asyncio.to_thread(
+                self.vector_store.similarity_search_with_vectors,
+                query_vector,
+                k,
+                filter,
+                min_cosine,
+            )
+        else:
+            matches = await asyncio.to_thread(
+                self._pinecone_query,
+                query_vector,
+                k,
+                filter,
+                kwargs.get("namespace", self.vector_store._namespace),
+                include_values,
+            )
+            matches = [match for match in matches if match[1] >= min_cosine]
+        return query_vector, [
+            (document, (cosine + 1) / 2, vector) for document, cosine, vector in matches
+        ]
+
+    def _pinecone_query(
+        self,
+        vector: List[float],
+        k: int,
+        filter: Optional[Dict[str, Any]],
+        namespace: Optional[str],
+        include_values: bool = True,
+    ) -> List[Tuple[Document, float, Optional[np.ndarray]]]:
+        response = self.vector_store.index.query(
+            vector=vector,
+            top_k=k,
+            include_values=include_values,
+            include_metadata=True,
+            filter=filter,
+            namespace=namespace,
+        )
+        matches = []
+        for match in response.matches:
+            metadata = dict(match.metadata or {})
+            text = metadata.pop(self.vector_store._text_key, "")
+            document = Document(id=match.id, page_content=text, metadata=metadata)
+            values = (
+                np.asarray(match.values, dtype=np.float32) if include_values else None
+            )
+            matches.append((document, match.score, values))
+        return matches
+
+    async def hydrate(self, documents: List[Document]) -> List[Document]:
+        """Fill in the text of chunks whose body lives in the text store.
+
+        Chunks missing from the text store are logged and left out of the
+        result rather than reaching the LLM with no text.
+        """
+        if self.text_store is None:
+            return documents
+        by_bot: Dict[str, List[Document]] = {}
+        for document in documents:
+            bot_id = document.metadata.get("bot_id")
+            if not document.page_content and bot_id:
+                by_bot.setdefault(bot_id, []).append(document)
+        if not by_bot:
+            return documents
+        start_time = time.perf_counter()
+        missing = set()
+        for bot_id, bot_documents in by_bot.items():
+            texts = await self.text_store.get(
+                bot_id, [document.id for document in bot_documents]
+            )
+            for document in bot_documents:
+                if document.id in texts:
+                    document.page_content = texts[document.id]
+                else:
+                    missing.add(id(document))
+            if len(texts) < len(bot_documents):
+                logger.warning(
+                    f"{len(bot_documents) - len(texts)} chunks of bot {bot_id} "
+                    "missing from the chunk text store, dropped"
+                )
+        observe_retrieval_stage("hydrate", time.perf_counter() - start_time)
+        return [document for document in documents if id(document) not in missing]
+
+    async def two_stage_search(
+        self, query: str, filter: Optional[Dict[str, Any]] = None
+    ) -> List[Tuple[Document, float]]:
+        """Over-fetch vector candidates, then re-rank them locally."""
+        start_time = time.perf_counter()
+        query_vector, candidates = await self.vector_candidates(
+            query, self.rerank_candidates, filter
+        )
+        candidates_duration = time.perf_counter() - start_time
+        observe_retrieval_stage("candidates", candidates_duration)
+        if not candidates:
+            return []
+        # BM25 overlap needs the candidates' text
+        hydrated = await self.hydrate([document for document, _, _ in candidates])
+        kept = {id(document) for document in hydrated}
+        candidates = [candidate for candidate in candidates if id(candidate[0]) in kept]
+        if not candidates:
+            return []
+
+        start_time = time.perf_counter()
+        picked = rerank(
+            query,
+            query_vector,
+            np.stack([vector for _, _, vector in candidates]),
+            [document.page_content for document, _, _ in candidates],
+            self.rerank_top_n,
+            self.rerank_weights,
+        )
+        rerank_duration = time.perf_counter() - start_time
+        observe_retrieval_stage("rerank", rerank_duration)
+        # Per-query detail; the stage histogram covers production monitoring
+        logger.debug(
+            f"Two-stage retrieval: {len(candidates)} candidates in "
+            f"{candidates_duration:.3f}s, re-ranked to {len(picked)} in "
+            f"{rerank_duration * 1000:.1f}ms"
+        )
+        return [(candidates[index][0], score) for index, score in picked]
+
+    async def lexical_hits(
+        self, query: str, bot_id: str, k: int
+    ) -> List[Tuple[str, float]]:
+        """The `k` best (chunk id, BM25 score) pairs of the bot's lexical index."""
+        await self.ensure_lexical_indexed(bot_id)
+        return await asyncio.to_thread(self.lexical_store.search, bot_id, query, k)
+
+    async def resolve_hits(
+        self,
+        bot_id: str,
+        hits: List[Tuple[str, float]],
+        known: Optional[Dict[str, Document]] = None,
+    ) -> List[Tuple[Document, float]]:
+        """Pair ranked chunk ids with their documents, fetching those not `known`."""
+        documents = dict(known or {})
+        missing = [doc_id for doc_id, _ in hits if doc_id not in documents]
+        if missing:
+            for document in await self.get_documents_by_ids(missing, bot_id=bot_id):
+                documents[document.id] = document
+        lost = [doc_id for doc_id, _ in hits if doc_id not in documents]
+        if lost:
+            logger.warning(
+                f"{len(lost)} chunks of bot {bot_id} in its lexical index are missing "
+                "from the vector store"
+            )
+        return [
+            (documents[doc_id], score) for doc_id, score in hits if doc_id in documents
+        ]
+
+    async def lexical_search(
+        self, query: str, bot_id: str, k: int
+    ) -> List[Tuple[Document, float]]:
+        return await self.resolve_hits(
+            bot_id, await self.lexical_hits(query, bot_id, k)
+        )
+
+    async def search_with_scores(
+        self,
+        query: str,
+        filter: Optional[Dict[str, Any]] = None,
+        mode: Optional[str] = None,
+    ) -> List[Tuple[Document, float]]:
+        """Return up to `k` (document, score) pairs ranked according to `mode`.
+
+        Scores are relevance scores in vector mode, BM25 scores in lexical mode
+        and fused RRF scores in hybrid mode. Re-ranked searches return the
+        blended cosine/BM25 relevance of each chunk.
+        """
+        mode = mode or self.retrieval_mode
+        bot_id = (filter or {}).get("bot_id")
+        await self.refresh_routes()
+        if self.rerank and mode != "lexical":
+            return await self.two_stage_search(query, filter)
+        if mode == "vector" or not bot_id:
+            return await self.vector_search(query, self.k, filter)
+        if mode == "lexical":
+            return await self.lexical_search(query, bot_id, self.k)
+
+        vector_results, lexical_hits = await asyncio.gather(
+            self.vector_search(query, HYBRID_CANDIDATES, filter),
+            self.lexical_hits(query, bot_id, HYBRID_CANDIDATES),
+        )
+        fused = reciprocal_rank_fusion(
+            [
+                [doc.id for doc, _ in vector_results],
+                [doc_id for doc_id, _ in lexical_hits],
+            ],
+            k=RRF_K,
+        )
+        # Only lexical hits that made the cut and the vector search missed are fetched
+        return await self.resolve_hits(
+            bot_id, fused[: self.k], {doc.id: doc for doc, _ in vector_results}
+        )
+
+    async def search(
+        self,
+        query: str,
+        filter: Optional[Dict[str, Any]] = None,
+        mode: Optional[str] = None,
+    ):
+        return [
+            document
+            for document, _ in await self.search_with_scores(query, filter, mode)
+        ]
 
     async def add_documents(self, documents: List[Document], ids: List[str]):
-        await self.vector_store.aadd_documents(documents, ids=ids)
+        await self.prepare_bots(documents)
+        await self.upsert_vectors(documents, ids)
+        await self.index_documents(documents, ids)
+
+    async def prepare_bots(self, documents: List[Document]):
+        """Backfill the registry of the bots of `documents` before new chunks land."""
+        if self.registry is None:
+            return
+        # Afterwards the bot's registry count is no longer zero
+        for bot_id in {doc.metadata.get("bot_id") for doc in documents} - {None}:
+            await self.ensure_registered(bot_id)
+
+    async def upsert_vectors(self, documents: List[Document], ids: List[str]):
+        """Embed and write documents to the vector store only."""
+        await self.refresh_routes()
+        if not self.bot_namespaces and self.text_store is None and not self.routes:
+            await self.vector_store.aadd_documents(documents, ids=ids)
+            return
+        by_bot: Dict[Optional[str], Tuple[List[Document], List[str]]] = {}
+        for doc_id, document in zip(ids, documents):
+            bot_documents, bot_ids = by_bot.setdefault(
+                document.metadata.get("bot_id"), ([], [])
+            )
+            bot_documents.append(document)
+            bot_ids.append(doc_id)
+        for bot_id, (bot_documents, bot_ids) in by_bot.items():
+            routed = self.routes is not None and self.routes.serving(bot_id)
+            if bot_id and (self.text_store is not None or routed):
+                await self.upsert_direct(
+                    bot_id,
+                    bot_documents,
+                    bot_ids,
+                    self.embeddings_for(bot_id),
+                    self.namespace_of(bot_id),
+                )
+            else:
+                await self.vector_store.aadd_documents(
+                    bot_documents, ids=bot_ids, **self.namespace_kwargs(bot_id)
+                )
+            target = self.routes.target(bot_id) if self.routes is not None else None
+            if target:
+                await self.upsert_direct(
+                    bot_id,
+                    bot_documents,
+                    bot_ids,
+                    get_embeddings(target[0]),
+                    target[1],
+                    store_texts=False,
+                )
+
+    async def upsert_direct(
+        self,
+        bot_id: str,
+        documents: List[Document],
+        ids: List[str],
+        embeddings: Embeddings,
+        namespace: Optional[str],
+        store_texts: bool = True,
+    ):
+        """Embed and upsert without LangChain, for slim vectors and routed bots."""
+        texts = [document.page_content for document in documents]
+        if self.text_store is not None:
+            if store_texts:
+                # Bodies go first so no vector ever points at a missing text
+                await self.text_store.put(bot_id, dict(zip(ids, texts)))
+            metadatas = [slim_metadata(document.metadata) for document in documents]
+        else:
+            metadatas = [
+                {
+                    **{k: v for k, v in document.metadata.items() if v is not None},
+                    self.vector_store._text_key: document.page_content,
+                }
+                for document in documents
+            ]
+        vectors = await embeddings.aembed_documents(texts)
+        if isinstance(self.vector_store, LocalVectorStore):
+            await asyncio.to_thread(
+                self.vector_store.add_vectors, [""] * len(ids), vectors, metadatas, ids
+            )
+            return
+        records = [
+            {"id": doc_id, "values": vector, "metadata": metadata}
+            for doc_id, vector, metadata in zip(ids, vectors, metadatas)
+        ]
+        for start in range(0, len(records), PINECONE_UPSERT_BATCH_SIZE):
+            await asyncio.to_thread(
+                self.vector_store.index.upsert,
+                vectors=records[start : start + PINECONE_UPSERT_BATCH_SIZE],
+                namespace=namespace,
+                show_progress=False,
+            )
+
+    async def index_documents(self, documents: List[Document], ids: List[str]):
+        """Record documents already in the vector store in the lexical index and registry."""
+        await asyncio.to_thread(self._index_lexical, documents, ids)
+        if self.registry is not None:
+            await self.registry.register(documents, ids)
 
     async def get_documents(self, filter: Optional[Dict[str, Any]] = None):
-        return await self.vector_store.asimilarity_search("", filter=filter)
+        filter, kwargs = self._scope(filter)
+        return await self.vector_store.asimilarity_search("", filter=filter, **kwargs)
+
+    async def get_documents_by_ids(
+        self, ids: List[str], bot_id: Optional[str] = None, hydrate: bool = True
+    ) -> List[Document]:
+        """Fetch chunks by id in batches, keeping the order of `ids`.
+
+        With `hydrate=False` chunks kept in the text store come back without
+        their text.
+        """
+        documents = []
+        namespace = self.namespace_of(bot_id)
+        for start in range(0, len(ids), VECTOR_BATCH_SIZE):
+            batch = ids[start : start + VECTOR_BATCH_SIZE]
+            if isinstance(self.vector_store, PineconeVectorStore):
+                documents.extend(
+                    await asyncio.to_thread(self._pinecone_fetch, batch, namespace)
+                )
+            else:
+                documents.extend(
+                    await asyncio.to_thread(
+                        self.vector_store.get_by_ids,
+                        batch,
+                        **self.partition_kwargs(bot_id),
+                    )
+                )
+        if hydrate:
+            documents = await self.hydrate(documents)
+        return documents
+
+    def _pinecone_fetch(
+        self, ids: List[str], namespace: Optional[str] = None
+    ) -> List[Document]:
+        response = self.vector_store.index.fetch(ids=ids, namespace=namespace)
+        documents = []
+        for doc_id in ids:
+            vector = response.vectors.get(doc_id)
+            if vector is None:
+                continue
+            metadata = dict(vector.metadata or {})
+            text = metadata.pop(self.vector_store._text_key, "")
+            documents.append(Document(id=doc_id, page_content=text, metadata=metadata))
+        return documents
 
-    async def delete_documents(self, ids: List[str]):
-        await self.vector_store.adelete(ids=ids)
+    async def delete_documents(self, ids: List[str], bot_id: Optional[str] = None):
+        deleted = None
+        await self.refresh_routes()
+        route = self.routes.get(bot_id) if self.routes is not None else None
+        # Copies being built by, or left behind by, a re-embedding
+        other_namespaces = {
+            (route or {}).get("target_namespace"),
+            (route or {}).get("previous_namespace"),
+        } - {None}
+        for start in range(0, len(ids), VECTOR_BATCH_SIZE):
+            batch = ids[start : start + VECTOR_BATCH_SIZE]
+            deleted = await self.vector_store.adelete(
+                ids=batch, **self.partition_kwargs(bot_id)
+            )
+            for namespace in other_namespaces:
+                await self.vector_store.adelete(ids=batch, namespace=namespace)
+            if bot_id:
+                await asyncio.to_thread(
+                    self.lexical_store.delete_documents, bot_id, batch
+                )
+                if self.text_store is not None:
+                    await self.text_store.delete(bot_id, batch)
+            if self.registry is not None:
+                await self.registry.unregister(batch)
+        return deleted
 
     async def update_documents(self, documents: List[Document], ids: List[str]):
-        await self.vector_store.aadd_documents(documents, ids=ids)
+        await self.add_documents(documents, ids)
+
+    def _legacy_pages(self, bot_id: str) -> Iterator[List[Document]]:
+        """The bot's chunks as stored in the vector store, one page of ids at a time."""
+        if isinstance(self.vector_store, PineconeVectorStore):
+            namespace = self.namespace_of(bot_id)
+            for ids in self.vector_store.index.list(namespace=namespace or ""):
+                # A shared namespace lists the ids of every bot
+                yield [
+                    document
+                    for document in self._pinecone_fetch(ids, namespace)
+                    if document.metadata.get("bot_id") == bot_id
+                ]
+        elif isinstance(self.vector_store, LocalVectorStore):
+            partition = self.vector_store.partition(bot_id)
+            ids = partition.ids()
+            for start in range(0, len(ids), VECTOR_BATCH_SIZE):
+                yield partition.get(ids[start : start + VECTOR_BATCH_SIZE])
+        else:
+            filter, kwargs = self._scope({"bot_id": bot_id})
+            documents = self.vector_store.similarity_search(
+                "", LEGACY_LISTING_LIMIT, filter=filter, **kwargs
+            )
+            if len(documents) >= LEGACY_LISTING_LIMIT:
+                logger.warning(
+                    f"Bot {bot_id} has more than {LEGACY_LISTING_LIMIT} legacy chunks, "
+                    "its chunk registry is incomplete"
+                )
+            yield documents
+
+    async def ensure_registered(self, bot_id: str):
+        """Register chunks a bot had before the registry existed (runs once per bot)."""
+        if bot_id in self._registry_checked:
+            return
+        async with self._registry_lock:
+            if bot_id in self._registry_checked:
+                return
+            if not await self.registry.count(bot_id):
+                pages = self._legacy_pages(bot_id)
+                registered = 0
+                while True:
+                    documents = await asyncio.to_thread(next, pages, None)
+                    if documents is None:
+                        break
+                    if documents:
+                        await self.registry.register(
+                            documents, [document.id for document in documents]
+                        )
+                        registered += len(documents)
+                if registered:
+                    logger.info(f"Registered {registered} legacy chunks of bot {bot_id}")
+            self._registry_checked.add(bot_id)
+
+    async def ensure_lexical_indexed(self, bot_id: str):
+        """Index chunks missing from a bot's lexical index (runs once per bot)."""
+        if bot_id in self._lexical_checked:
+            return
+        async with self._lexical_lock:
+            if bot_id in self._lexical_checked:
+                return
+            if self.registry is None:
+                logger.warning(
+                    f"No chunk registry, chunks of bot {bot_id} indexed before its "
+                    "lexical index are missing from lexical search"
+                )
+                self._lexical_checked.add(bot_id)
+                return
+            await self.ensure_registered(bot_id)
+            indexed = await asyncio.to_thread(self.lexical_store.ids, bot_id)
+            if len(indexed) < await self.registry.count(bot_id):
+                backfilled, after = 0, None
+                while True:
+                    entries = await self.registry.list_after(
+                        bot_id, after, VECTOR_BATCH_SIZE
+                    )
+                    if not entries:
+                        break
+                    after = (entries[-1]["created_at"], entries[-1]["chunk_id"])
+                    missing = [
+                        entry["chunk_id"]
+                        for entry in entries
+                        if entry["chunk_id"] not in indexed
+                    ]
+                    if not missing:
+                        continue
+                    documents = await self.get_documents_by_ids(missing, bot_id=bot_id)
+                    await asyncio.to_thread(
+                        self.lexical_store.add_documents,
+                        bot_id,
+                        documents,
+                        [document.id for document in documents],
+                    )
+                    backfilled += len(documents)
+                logger.info(
+                    f"Added {backfilled} legacy chunks of bot {bot_id} to its lexical index"
+                )
+            self._lexical_checked.add(bot_id)
+
+    async def list_bot_documents(
+        self, bot_id: str, skip: int = 0, limit: int = 0, include_content: bool = True
+    ) -> Tuple[List[Document], int]:
+        """A page of a bot's chunks in insertion order and the bot's total count."""
+        await self.ensure_registered(bot_id)
+        entries = await self.registry.list(bot_id, skip=skip, limit=limit)
+        documents = await self.get_documents_by_ids(
+            [entry["chunk_id"] for entry in entries],
+            bot_id=bot_id,
+            hydrate=include_content,
+        )
+        if not include_content:
+            # Legacy chunks carry their text inline, leave it out all the same
+            for document in documents:
+                document.page_content = ""
+        return documents, await self.registry.count(bot_id)
+
+    async def delete_bot_documents(
+        self, bot_id: str, ids: Optional[List[str]] = None
+    ) -> int:
+        """Delete a bot's chunks (only those in `ids` when given) batch by batch."""
+        await self.ensure_registered(bot_id)
+        deleted = 0
+        while True:
+            # Deleted entries leave the registry, so the next read starts afresh
+            batch = await self.registry.chunk_ids(bot_id, ids, limit=VECTOR_BATCH_SIZE)
+            if not batch:
+                return deleted
+            await self.delete_documents(batch, bot_id=bot_id)
+            deleted += len(batch)
+
+    async def delete_namespace_copies(self, bot_id: str, namespace: str) -> None:
+        """Delete a bot's vectors from a namespace it is not served from."""
+        if namespace.startswith(bot_namespace(bot_id)):
+            try:
+                await self.vector_store.adelete(delete_all=True, namespace=namespace)
+            except Exception as e:
+                logger.warning(f"Cannot delete namespace {namespace}: {e}")
+            return
+        # Shared with other bots, only the bot's own chunk ids can go
+        after = None
+        while True:
+            entries = await self.registry.list_after(bot_id, after, VECTOR_BATCH_SIZE)
+            if not entries:
+                return
+            await self.vector_store.adelete(
+                ids=[entry["chunk_id"] for entry in entries], namespace=namespace
+            )
+            after = (entries[-1]["created_at"], entries[-1]["chunk_id"])
+
+    async def drop_bot(self, bot_id: str) -> None:
+        """Remove every chunk of a deleted bot from all indexes."""
+        route = None
+        if self.routes is not None:
+            await self.routes.refresh(force=True)
+            route = self.routes.get(bot_id)
+        if route:
+            for namespace in {
+                route.get("target_namespace"),
+                route.get("previous_namespace"),
+            } - {None}:
+                await self.delete_namespace_copies(bot_id, namespace)
+        if self.bot_namespaces or (route and route.get("namespace")):
+            try:
+                await self.vector_store.adelete(
+                    delete_all=True, **self.namespace_kwargs(bot_id)
+                )
+            except Exception as e:
+                # Pinecone answers 404 for a namespace that was never written
+                logger.warning(f"Cannot delete namespace of bot {bot_id}: {e}")
+        elif isinstance(self.vector_store, LocalVectorStore):
+            await asyncio.to_thread(self.vector_store.drop_partition, bot_id)
+        else:
+            await self.delete_bot_documents(bot_id)
+        if self.registry is not None:
+            await self.registry.drop_bot(bot_id)
+        if self.text_store is not None:
+            await self.text_store.drop_bot(bot_id)
+        if route:
+            await self.routes.drop_bot(bot_id)
+        await asyncio.to_thread(self.lexical_store.drop, bot_id)
+        self._registry_checked.discard(bot_id)
+        self._lexical_checked.discard(bot_id)
+
+    def _index_lexical(self, documents: List[Document], ids: List[str]):
+        by_bot: Dict[str, Tuple[List[Document], List[str]]] = {}
+        for doc_id, document in zip(ids, documents):
+            bot_id = document.metadata.get("bot_id")
+            if bot_id:
+                bot_documents, bot_ids = by_bot.setdefault(bot_id, ([], []))
+                bot_documents.append(document)
+                bot_ids.append(doc_id)
+        for bot_id, (bot_documents, bot_ids) in by_bot.items():
+            self.lexical_store.add_documents(bot_id, bot_documents, bot_ids)
 
 
-test_rag_vector_store = PineconeVectorStore(
+rag_vector_store = PineconeVectorStoreCRUD(
     index_name="rag-vector-store",
     embedding=embeddings,
     pinecone_api_key=API_PINCONE_KEY,
+    vector_store=test_rag_vector_store,
+    registry=chunk_registry,
+    text_store=chunk_text_store,
+    routes=embedding_routes,
 )
@@ -0,0 +1,160 @@
+import os
+import asyncio
+from typing import Dict, List, Optional, Tuple
+from bson import ObjectId
+from langchain_core.documents import Document
+from src.config.mongo import bot_crud
+from src.config.bot_cache import bot_config_cache
+from src.config.semantic_cache import semantic_answer_cache
+from src.config.ingestion_jobs import JobProgress
+from src.config.parsed_documents import parsed_document_cache
+from src.data_preprocessing.ingestion import (
+    IngestionStats,
+    SourceDiff,
+    ingestion_pipeline,
+)
+from src.utils.logger import logger
+
+
+async def add_retrieval_tool(bot_id: str) -> None:
+    try:
+        chatbot = await bot_crud.find_by_id(bot_id)
+        if chatbot:
+            tools = chatbot.get("tools", [])
+            retrieve_document_exists = False
+            for tool in tools:
+                # Tools may be stored as names or as dicts
+                name = tool.get("name") if isinstance(tool, dict) else tool
+                if name == "retrieve_document":
+                    retrieve_document_exists = True
+                    break
+            if not retrieve_document_exists:
+                tools.append("retrieve_document")
+                await bot_crud.update({"_id": ObjectId(bot_id)}, {"tools": tools})
+                bot_config_cache.invalidate(bot_id)
+                logger.info(f"Added retrieve_document tool to chatbot {bot_id}")
+    except Exception as e:
+        logger.error(f"Error updating chatbot tools: {str(e)}")
+
+
+async def ingest_file(
+    bot_id: str,
+    filename: str,
+    path: str,
+    sha256: str,
+    progress: Optional[JobProgress] = None,
+) -> Tuple[List[Document], SourceDiff, IngestionStats]:
+    """Index a file for a bot; re-uploads only embed new or moved chunks.
+
+    The file is parsed once per content hash: an upload analyzed just before
+    reuses the chunks /file/analyze extracted.
+    """
+    if progress is not None:
+        await progress.stage("parsing")
+    parsed = await parsed_document_cache.parse(
+        path, os.path.splitext(filename)[1].lower(), sha256
+    )
+    chunks = parsed.documents(bot_id, filename)
+    if progress is not None:
+        await progress.stage("embedding", chunks_total=len(chunks))
+    diff, stats = await ingestion_pipeline.sync_source(
+        bot_id, filename, chunks, progress.chunks if progress is not None else None
+    )
+    if diff.changed:
+        await semantic_answer_cache.invalidate_shared(bot_id)
+    if progress is not None:
+        await progress.stage("updating_bot")
+    await add_retrieval_tool(bot_id)
+    return chunks, diff, stats
+
+
+async def ingest_files(
+    bot_id: str,
+    files: List[Dict],
+    progress: Optional[JobProgress] = None,
+) -> Tuple[List[Dict], IngestionStats]:
+    """Index many files for a bot through one embedding run.
+
+    Files are parsed in parallel and the changes of all of them are embedded
+    and upserted together, so batches span files. A file that cannot be
+    parsed is reported as failed and the others are still indexed.
+    """
+    if progress is not None:
+        await progress.stage("parsing")
+    parsed = await asyncio.gather(
+        *(
+            parsed_document_cache.parse(
+                file["spool_path"],
+                os.path.splitext(file["filename"])[1].lower(),
+                file["sha256"],
+            )
+            for file in files
+        ),
+        return_exceptions=True,
+    )
+    results, sources = [], {}
+    for file, document in zip(files, parsed):
+        result = {**file, "diff": None, "error": None}
+        if isinstance(document, Exception):
+            logger.error(f"Error parsing {file['filename']}: {str(document)}")
+            result.update(status="failed", chunks=0, error=str(document))
+        else:
+            sources[file["filename"]] = document.documents(bot_id, file["filename"])
+            result.update(status="parsed", chunks=len(sources[file["filename"]]))
+        results.append(result)
+    if not sources:
+        raise ValueError("None of the files could be parsed")
+
+    if progress is not None:
+        await progress.stage(
+            "embedding",
+            chunks_total=sum(len(chunks) for chunks in sources.values()),
+            files=results,
+        )
+    diffs, stats = await ingestion_pipeline.sync_sources(
+        bot_id, sources, progress.chunks if progress is not None else None
+    )
+    for result in results:
+        if result["filename"] in diffs:
+            result.update(
+                status="indexed", diff=diffs[result["filename"]].summary()
+            )
+    if any(diff.changed for diff in diffs.values()):
+        await semantic_answer_cache.invalidate_shared(bot_id)
+    if sources:
+        if progress is not None:
+            await progress.stage("updating_bot")
+        # One tools update for the whole batch
+        await add_retrieval_tool(bot_id)
+    return results, stats
+
+
+async def run_ingestion_job(job: Dict, progress: JobProgress) -> Dict:
+    """Job handler of the ingestion queue, returns the fields stored on success."""
+    if job.get("files") is not None:
+        results, stats = await ingest_files(job["bot_id"], job["files"], progress)
+        diff = {
+            field: sum((result["diff"] or {}).get(field, 0) for result in results)
+            for field in SourceDiff().summary()
+        }
+        return {
+            "files": results,
+            "chunks_total": sum(result["chunks"] for result in results),
+            "chunks_processed": stats.chunks,
+            "chunks_per_second": round(stats.chunks_per_second, 2),
+            "diff": diff,
+        }
+
+    chunks, diff, stats = await ingest_file(
+        job["bot_id"],
+        job["filename"],
+        job["spool_path"],
+        job["sha256"],
+        progress,
+    )
+    return {
+        "chunks_total": len(chunks),
+        "chunks_processed": stats.chunks,
+        "chunks_per_second": round(stats.chunks_per_second, 2),
+        "diff": diff.summary(),
+    }
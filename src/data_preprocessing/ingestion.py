@@ -0,0 +1,314 @@
+import os
+import time
+import uuid
+import random
+import asyncio
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+from langchain_core.documents import Document
+from src.config.chunk_registry import content_hash
+from src.config.vector_store import PineconeVectorStoreCRUD, rag_vector_store
+from src.config.monitoring import observe_ingestion
+from src.utils.logger import logger
+
+INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", "64"))
+INGEST_MAX_IN_FLIGHT = int(os.getenv("INGEST_MAX_IN_FLIGHT", "4"))
+INGEST_MAX_RETRIES = int(os.getenv("INGEST_MAX_RETRIES", "3"))
+INGEST_RETRY_BACKOFF_SECONDS = float(os.getenv("INGEST_RETRY_BACKOFF_SECONDS", "1.0"))
+
+# Called with the chunks upserted so far and the chunks of the run
+ProgressCallback = Callable[[int, int], Awaitable[None]]
+
+
+@dataclass
+class IngestionStats:
+    chunks: int = 0
+    failed: int = 0
+    batches: int = 0
+    retries: int = 0
+    duration: float = 0.0
+
+    @property
+    def chunks_per_second(self) -> float:
+        return self.chunks / self.duration if self.duration > 0 else 0.0
+
+
+@dataclass
+class SourceDiff:
+    """Outcome of re-indexing one source file against what is already stored."""
+
+    added: int = 0
+    updated: int = 0
+    unchanged: int = 0
+    deleted: int = 0
+    chunk_ids: List[str] = field(default_factory=list)
+
+    @property
+    def changed(self) -> bool:
+        """Whether any stored chunk was added, rewritten or removed."""
+        return bool(self.added or self.updated or self.deleted)
+
+    def summary(self) -> Dict[str, int]:
+        return {
+            "added": self.added,
+            "updated": self.updated,
+            "unchanged": self.unchanged,
+            "deleted": self.deleted,
+        }
+
+
+@dataclass
+class SourcePlan:
+    """Chunks of one source file to upsert and to delete."""
+
+    diff: SourceDiff
+    documents: List[Document]
+    ids: List[str]
+    stale_ids: List[str]
+
+
+def chunk_id(bot_id: str, source: str, digest: str, occurrence: int) -> str:
+    """Stable id of the `occurrence`-th chunk with this content in a source."""
+    return str(
+        uuid.uuid5(uuid.NAMESPACE_URL, f"{bot_id}\n{source}\n{digest}\n{occurrence}")
+    )
+
+
+class IngestionError(Exception):
+    """Raised when a batch still fails after all retries."""
+
+    def __init__(self, message: str, stats: IngestionStats):
+        super().__init__(message)
+        self.stats = stats
+
+
+class IngestionPipeline:
+    """Embed and upsert chunks in batches with bounded concurrency.
+
+    Chunks are split into `batch_size` batches (one embedding and one upsert
+    request each) and at most `max_in_flight` batches run at a time. A failed
+    batch is retried with exponential backoff; upserts use fixed ids so a
+    retry never duplicates vectors. Successful batches are added to the
+    lexical index and chunk registry even when another batch fails, so
+    nothing in the vector store is left untracked.
+    """
+
+    def __init__(
+        self,
+        store: PineconeVectorStoreCRUD = rag_vector_store,
+        batch_size: int = INGEST_BATCH_SIZE,
+        max_in_flight: int = INGEST_MAX_IN_FLIGHT,
+        max_retries: int = INGEST_MAX_RETRIES,
+        backoff_seconds: float = INGEST_RETRY_BACKOFF_SECONDS,
+    ):
+        self.store = store
+        self.batch_size = max(1, batch_size)
+        self.max_in_flight = max(1, max_in_flight)
+        self.max_retries = max_retries
+        self.backoff_seconds = backoff_seconds
+
+    async def _upsert_batch(
+        self,
+        documents: List[Document],
+        ids: List[str],
+        semaphore: asyncio.Semaphore,
+        stats: IngestionStats,
+        total: int,
+        progress: Optional[ProgressCallback] = None,
+    ):
+        async with semaphore:
+            for attempt in range(self.max_retries + 1):
+                try:
+                    await self.store.upsert_vectors(documents, ids)
+                except Exception as e:
+                    if attempt == self.max_retries:
+                        raise
+                    stats.retries += 1
+                    delay = self.backoff_seconds * 2**attempt * (1 + random.random())
+                    logger.warning(
+                        f"Upsert of {len(documents)} chunks failed ({e}), "
+                        f"retrying in {delay:.1f}s"
+                    )
+                    await asyncio.sleep(delay)
+                else:
+                    stats.chunks += len(ids)
+                    # Outside the retry, a failing progress write must not re-upsert
+                    if progress is not None:
+                        await progress(stats.chunks, total)
+                    return
+
+    async def ingest(
+        self,
+        documents: List[Document],
+        ids: Optional[List[str]] = None,
+        progress: Optional[ProgressCallback] = None,
+    ) -> Tuple[List[str], IngestionStats]:
+        """Ingest documents and return their ids with the run statistics."""
+        ids = ids or [str(uuid.uuid4()) for _ in documents]
+        stats = IngestionStats()
+        start_time = time.perf_counter()
+        await self.store.prepare_bots(documents)
+        if progress is not None:
+            await progress(0, len(documents))
+
+        batches = [
+            (
+                documents[start : start + self.batch_size],
+                ids[start : start + self.batch_size],
+            )
+            for start in range(0, len(documents), self.batch_size)
+        ]
+        stats.batches = len(batches)
+        semaphore = asyncio.Semaphore(self.max_in_flight)
+        results = await asyncio.gather(
+            *(
+                self._upsert_batch(
+                    batch_documents,
+                    batch_ids,
+                    semaphore,
+                    stats,
+                    len(documents),
+                    progress,
+                )
+                for batch_documents, batch_ids in batches
+            ),
+            return_exceptions=True,
+        )
+
+        done_documents, done_ids, errors = [], [], []
+        for (batch_documents, batch_ids), result in zip(batches, results):
+            if isinstance(result, BaseException):
+                errors.append(result)
+                stats.failed += len(batch_ids)
+            else:
+                done_documents.extend(batch_documents)
+                done_ids.extend(batch_ids)
+        if done_ids:
+            await self.store.index_documents(done_documents, done_ids)
+
+        stats.chunks = len(done_ids)
+        stats.duration = time.perf_counter() - start_time
+        observe_ingestion(stats.chunks, stats.failed, stats.duration)
+        logger.info(
+            f"Ingested {stats.chunks}/{len(documents)} chunks in {stats.batches} batches, "
+            f"{stats.duration:.2f}s ({stats.chunks_per_second:.1f} chunks/s, "
+            f"{stats.retries} retries)"
+        )
+        if errors:
+            raise IngestionError(
+                f"{len(errors)} of {stats.batches} batches failed: {errors[0]}", stats
+            )
+        return ids, stats
+
+    async def plan_source(
+        self, bot_id: str, source: str, documents: List[Document]
+    ) -> SourcePlan:
+        """Work out what re-indexing one source file changes.
+
+        Chunks are matched to the ones already registered for the same bot and
+        source by content hash: unchanged chunks are skipped, chunks whose text
+        is kept but whose page/offset moved are re-upserted under their old id
+        (the embedding cache usually serves them), new chunks are embedded and
+        chunks no longer present are deleted.
+        """
+        existing: Dict[str, List[Dict]] = {}
+        if self.store.registry is not None:
+            await self.store.prepare_bots(documents)
+            for entry in await self.store.registry.list(bot_id, source=source):
+                existing.setdefault(entry["content_hash"], []).append(entry)
+
+        diff = SourceDiff()
+        used_ids = {
+            entry["chunk_id"] for entries in existing.values() for entry in entries
+        }
+        upsert_documents, upsert_ids = [], []
+        for document in documents:
+            digest = content_hash(document.page_content)
+            document.metadata["content_hash"] = digest
+            position = (
+                document.metadata.get("page"),
+                document.metadata.get("start_index"),
+            )
+            candidates = existing.get(digest)
+            if candidates:
+                # Prefer the stored copy at the same position
+                entry = next(
+                    (
+                        candidate
+                        for candidate in candidates
+                        if (candidate.get("page"), candidate.get("start_index"))
+                        == position
+                    ),
+                    candidates[0],
+                )
+                candidates.remove(entry)
+                diff.chunk_ids.append(entry["chunk_id"])
+                if (entry.get("page"), entry.get("start_index")) == position:
+                    diff.unchanged += 1
+                    continue
+                diff.updated += 1
+                upsert_ids.append(entry["chunk_id"])
+            else:
+                # Repeated text in a source gets the next free occurrence number
+                occurrence = 0
+                while chunk_id(bot_id, source, digest, occurrence) in used_ids:
+                    occurrence += 1
+                new_id = chunk_id(bot_id, source, digest, occurrence)
+                used_ids.add(new_id)
+                diff.chunk_ids.append(new_id)
+                diff.added += 1
+                upsert_ids.append(new_id)
+            upsert_documents.append(document)
+
+        stale_ids = [
+            entry["chunk_id"] for entries in existing.values() for entry in entries
+        ]
+        return SourcePlan(diff, upsert_documents, upsert_ids, stale_ids)
+
+    async def sync_sources(
+        self,
+        bot_id: str,
+        sources: Dict[str, List[Document]],
+        progress: Optional[ProgressCallback] = None,
+    ) -> Tuple[Dict[str, SourceDiff], IngestionStats]:
+        """Re-index several source files of a bot incrementally.
+
+        The changes of every file go through one ingest run, so batches span
+        files instead of each small file sending its own partial batch.
+        """
+        plans = {
+            source: await self.plan_source(bot_id, source, documents)
+            for source, documents in sources.items()
+        }
+        upsert_documents = [
+            document for plan in plans.values() for document in plan.documents
+        ]
+        upsert_ids = [
+            document_id for plan in plans.values() for document_id in plan.ids
+        ]
+        stale_ids = [
+            document_id for plan in plans.values() for document_id in plan.stale_ids
+        ]
+        stats = IngestionStats()
+        if upsert_documents:
+            _, stats = await self.ingest(upsert_documents, upsert_ids, progress)
+        if stale_ids:
+            await self.store.delete_documents(stale_ids, bot_id=bot_id)
+        for source, plan in plans.items():
+            plan.diff.deleted = len(plan.stale_ids)
+            logger.info(f"Re-indexed {source} for bot {bot_id}: {plan.diff.summary()}")
+        return {source: plan.diff for source, plan in plans.items()}, stats
+
+    async def sync_source(
+        self,
+        bot_id: str,
+        source: str,
+        documents: List[Document],
+        progress: Optional[ProgressCallback] = None,
+    ) -> Tuple[SourceDiff, IngestionStats]:
+        """Re-index the chunks of one source file incrementally."""
+        diffs, stats = await self.sync_sources(bot_id, {source: documents}, progress)
+        return diffs[source], stats
+
+
+ingestion_pipeline = IngestionPipeline()
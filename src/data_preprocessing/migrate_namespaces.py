@@ -0,0 +1,176 @@
+"""Move each bot's vectors from the shared Pinecone namespace to its own.
+
+Usage:
+    python -m src.data_preprocessing.migrate_namespaces [--bot-id ID ...]
+        [--batch-size 100] [--delete-source] [--dry-run]
+
+Vectors are copied with their stored values (nothing is re-embedded), so the
+migration can be re-run safely. Start the app with BOT_NAMESPACES=true once
+every bot has been moved, then run the script again with --delete-source:
+chunks the app ingested into the shared namespace before the flip are listed
+again from the registry and copied over, and a source vector is only deleted
+once its copy in the bot's namespace is identical.
+"""
+
+import argparse
+import asyncio
+from typing import Dict, List, Optional, Tuple
+from langchain_pinecone import PineconeVectorStore
+from src.config.mongo import bot_crud
+from src.config.chunk_registry import chunk_registry
+from src.config.vector_store import (
+    API_PINCONE_KEY,
+    PineconeVectorStoreCRUD,
+    bot_namespace,
+    test_rag_vector_store,
+)
+from src.utils.logger import logger
+
+MIGRATION_BATCH_SIZE = 100
+
+
+def _vectors(response) -> Dict[str, Dict]:
+    return {
+        vector_id: {
+            "id": vector_id,
+            "values": list(vector.values),
+            "metadata": dict(vector.metadata or {}),
+        }
+        for vector_id, vector in response.vectors.items()
+    }
+
+
+async def _copy(index, ids: List[str], source: str, target: str) -> Dict[str, Dict]:
+    """Copy the given vectors from `source` to `target`, returning the source copies."""
+    vectors = _vectors(await asyncio.to_thread(index.fetch, ids=ids, namespace=source))
+    if vectors:
+        await asyncio.to_thread(
+            index.upsert,
+            vectors=list(vectors.values()),
+            namespace=target,
+            show_progress=False,
+        )
+    return vectors
+
+
+async def _delete_copied(
+    index, ids: List[str], source: str, target: str
+) -> Tuple[int, int]:
+    """Delete the source vectors whose target copy is identical.
+
+    Vectors written to the source since they were copied (new chunks, or
+    chunks re-ingested with other text or metadata) are copied again first,
+    so nothing ingested between the copy and the flip is lost.
+    """
+    sources = _vectors(await asyncio.to_thread(index.fetch, ids=ids, namespace=source))
+    targets = _vectors(await asyncio.to_thread(index.fetch, ids=ids, namespace=target))
+    stale = [i for i, vector in sources.items() if targets.get(i) != vector]
+    if stale:
+        await _copy(index, stale, source, target)
+        targets.update(
+            _vectors(
+                await asyncio.to_thread(index.fetch, ids=stale, namespace=target)
+            )
+        )
+    deleted = [i for i, vector in sources.items() if targets.get(i) == vector]
+    if deleted:
+        await asyncio.to_thread(index.delete, ids=deleted, namespace=source)
+    return len(stale), len(deleted)
+
+
+async def migrate_bot(
+    store: PineconeVectorStoreCRUD,
+    bot_id: str,
+    batch_size: int = MIGRATION_BATCH_SIZE,
+    delete_source: bool = False,
+    dry_run: bool = False,
+) -> Dict[str, int]:
+    """Copy one bot's vectors to its namespace and optionally delete the originals."""
+    index = store.vector_store.index
+    source_namespace = store.vector_store._namespace
+    target_namespace = bot_namespace(bot_id)
+    # Registers chunks indexed before the registry existed
+    await store.ensure_registered(bot_id)
+    chunk_ids = [entry["chunk_id"] for entry in await store.registry.list(bot_id)]
+    result = {"chunks": len(chunk_ids), "copied": 0, "missing": 0, "deleted": 0}
+
+    for start in range(0, len(chunk_ids), batch_size):
+        batch = chunk_ids[start : start + batch_size]
+        if dry_run:
+            response = await asyncio.to_thread(
+                index.fetch, ids=batch, namespace=source_namespace
+            )
+            copied = len(response.vectors)
+        else:
+            copied = len(
+                await _copy(index, batch, source_namespace, target_namespace)
+            )
+        # Already moved by an earlier run, or never written
+        result["missing"] += len(batch) - copied
+        result["copied"] += copied
+
+    if delete_source and not dry_run:
+        # Re-list the chunks: some may have been ingested during the copy
+        chunk_ids = [entry["chunk_id"] for entry in await store.registry.list(bot_id)]
+        for start in range(0, len(chunk_ids), batch_size):
+            recopied, deleted = await _delete_copied(
+                index,
+                chunk_ids[start : start + batch_size],
+                source_namespace,
+                target_namespace,
+            )
+            result["copied"] += recopied
+            result["deleted"] += deleted
+
+    logger.info(f"Namespace migration of bot {bot_id}: {result}")
+    return result
+
+
+async def migrate(
+    bot_ids: Optional[List[str]] = None,
+    batch_size: int = MIGRATION_BATCH_SIZE,
+    delete_source: bool = False,
+    dry_run: bool = False,
+) -> Dict[str, Dict[str, int]]:
+    if not isinstance(test_rag_vector_store, PineconeVectorStore):
+        raise ValueError("Namespace migration needs VECTOR_STORE_BACKEND=pinecone")
+    # Reads the shared namespace regardless of BOT_NAMESPACES
+    store = PineconeVectorStoreCRUD(
+        index_name="rag-vector-store",
+        embedding=test_rag_vector_store.embeddings,
+        pinecone_api_key=API_PINCONE_KEY,
+        vector_store=test_rag_vector_store,
+        registry=chunk_registry,
+        bot_namespaces=False,
+    )
+    if not bot_ids:
+        bot_ids = [
+            str(bot_id) for bot_id in await bot_crud.collection.distinct("_id")
+        ]
+    results = {}
+    for bot_id in bot_ids:
+        results[bot_id] = await migrate_bot(
+            store, bot_id, batch_size, delete_source, dry_run
+        )
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--bot-id", action="append", dest="bot_ids")
+    parser.add_argument("--batch-size", type=int, default=MIGRATION_BATCH_SIZE)
+    parser.add_argument("--delete-source", action="store_true")
+    parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args()
+    results = asyncio.run(
+        migrate(args.bot_ids, args.batch_size, args.delete_source, args.dry_run)
+    )
+    totals = {
+        key: sum(result[key] for result in results.values())
+        for key in ("chunks", "copied", "missing", "deleted")
+    }
+    print(f"Migrated {len(results)} bots: {totals}")
+
+
+if __name__ == "__main__":
+    main()
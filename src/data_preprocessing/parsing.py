@@ -0,0 +1,187 @@
+"""Parse, split and measure uploaded documents in a process pool.
+
+Text extraction and splitting are CPU bound and PyMuPDFLoader serialises
+every parse in a process behind one lock, so they run in a
+ProcessPoolExecutor of PARSE_WORKERS processes instead of on the event
+loop. PDFs longer than PARSE_PAGES_PER_TASK pages are cut into page ranges
+extracted by several workers and merged back in page order. The pool uses
+the spawn start method, so workers import this module only and none of the
+app's clients; PARSE_WORKERS=0 parses in a thread instead.
+
+A document is read from a path or from its bytes, and one pass yields both
+the word/image counts of /file/analyze and the chunks ingestion indexes.
+"""
+
+import os
+import io
+import asyncio
+import multiprocessing
+from dataclasses import dataclass, field
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable, List, Optional, Tuple, Union
+import fitz
+import docx2txt
+from docx import Document as DocxDoc
+from langchain_core.documents import Document
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+PARSE_WORKERS = int(os.getenv("PARSE_WORKERS", str(os.cpu_count() or 1)))
+PARSE_PAGES_PER_TASK = int(os.getenv("PARSE_PAGES_PER_TASK", "16"))
+CHUNK_SIZE = 1000
+CHUNK_OVERLAP = 200
+SUPPORTED_EXTENSIONS = (".pdf", ".docx", ".txt")
+
+# A file path, or the document's bytes when it is held in memory
+DocumentSource = Union[str, bytes]
+
+_pool: Optional[ProcessPoolExecutor] = None
+
+
+def get_parse_pool() -> Optional[ProcessPoolExecutor]:
+    global _pool
+    if _pool is None and PARSE_WORKERS > 0:
+        _pool = ProcessPoolExecutor(
+            max_workers=PARSE_WORKERS,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+    return _pool
+
+
+def shutdown_parse_pool() -> None:
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+async def run_parser(fn: Callable, *args):
+    """Run a module-level function of this module in the parse pool."""
+    pool = get_parse_pool()
+    if pool is None:
+        return await asyncio.to_thread(fn, *args)
+    try:
+        return await asyncio.get_running_loop().run_in_executor(pool, fn, *args)
+    except BrokenProcessPool:
+        # A worker died (e.g. on a malformed file); start a fresh pool next time
+        shutdown_parse_pool()
+        raise
+
+
+def page_ranges(
+    pages: int, per_task: int = PARSE_PAGES_PER_TASK
+) -> List[Tuple[int, int]]:
+    per_task = max(1, per_task)
+    return [
+        (start, min(start + per_task, pages)) for start in range(0, pages, per_task)
+    ]
+
+
+@dataclass
+class ParsedDocument:
+    word_count: int = 0
+    image_count: int = 0
+    # (text, page, start_index) of every chunk, in document order
+    chunks: List[Tuple[str, Optional[int], int]] = field(default_factory=list)
+
+    @classmethod
+    def merge(cls, parts: List["ParsedDocument"]) -> "ParsedDocument":
+        return cls(
+            word_count=sum(part.word_count for part in parts),
+            image_count=sum(part.image_count for part in parts),
+            chunks=[chunk for part in parts for chunk in part.chunks],
+        )
+
+    def documents(self, bot_id: str, filename: str) -> List[Document]:
+        """Chunks carrying the metadata retrieval relies on."""
+        documents = []
+        for text, page, start_index in self.chunks:
+            # source/page/start_index let retrieval merge overlapping neighbours
+            metadata = {"bot_id": bot_id, "source": filename, "start_index": start_index}
+            if page is not None:
+                metadata["page"] = page
+            documents.append(Document(page_content=text, metadata=metadata))
+        return documents
+
+
+def _splitter() -> RecursiveCharacterTextSplitter:
+    return RecursiveCharacterTextSplitter(
+        chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP, add_start_index=True
+    )
+
+
+def _split(documents: List[Document]) -> List[Tuple[str, Optional[int], int]]:
+    return [
+        (chunk.page_content, chunk.metadata.get("page"), chunk.metadata["start_index"])
+        for chunk in _splitter().split_documents(documents)
+    ]
+
+
+def _open_pdf(source: DocumentSource) -> fitz.Document:
+    if isinstance(source, bytes):
+        return fitz.open(stream=source, filetype="pdf")
+    return fitz.open(source)
+
+
+def _binary(source: DocumentSource):
+    return io.BytesIO(source) if isinstance(source, bytes) else source
+
+
+def pdf_page_count(source: DocumentSource) -> int:
+    with _open_pdf(source) as doc:
+        return doc.page_count
+
+
+def parse_pdf_pages(source: DocumentSource, start: int, stop: int) -> ParsedDocument:
+    """Pages [start, stop) of a PDF, extracted as PyMuPDFLoader does."""
+    parsed, pages = ParsedDocument(), []
+    with _open_pdf(source) as doc:
+        for number in range(start, stop):
+            page = doc[number]
+            text = page.get_text()
+            parsed.word_count += len(text.split())
+            parsed.image_count += len(page.get_images(full=True))
+            pages.append(Document(page_content=text.strip(), metadata={"page": number}))
+    parsed.chunks = _split(pages)
+    return parsed
+
+
+def parse_file(source: DocumentSource, extension: str) -> ParsedDocument:
+    """A whole DOCX (as Docx2txtLoader reads it) or TXT file."""
+    if extension == ".docx":
+        doc = DocxDoc(_binary(source))
+        word_count = sum(len(para.text.split()) for para in doc.paragraphs)
+        image_count = sum(
+            1 for rel in doc.part._rels.values() if "image" in rel.target_ref
+        )
+        text = docx2txt.process(_binary(source))
+    elif extension == ".txt":
+        if isinstance(source, bytes):
+            text = source.decode("utf-8")
+        else:
+            with open(source, "r", encoding="utf-8") as f:
+                text = f.read()
+        word_count, image_count = len(text.split()), 0
+    else:
+        raise ValueError(f"Unsupported file format: {extension}")
+    return ParsedDocument(
+        word_count=word_count,
+        image_count=image_count,
+        chunks=_split([Document(page_content=text)]),
+    )
+
+
+async def parse_document(source: DocumentSource, extension: str) -> ParsedDocument:
+    """Parse a PDF, DOCX or TXT file, PDFs in parallel page ranges."""
+    if extension not in SUPPORTED_EXTENSIONS:
+        raise ValueError(f"Unsupported file format: {extension}")
+    if extension != ".pdf":
+        return await run_parser(parse_file, source, extension)
+    pages = await asyncio.to_thread(pdf_page_count, source)
+    parts = await asyncio.gather(
+        *(
+            run_parser(parse_pdf_pages, source, start, stop)
+            for start, stop in page_ranges(pages)
+        )
+    )
+    return ParsedDocument.merge(parts)
@@ -0,0 +1,204 @@
+"""Re-embed bots with another embedding model without downtime.
+
+Usage:
+    python -m src.data_preprocessing.reembed --model MODEL [--bot-id ID ...]
+        [--batch-size 50] [--chunks-per-minute 600] [--cleanup]
+
+Each bot's chunks are read in registry order from the namespace serving the
+bot, re-embedded with MODEL in rate-limited batches and written to a shadow
+namespace ("bot-<id>--<model>"). Progress is checkpointed in the bot's
+embedding route after every batch, so an interrupted run resumes where it
+stopped. While a bot is being migrated the app mirrors its writes and
+deletes to the shadow namespace; once every chunk is copied the route is
+flipped in a single Mongo update and reads move over within
+EMBEDDING_ROUTES_REFRESH_SECONDS.
+
+The old copies stay in place for rollback until a run with --cleanup
+deletes them. Pinecone indexes have a fixed dimension, so MODEL must
+produce vectors of the index's dimension.
+
+The migration runs as this standalone command rather than on the ingestion
+job queue: queued jobs are uploaded files pinned to the host that spooled
+them, while a migration spans every bot and can run for hours. Launch it as
+a background process (a scheduled or one-off job of the deployment); since
+its progress lives in the embedding routes, rerunning the same command on
+any host after a crash or restart picks up where it stopped.
+"""
+
+import re
+import time
+import random
+import asyncio
+import argparse
+from typing import Dict, List, Optional
+from langchain_pinecone import PineconeVectorStore
+from src.config.llm import get_embeddings
+from src.config.mongo import bot_crud
+from src.config.vector_store import (
+    PineconeVectorStoreCRUD,
+    bot_namespace,
+    rag_vector_store,
+)
+from src.data_preprocessing.ingestion import (
+    INGEST_MAX_RETRIES,
+    INGEST_RETRY_BACKOFF_SECONDS,
+)
+from src.utils.logger import logger
+
+REEMBED_BATCH_SIZE = 50
+REEMBED_CHUNKS_PER_MINUTE = 600
+
+
+def shadow_namespace(bot_id: str, model: str) -> str:
+    slug = re.sub(r"[^a-z0-9]+", "-", model.split("/")[-1].lower()).strip("-")
+    return f"{bot_namespace(bot_id)}--{slug}"
+
+
+async def check_dimension(store: PineconeVectorStoreCRUD, model: str) -> None:
+    probe = await get_embeddings(model).aembed_query("dimension probe")
+    stats = await asyncio.to_thread(store.vector_store.index.describe_index_stats)
+    if stats.dimension and stats.dimension != len(probe):
+        raise ValueError(
+            f"{model} returns {len(probe)}-dimensional vectors, "
+            f"the index holds {stats.dimension}"
+        )
+
+
+async def reembed_bot(
+    store: PineconeVectorStoreCRUD,
+    bot_id: str,
+    model: str,
+    batch_size: int = REEMBED_BATCH_SIZE,
+    chunks_per_minute: int = REEMBED_CHUNKS_PER_MINUTE,
+) -> Dict[str, int]:
+    """Copy a bot's chunks to a shadow namespace with `model`, then flip its reads."""
+    routes = store.routes
+    await routes.refresh(force=True)
+    serving = routes.serving(bot_id)
+    if serving and serving[0] == model:
+        return {"embedded": 0, "skipped": 1}
+
+    namespace = shadow_namespace(bot_id, model)
+    route = await routes.start(bot_id, model, namespace)
+    if not route.get("cursor_chunk_id"):
+        # Let every app process see the route and start mirroring writes
+        await asyncio.sleep(routes.refresh_seconds)
+    await store.ensure_registered(bot_id)
+    embeddings = get_embeddings(model)
+    previous_namespace = store.namespace_of(bot_id) or ""
+    after = (
+        (route["cursor_created_at"], route["cursor_chunk_id"])
+        if route.get("cursor_chunk_id")
+        else None
+    )
+    embedded = route.get("embedded", 0)
+    interval = batch_size * 60 / max(chunks_per_minute, 1)
+    total = await store.registry.count(bot_id)
+    logger.info(
+        f"Re-embedding bot {bot_id} with {model} into {namespace}: "
+        f"{embedded}/{total} chunks done"
+    )
+
+    while True:
+        entries = await store.registry.list_after(bot_id, after, batch_size)
+        if not entries:
+            break
+        started = time.monotonic()
+        documents = await store.get_documents_by_ids(
+            [entry["chunk_id"] for entry in entries], bot_id=bot_id
+        )
+        for attempt in range(INGEST_MAX_RETRIES + 1):
+            try:
+                await store.upsert_direct(
+                    bot_id,
+                    documents,
+                    [document.id for document in documents],
+                    embeddings,
+                    namespace,
+                    store_texts=False,
+                )
+                break
+            except Exception as e:
+                if attempt == INGEST_MAX_RETRIES:
+                    raise
+                delay = INGEST_RETRY_BACKOFF_SECONDS * 2**attempt * (1 + random.random())
+                logger.warning(
+                    f"Re-embedding batch of bot {bot_id} failed ({e}), "
+                    f"retrying in {delay:.1f}s"
+                )
+                await asyncio.sleep(delay)
+        after = (entries[-1]["created_at"], entries[-1]["chunk_id"])
+        embedded += len(documents)
+        await routes.checkpoint(bot_id, model, after, embedded)
+        await asyncio.sleep(max(0.0, interval - (time.monotonic() - started)))
+
+    flipped = await routes.activate(bot_id, model, namespace, previous_namespace)
+    return {"embedded": embedded, "skipped": 0, "flipped": int(flipped)}
+
+
+async def cleanup_bot(store: PineconeVectorStoreCRUD, bot_id: str) -> bool:
+    """Delete the copies a flipped bot no longer reads from."""
+    await store.routes.refresh(force=True)
+    route = store.routes.get(bot_id)
+    if route is None or route.get("previous_namespace") is None:
+        return False
+    await store.delete_namespace_copies(bot_id, route["previous_namespace"])
+    await store.routes.clear_previous(bot_id)
+    logger.info(f"Deleted pre-migration vectors of bot {bot_id}")
+    return True
+
+
+async def reembed(
+    model: str,
+    bot_ids: Optional[List[str]] = None,
+    batch_size: int = REEMBED_BATCH_SIZE,
+    chunks_per_minute: int = REEMBED_CHUNKS_PER_MINUTE,
+    cleanup: bool = False,
+    store: PineconeVectorStoreCRUD = rag_vector_store,
+) -> Dict[str, Dict[str, int]]:
+    if not isinstance(store.vector_store, PineconeVectorStore) or store.routes is None:
+        raise ValueError("Re-embedding needs VECTOR_STORE_BACKEND=pinecone")
+    if not bot_ids:
+        bot_ids = [
+            str(bot_id) for bot_id in await bot_crud.collection.distinct("_id")
+        ]
+    if cleanup:
+        return {
+            bot_id: {"cleaned": int(await cleanup_bot(store, bot_id))}
+            for bot_id in bot_ids
+        }
+    await check_dimension(store, model)
+    results = {}
+    for bot_id in bot_ids:
+        results[bot_id] = await reembed_bot(
+            store, bot_id, model, batch_size, chunks_per_minute
+        )
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--model", required=True)
+    parser.add_argument("--bot-id", action="append", dest="bot_ids")
+    parser.add_argument("--batch-size", type=int, default=REEMBED_BATCH_SIZE)
+    parser.add_argument(
+        "--chunks-per-minute", type=int, default=REEMBED_CHUNKS_PER_MINUTE
+    )
+    parser.add_argument(
+        "--cleanup", action="store_true", help="delete copies left by earlier flips"
+    )
+    args = parser.parse_args()
+    results = asyncio.run(
+        reembed(
+            args.model,
+            args.bot_ids,
+            args.batch_size,
+            args.chunks_per_minute,
+            args.cleanup,
+        )
+    )
+    print(f"Processed {len(results)} bots: {results}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+import math
+import re
+import functools
+import threading
+import unicodedata
+from collections import Counter, defaultdict
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+TOKEN_PATTERN = re.compile(r"\w+", re.UNICODE)
+
+
+@functools.lru_cache(maxsize=65536)
+def fold_diacritics(token: str) -> str:
+    """Strip Vietnamese tone and vowel marks, e.g. "học" -> "hoc", "đào" -> "dao"."""
+    if token.isascii():
+        return token
+    decomposed = unicodedata.normalize("NFD", token.replace("đ", "d"))
+    return "".join(char for char in decomposed if not unicodedata.combining(char))
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase NFC tokens plus their diacritic-free form when it differs.
+
+    Keeping both forms lets a query typed without accents ("hoc phi") match
+    accented text while an accented query still ranks exact spellings higher,
+    since those match on two terms instead of one.
+    """
+    terms = []
+    for token in TOKEN_PATTERN.findall(unicodedata.normalize("NFC", text).lower()):
+        terms.append(token)
+        folded = fold_diacritics(token)
+        if folded != token:
+            terms.append(folded)
+    return terms
+
+
+def reciprocal_rank_fusion(
+    rankings: Sequence[Sequence[str]], k: int = 60
+) -> List[Tuple[str, float]]:
+    """Fuse ranked id lists, scoring each id by sum(1 / (k + rank))."""
+    scores: Dict[str, float] = defaultdict(float)
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking, start=1):
+            scores[doc_id] += 1.0 / (k + rank)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
+
+
+class BM25Index:
+    """Incremental in-memory inverted index scored with Okapi BM25."""
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        # term -> {doc_id: term frequency}
+        self.postings: Dict[str, Dict[str, int]] = defaultdict(dict)
+        self.lengths: Dict[str, int] = {}
+        # doc_id -> its terms, so removing a document only touches its postings
+        self.terms: Dict[str, List[str]] = {}
+        self.total_length = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.lengths)
+
+    def add(self, doc_id: str, text: str) -> None:
+        self.add_terms(doc_id, Counter(tokenize(text)))
+
+    def add_terms(self, doc_id: str, terms: Dict[str, int]) -> None:
+        """Index a document from its term frequencies."""
+        with self._lock:
+            if doc_id in self.lengths:
+                self._remove(doc_id)
+            for term, frequency in terms.items():
+                self.postings[term][doc_id] = frequency
+            self.terms[doc_id] = list(terms)
+            length = sum(terms.values())
+            self.lengths[doc_id] = length
+            self.total_length += length
+
+    def frequencies(self, doc_id: str) -> Dict[str, int]:
+        """Term frequencies of an indexed document."""
+        with self._lock:
+            return {
+                term: self.postings[term][doc_id] for term in self.terms.get(doc_id, ())
+            }
+
+    def remove(self, doc_ids: Iterable[str]) -> None:
+        with self._lock:
+            for doc_id in doc_ids:
+                if doc_id in self.lengths:
+                    self._remove(doc_id)
+
+    def _remove(self, doc_id: str) -> None:
+        for term in self.terms.pop(doc_id, ()):
+            docs = self.postings.get(term)
+            if docs is not None:
+                docs.pop(doc_id, None)
+                if not docs:
+                    del self.postings[term]
+        self.total_length -= self.lengths.pop(doc_id)
+
+    def search(
+        self, query: str, k: int = 5, doc_ids: Optional[set] = None
+    ) -> List[Tuple[str, float]]:
+        """Return the `k` best (doc_id, score) pairs, optionally within `doc_ids`."""
+        with self._lock:
+            count = len(self.lengths)
+            if not count:
+                return []
+            average_length = self.total_length / count
+            scores: Dict[str, float] = defaultdict(float)
+            for term in set(tokenize(query)):
+                docs = self.postings.get(term)
+                if not docs:
+                    continue
+                idf = math.log(1 + (count - len(docs) + 0.5) / (len(docs) + 0.5))
+                for doc_id, frequency in docs.items():
+                    if doc_ids is not None and doc_id not in doc_ids:
+                        continue
+                    norm = self.k1 * (
+                        1 - self.b + self.b * self.lengths[doc_id] / average_length
+                    )
+                    scores[doc_id] += idf * frequency * (self.k1 + 1) / (frequency + norm)
+        return sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
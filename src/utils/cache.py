@@ -0,0 +1,97 @@
+import time
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional
+from src.config.monitoring import increment_cache_request
+
+_MISSING = object()
+
+
+class LRUCache:
+    """Thread-safe LRU cache with an optional time-to-live per entry.
+
+    Args:
+        maxsize: Maximum number of entries kept; 0 disables the cache
+        ttl: Seconds an entry stays valid, None keeps it until evicted
+        name: Label used for the cache hit/miss metrics
+        maxbytes: Maximum total size of the entries as measured by `sizeof`
+        sizeof: Size of a value, required with `maxbytes`
+    """
+
+    def __init__(
+        self,
+        maxsize: int = 1024,
+        ttl: Optional[float] = None,
+        name: str = "default",
+        maxbytes: Optional[int] = None,
+        sizeof: Optional[Callable[[Any], int]] = None,
+    ):
+        if maxbytes is not None and sizeof is None:
+            raise ValueError("maxbytes requires sizeof")
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.name = name
+        self.maxbytes = maxbytes
+        self.sizeof = sizeof
+        self.bytes = 0
+        self._data: "OrderedDict[Hashable, tuple[float, Any, int]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            item = self._data.get(key, _MISSING)
+            if item is not _MISSING:
+                expire_at, value, _ = item
+                if expire_at and expire_at < time.monotonic():
+                    self._remove(key)
+                else:
+                    self._data.move_to_end(key)
+                    increment_cache_request(self.name, "hit")
+                    return value
+        increment_cache_request(self.name, "miss")
+        return default
+
+    def set(self, key: Hashable, value: Any) -> None:
+        if self.maxsize <= 0:
+            return
+        size = self.sizeof(value) if self.sizeof is not None else 0
+        if self.maxbytes is not None and size > self.maxbytes:
+            self.pop(key)
+            return
+        expire_at = time.monotonic() + self.ttl if self.ttl else 0
+        with self._lock:
+            self._remove(key)
+            self._data[key] = (expire_at, value, size)
+            self.bytes += size
+            while len(self._data) > self.maxsize or (
+                self.maxbytes is not None and self.bytes > self.maxbytes
+            ):
+                self._remove(next(iter(self._data)))
+
+    def _remove(self, key: Hashable) -> Any:
+        item = self._data.pop(key, _MISSING)
+        if item is _MISSING:
+            return _MISSING
+        self.bytes -= item[2]
+        return item[1]
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            value = self._remove(key)
+        return default if value is _MISSING else value
+
+    def pop_where(self, predicate: Callable[[Hashable], bool]) -> int:
+        """Drop every entry whose key matches the predicate."""
+        with self._lock:
+            keys = [key for key in self._data if predicate(key)]
+            for key in keys:
+                self._remove(key)
+        return len(keys)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self.bytes = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
@@ -0,0 +1,184 @@
+import os
+from dataclasses import dataclass, field
+from typing import Any, List, Optional, Sequence, Tuple
+from langchain_core.documents import Document
+from src.config.monitoring import increment_context_tokens
+from src.utils.helper import (
+    CHARS_PER_TOKEN,
+    count_text_tokens,
+    format_context_block,
+    get_encoding,
+)
+from src.utils.logger import logger
+
+RETRIEVAL_CONTEXT_MAX_TOKENS = int(os.getenv("RETRIEVAL_CONTEXT_MAX_TOKENS", "2000"))
+# Shortest shared prefix/suffix treated as splitter overlap rather than coincidence
+MIN_OVERLAP_CHARS = int(os.getenv("RETRIEVAL_CONTEXT_MIN_OVERLAP_CHARS", "40"))
+# Do not append a truncated block smaller than this many tokens
+MIN_BLOCK_TOKENS = 32
+
+
+@dataclass
+class ContextSegment:
+    """Contiguous text of one source built from one or more retrieved chunks."""
+
+    source: Any
+    content: str
+    score: float
+    ids: List[str] = field(default_factory=list)
+    start: Optional[int] = None
+
+    @property
+    def end(self) -> Optional[int]:
+        return None if self.start is None else self.start + len(self.content)
+
+
+@dataclass
+class AssembledContext:
+    context_str: str
+    segments: List[ContextSegment]
+    original_tokens: int
+    context_tokens: int
+
+    @property
+    def tokens_saved(self) -> int:
+        return max(0, self.original_tokens - self.context_tokens)
+
+
+def text_overlap(left: str, right: str, min_chars: int = MIN_OVERLAP_CHARS) -> int:
+    """Length of the longest suffix of `left` that is also a prefix of `right`."""
+    if min(len(left), len(right)) < min_chars:
+        return 0
+    probe = right[:min_chars]
+    # Earliest occurrence gives the longest overlap
+    position = left.find(probe, max(0, len(left) - len(right)))
+    while position != -1:
+        length = len(left) - position
+        if right.startswith(left[position:]):
+            return length
+        position = left.find(probe, position + 1)
+    return 0
+
+
+def merge_pair(left: ContextSegment, right: ContextSegment) -> Optional[ContextSegment]:
+    """Join `right` after `left` when they overlap or touch, else return None."""
+    if left.start is not None and right.start is not None:
+        if not left.start <= right.start <= left.end:
+            return None
+        # Empty when `right` lies entirely inside `left`
+        content = left.content + right.content[left.end - right.start :]
+    elif right.content in left.content:
+        content = left.content
+    else:
+        overlap = text_overlap(left.content, right.content)
+        if not overlap:
+            return None
+        content = left.content + right.content[overlap:]
+    return ContextSegment(
+        source=left.source,
+        content=content,
+        score=max(left.score, right.score),
+        ids=left.ids + right.ids,
+        start=left.start,
+    )
+
+
+def merge_segments(segments: List[ContextSegment]) -> List[ContextSegment]:
+    """Repeatedly merge overlapping segments of the same source."""
+    merged = True
+    while merged:
+        merged = False
+        for i, left in enumerate(segments):
+            for j, right in enumerate(segments):
+                if i == j or left.source != right.source:
+                    continue
+                combined = merge_pair(left, right)
+                if combined is not None:
+                    segments = [
+                        s for k, s in enumerate(segments) if k not in (i, j)
+                    ] + [combined]
+                    merged = True
+                    break
+            if merged:
+                break
+    return segments
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    encoding = get_encoding()
+    if encoding is None:
+        return text[: max_tokens * CHARS_PER_TOKEN]
+    return encoding.decode(encoding.encode(text, disallowed_special=())[:max_tokens])
+
+
+def assemble_context(
+    scored_documents: Sequence[Tuple[Document, float]],
+    max_tokens: int = RETRIEVAL_CONTEXT_MAX_TOKENS,
+) -> AssembledContext:
+    """Build the retrieval context passed to the LLM.
+
+    Chunks of the same source that overlap (the ingress splitter repeats up to
+    `chunk_overlap` characters between neighbours) are merged, the resulting
+    segments are ordered by their best score and added until `max_tokens` is
+    reached, truncating the last one. Chunks carrying a `start_index` are
+    merged by offset, others (indexed before offsets were stored) by matching
+    their shared text.
+    """
+    segments: List[ContextSegment] = []
+    original_parts = []
+    for i, (document, score) in enumerate(scored_documents):
+        original_parts.append(format_context_block(i, document.page_content))
+        metadata = document.metadata or {}
+        segments.append(
+            ContextSegment(
+                # Offsets restart on every page of a PDF
+                source=(metadata.get("source"), metadata.get("page")),
+                content=document.page_content,
+                score=score,
+                ids=[document.id] if document.id else [],
+                start=metadata.get("start_index"),
+            )
+        )
+    original_tokens = count_text_tokens("".join(original_parts)) if original_parts else 0
+
+    segments = sorted(merge_segments(segments), key=lambda s: s.score, reverse=True)
+
+    blocks = []
+    used_tokens = 0
+    selected: List[ContextSegment] = []
+    for segment in segments:
+        block = format_context_block(len(blocks), segment.content)
+        block_tokens = count_text_tokens(block)
+        remaining = max_tokens - used_tokens
+        if block_tokens > remaining:
+            if remaining < MIN_BLOCK_TOKENS:
+                break
+            content_tokens = count_text_tokens(segment.content)
+            limit = remaining - (block_tokens - content_tokens)
+            # Token boundaries can shift after truncation, shrink until it fits
+            while block_tokens > remaining and limit > 0:
+                block = format_context_block(
+                    len(blocks), truncate_to_tokens(segment.content, limit)
+                )
+                block_tokens = count_text_tokens(block)
+                limit -= max(1, block_tokens - remaining)
+            if block_tokens > remaining:
+                break
+        blocks.append(block)
+        selected.append(segment)
+        used_tokens += block_tokens
+        if used_tokens >= max_tokens:
+            break
+
+    assembled = AssembledContext(
+        context_str="".join(blocks),
+        segments=selected,
+        original_tokens=original_tokens,
+        context_tokens=used_tokens,
+    )
+    increment_context_tokens(assembled.context_tokens, assembled.tokens_saved)
+    logger.info(
+        f"Assembled {len(scored_documents)} chunks into {len(selected)} segments: "
+        f"{assembled.context_tokens} tokens, saved {assembled.tokens_saved}"
+    )
+    return assembled
@@ -1,5 +1,5 @@
 from langchain_core.documents import Document
-from typing import Union, TypedDict, Dict, Any
+from typing import Union, TypedDict, Dict, Any, Optional
 from langchain_core.messages import BaseMessage, HumanMessage, AIMessage, trim_messages
 from langchain_core.runnables import RunnableLambda
 from langgraph.prebuilt import ToolNode
@@ -13,9 +13,27 @@ from git import Repo
 import tiktoken
 from src.utils.logger import logger
 from src.config.constants import MAX_REPOSITORY_SIZE_MB
+from src.utils.cache import LRUCache
+from functools import lru_cache
+import json
+import re
+import hashlib
 
 State = TypeVar("State", bound=Dict[str, Any])
 
+# Gemini bills a fixed number of tokens per image and per PDF page
+IMAGE_TOKEN_COST = 258
+PDF_PAGE_TOKEN_COST = 258
+PDF_BYTES_PER_PAGE = 50 * 1024
+PDF_PAGE_PATTERN = re.compile(rb"/Type\s*/Page(?!s)")
+MESSAGE_TOKEN_OVERHEAD = 4
+# additional_kwargs entry holding the content digest of a message
+CONTENT_DIGEST_KEY = "content_digest"
+CHARS_PER_TOKEN = 4
+message_token_cache = LRUCache(
+    int(os.getenv("MESSAGE_TOKEN_CACHE_SIZE", "10000")), name="message_tokens"
+)
+
 
 def fake_token_counter(messages: Union[list[BaseMessage], BaseMessage]) -> int:
     if isinstance(messages, list):
@@ -23,21 +41,153 @@ def fake_token_counter(messages: Union[list[BaseMessage], BaseMessage]) -> int:
     return len(str(messages.content).split())
 
 
+def format_context_block(index: int, content: str) -> str:
+    return (
+        f"Document index {index}:\nContent: {content}\n"
+        "----------------------------------------------\n\n"
+    )
+
+
 def convert_list_context_source_to_str(contexts: list[Document]):
-    formatted_str = ""
-    for i, context in enumerate(contexts):
-        formatted_str += f"Document index {i}:\nContent: {context.page_content}\n"
-        formatted_str += "----------------------------------------------\n\n"
-    return formatted_str
+    return "".join(
+        format_context_block(i, context.page_content)
+        for i, context in enumerate(contexts)
+    )
+
+
+@lru_cache(maxsize=1)
+def get_encoding() -> Optional[tiktoken.Encoding]:
+    try:
+        return tiktoken.get_encoding("cl100k_base")
+    except Exception as e:
+        logger.warning(f"tiktoken encoding unavailable, estimating tokens: {e}")
+        return None
+
+
+def count_text_tokens(text: str) -> int:
+    encoding = get_encoding()
+    if encoding is None:
+        return len(text) // CHARS_PER_TOKEN + 1
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def count_pdf_pages(data: str) -> int:
+    """Estimate the page count of a base64 encoded PDF."""
+    try:
+        raw = base64.b64decode(data.split(",")[-1])
+    except (ValueError, TypeError):
+        return max(1, len(data) * 3 // 4 // PDF_BYTES_PER_PAGE)
+    pages = len(PDF_PAGE_PATTERN.findall(raw))
+    return pages or max(1, len(raw) // PDF_BYTES_PER_PAGE)
+
+
+def count_content_tokens(content: Union[str, list]) -> int:
+    """Count tokens of message content, estimating images and PDFs per modality."""
+    if isinstance(content, str):
+        return count_text_tokens(content)
+    total = 0
+    for part in content:
+        if isinstance(part, str):
+            total += count_text_tokens(part)
+            continue
+        part_type = part.get("type")
+        if part_type in ("image_url", "image"):
+            total += IMAGE_TOKEN_COST
+        elif part_type in ("file", "media"):
+            if "pdf" in part.get("mime_type", ""):
+                total += PDF_PAGE_TOKEN_COST * count_pdf_pages(part.get("data", ""))
+            else:
+                total += IMAGE_TOKEN_COST
+        else:
+            total += count_text_tokens(str(part.get("text") or part.get("thinking") or ""))
+    return total
+
+
+def _content_size(content: Union[str, list]) -> int:
+    """Length of the text and payloads of message content, without serializing it."""
+    if isinstance(content, str):
+        return len(content)
+    size = 0
+    for part in content:
+        for value in [part] if isinstance(part, str) else part.values():
+            if isinstance(value, dict):
+                value = value.get("url", "")
+            size += len(value) if isinstance(value, str) else 1
+    return size
+
+
+def content_digest(message: BaseMessage) -> str:
+    """Digest of a message's content, computed once and kept in additional_kwargs.
+
+    additional_kwargs are checkpointed with the message, so on later turns
+    the content, base64 attachments included, is not serialized and hashed
+    again. The content size is stored with the digest and a mismatch, from a
+    copy of the message with new content, computes it afresh.
+    """
+    size = _content_size(message.content)
+    stored = message.additional_kwargs.get(CONTENT_DIGEST_KEY)
+    if stored and stored.startswith(f"{size}:"):
+        return stored
+    payload = json.dumps(message.content, ensure_ascii=False, default=str)
+    digest = hashlib.blake2b(payload.encode("utf-8"), digest_size=16).hexdigest()
+    stored = f"{size}:{digest}"
+    message.additional_kwargs[CONTENT_DIGEST_KEY] = stored
+    return stored
+
+
+def count_message_tokens(message: BaseMessage) -> int:
+    """Token count of one message, memoized by message id and content digest."""
+    key = (message.id, message.type, content_digest(message))
+    tokens = message_token_cache.get(key)
+    if tokens is None:
+        tokens = MESSAGE_TOKEN_OVERHEAD + count_content_tokens(message.content)
+        tool_calls = getattr(message, "tool_calls", None)
+        if tool_calls:
+            tokens += count_text_tokens(
+                json.dumps(tool_calls, ensure_ascii=False, default=str)
+            )
+        message_token_cache.set(key, tokens)
+    return tokens
+
+
+def count_messages_tokens(messages: Union[list[BaseMessage], BaseMessage]) -> int:
+    if isinstance(messages, list):
+        return sum(count_message_tokens(message) for message in messages)
+    return count_message_tokens(messages)
+
+
+def start_on_human(messages: list[BaseMessage]) -> list[BaseMessage]:
+    """Drop leading messages until the first human turn, as start_on="human" does.
+
+    A history cut by trim_history can begin with a tool response or an AI
+    turn whose function call is gone, which Gemini rejects.
+    """
+    for index, message in enumerate(messages):
+        if isinstance(message, HumanMessage):
+            return messages[index:]
+    return []
 
 
 def trim_messages_function(messages: list[BaseMessage], max_tokens: int = 100000):
     if len(messages) <= 1:
         return messages
+    # Count every message once; trim_messages then re-sums prefixes from this table
+    counts = {id(message): count_message_tokens(message) for message in messages}
+    if sum(counts.values()) <= max_tokens:
+        return start_on_human(messages)
+
+    def token_counter(batch: Union[list[BaseMessage], BaseMessage]) -> int:
+        if not isinstance(batch, list):
+            batch = [batch]
+        return sum(
+            counts[id(message)] if id(message) in counts else count_message_tokens(message)
+            for message in batch
+        )
+
     messages = trim_messages(
         messages,
         strategy="last",
-        token_counter=fake_token_counter,
+        token_counter=token_counter,
         max_tokens=max_tokens,
         start_on="human",
         # end_on="ai",
@@ -246,9 +396,7 @@ def get_all_files_in_directory(path: str, extensions: List[str]) -> List[str]:
 
 def count_token(string: str) -> int:
     """Returns the number of tokens in a text string."""
-    encoding = tiktoken.get_encoding("cl100k_base")
-    num_tokens = len(encoding.encode(string))
-    return num_tokens
+    return count_text_tokens(string)
 
 
 def input_preparation(selected_files, project_description, criterias, token_limit=4000):
@@ -0,0 +1,85 @@
+import math
+from collections import Counter
+from dataclasses import dataclass
+from typing import List, Sequence, Tuple
+import numpy as np
+from src.utils.bm25 import tokenize
+
+
+@dataclass
+class RerankWeights:
+    cosine: float = 0.7
+    bm25: float = 0.3
+    # 1.0 ranks by relevance only, lower values favour diverse chunks
+    mmr_lambda: float = 0.7
+
+
+def normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    return matrix / np.where(norms == 0, 1.0, norms)
+
+
+def bm25_overlap(
+    query: str, texts: Sequence[str], k1: float = 1.5, b: float = 0.75
+) -> np.ndarray:
+    """BM25 scores of `texts` for `query`, with statistics of the candidate set only."""
+    terms = sorted(set(tokenize(query)))
+    if not terms or not texts:
+        return np.zeros(len(texts), dtype=np.float32)
+    column = {term: i for i, term in enumerate(terms)}
+    frequencies = np.zeros((len(texts), len(terms)), dtype=np.float32)
+    lengths = np.zeros(len(texts), dtype=np.float32)
+    for row, text in enumerate(texts):
+        tokens = tokenize(text)
+        lengths[row] = len(tokens)
+        for term, count in Counter(tokens).items():
+            if term in column:
+                frequencies[row, column[term]] = count
+    document_frequency = (frequencies > 0).sum(axis=0)
+    idf = np.log(
+        1 + (len(texts) - document_frequency + 0.5) / (document_frequency + 0.5)
+    )
+    average_length = max(float(lengths.mean()), 1.0)
+    norm = k1 * (1 - b + b * lengths / average_length)
+    scores = frequencies * (k1 + 1) / (frequencies + norm[:, None])
+    return (scores * idf).sum(axis=1)
+
+
+def rerank(
+    query: str,
+    query_vector: Sequence[float],
+    vectors: np.ndarray,
+    texts: Sequence[str],
+    top_n: int,
+    weights: RerankWeights = RerankWeights(),
+) -> List[Tuple[int, float]]:
+    """Pick `top_n` candidates by relevance and diversity.
+
+    Relevance blends the cosine similarity to the query with the BM25 score
+    of the query terms (scaled to [0, 1] by the best candidate). Candidates
+    are then chosen greedily with maximal marginal relevance against the
+    chunks already picked. Returns (candidate index, relevance) pairs in
+    pick order.
+    """
+    if not len(texts) or top_n <= 0:
+        return []
+    matrix = normalize_rows(np.asarray(vectors, dtype=np.float32))
+    query_unit = normalize_rows(np.asarray(query_vector, dtype=np.float32))
+    cosine = matrix @ query_unit
+    lexical = bm25_overlap(query, texts)
+    if lexical.max() > 0:
+        lexical = lexical / lexical.max()
+    relevance = weights.cosine * cosine + weights.bm25 * lexical
+
+    similarity = matrix @ matrix.T
+    redundancy = np.zeros(len(texts), dtype=np.float32)
+    available = np.ones(len(texts), dtype=bool)
+    picked = []
+    for _ in range(min(top_n, len(texts))):
+        gain = weights.mmr_lambda * relevance - (1 - weights.mmr_lambda) * redundancy
+        gain[~available] = -math.inf
+        best = int(np.argmax(gain))
+        picked.append((best, float(relevance[best])))
+        available[best] = False
+        redundancy = np.maximum(redundancy, similarity[best])
+    return picked
@@ -0,0 +1,80 @@
+import os
+import json
+import time
+from typing import Any, List, Optional, Union
+from src.config.monitoring import observe_stream_ttfb
+
+# Buffer message text up to this many bytes or milliseconds, 0 turns a limit
+# off; with both at 0 every model chunk is sent as soon as it arrives
+SSE_FLUSH_BYTES = int(os.getenv("SSE_FLUSH_BYTES", "0"))
+SSE_FLUSH_INTERVAL = float(os.getenv("SSE_FLUSH_INTERVAL_MS", "0")) / 1000
+
+
+class SSEEncoder:
+    """Frame stream events as Server-Sent Events.
+
+    Message text is buffered and sent as one `message` event once the buffer
+    reaches `flush_bytes` or `flush_interval` seconds have passed since the
+    last flush; a limit of 0 is ignored and with both at 0 nothing is
+    buffered. Other events, errors included, flush the buffer first so
+    ordering is kept.
+    """
+
+    def __init__(
+        self,
+        endpoint: str,
+        flush_bytes: int = SSE_FLUSH_BYTES,
+        flush_interval: float = SSE_FLUSH_INTERVAL,
+        started_at: Optional[float] = None,
+    ):
+        self.endpoint = endpoint
+        self.flush_bytes = flush_bytes
+        self.flush_interval = flush_interval
+        self.started_at = started_at or time.time()
+        self._last_flush = time.time()
+        self._buffer: List[str] = []
+        self._buffer_bytes = 0
+        self._first_byte_sent = False
+
+    def frame(self, payload: dict) -> str:
+        """Encode a single event with `data:` framing."""
+        if not self._first_byte_sent:
+            self._first_byte_sent = True
+            observe_stream_ttfb(self.endpoint, time.time() - self.started_at)
+        return f"data: {json.dumps(payload, ensure_ascii=False)}\n\n"
+
+    def push(self, content: Union[str, List[Any]]) -> List[str]:
+        """Buffer message content and return the frames that are ready to send."""
+        if not isinstance(content, str):
+            # Multi-part content (e.g. thinking blocks) is forwarded part by part
+            frames = self.flush()
+            for part in content:
+                frames.append(self.frame({"type": "message", "content": part}))
+            return frames
+        if not content:
+            return []
+        self._buffer.append(content)
+        self._buffer_bytes += len(content.encode("utf-8"))
+        if self.flush_bytes <= 0 and self.flush_interval <= 0:
+            return self.flush()
+        # A threshold left at 0 is off, so either setting can be used alone
+        if (self.flush_bytes > 0 and self._buffer_bytes >= self.flush_bytes) or (
+            self.flush_interval > 0
+            and time.time() - self._last_flush >= self.flush_interval
+        ):
+            return self.flush()
+        return []
+
+    def flush(self) -> List[str]:
+        """Send whatever message content is still buffered."""
+        self._last_flush = time.time()
+        if not self._buffer:
+            return []
+        content = "".join(self._buffer)
+        self._buffer = []
+        self._buffer_bytes = 0
+        return [self.frame({"type": "message", "content": content})]
+
+    def event(self, payload: dict) -> List[str]:
+        """Flush buffered content, then encode a non-message event."""
+        return self.flush() + [self.frame(payload)]
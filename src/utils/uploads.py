@@ -0,0 +1,285 @@
+import os
+import io
+import shutil
+import asyncio
+import hashlib
+import zipfile
+import tempfile
+from dataclasses import dataclass
+from typing import BinaryIO, Iterable, List, Optional, Tuple
+from fastapi import UploadFile
+
+# Uploads up to this size stay in memory, larger ones are streamed to disk
+UPLOAD_MEMORY_THRESHOLD = int(os.getenv("UPLOAD_MEMORY_THRESHOLD", str(1 << 20)))
+UPLOAD_BUFFER_SIZE = int(os.getenv("UPLOAD_BUFFER_SIZE", str(1 << 20)))
+UPLOAD_MAX_FILE_SIZE = int(os.getenv("UPLOAD_MAX_FILE_SIZE", str(50 << 20)))
+ARCHIVE_EXTENSIONS = (".zip",)
+
+
+def format_mb(size: int) -> str:
+    return f"{size / 1024 / 1024:.2f}MB"
+
+
+class UploadTooLarge(Exception):
+    """Raised as soon as an upload goes over its per-file or total limit.
+
+    `filename` is set when a single file went over its own limit.
+    """
+
+    def __init__(self, message: str, filename: Optional[str] = None):
+        super().__init__(message)
+        self.filename = filename
+
+
+class UploadBudget:
+    """Total size, and optionally number of files, allowed in one request."""
+
+    def __init__(self, limit: Optional[int], max_files: Optional[int] = None):
+        self.limit = limit
+        self.used = 0
+        self.max_files = max_files
+        self.files = 0
+
+    @property
+    def exhausted(self) -> bool:
+        return self.limit is not None and self.used > self.limit
+
+    def consume(self, size: int) -> None:
+        self.used += size
+        if self.exhausted:
+            # Reading stops here, so the size reported is what was read so far
+            raise UploadTooLarge(
+                f"Total upload size ({format_mb(self.used)}) exceeds limit "
+                f"({format_mb(self.limit)})"
+            )
+
+    def add_file(self) -> None:
+        """Count a file about to be received, before any of it is read."""
+        self.files += 1
+        if self.max_files is not None and self.files > self.max_files:
+            raise UploadTooLarge(f"More than {self.max_files} files in one upload")
+
+
+@dataclass
+class StoredUpload:
+    """An upload read once: its bytes in memory or a spooled file, plus size and sha256."""
+
+    filename: str
+    size: int
+    sha256: str
+    data: Optional[bytes] = None
+    path: Optional[str] = None
+
+    def open(self) -> BinaryIO:
+        return io.BytesIO(self.data) if self.path is None else open(self.path, "rb")
+
+    def read(self) -> bytes:
+        if self.path is None:
+            return self.data
+        with open(self.path, "rb") as f:
+            return f.read()
+
+    def save(self, destination: str) -> str:
+        """Write the upload to `destination`, moving the spooled file when there is one."""
+        os.makedirs(os.path.dirname(destination) or ".", exist_ok=True)
+        if self.path is None:
+            with open(destination, "wb") as f:
+                f.write(self.data)
+        else:
+            shutil.move(self.path, destination)
+            self.path = None
+            self.data = None
+        return destination
+
+    def cleanup(self) -> None:
+        if self.path is not None and os.path.exists(self.path):
+            os.remove(self.path)
+        self.path = None
+        self.data = None
+
+
+def receive(
+    source: BinaryIO,
+    filename: str,
+    max_size: Optional[int] = UPLOAD_MAX_FILE_SIZE,
+    budget: Optional[UploadBudget] = None,
+    memory_threshold: int = UPLOAD_MEMORY_THRESHOLD,
+) -> StoredUpload:
+    """Copy `source` in one pass, hashing it and stopping at the first limit exceeded."""
+    digest, size = hashlib.sha256(), 0
+    buffer, spool, path = bytearray(), None, None
+    try:
+        while chunk := source.read(UPLOAD_BUFFER_SIZE):
+            size += len(chunk)
+            if max_size is not None and size > max_size:
+                raise UploadTooLarge(
+                    f"File {filename} exceeds individual size limit "
+                    f"({format_mb(max_size)})",
+                    filename,
+                )
+            if budget is not None:
+                budget.consume(len(chunk))
+            digest.update(chunk)
+            if spool is None and len(buffer) + len(chunk) > memory_threshold:
+                fd, path = tempfile.mkstemp(suffix=os.path.splitext(filename)[1])
+                spool = os.fdopen(fd, "wb", buffering=UPLOAD_BUFFER_SIZE)
+                spool.write(buffer)
+                buffer = None
+            if spool is None:
+                buffer += chunk
+            else:
+                spool.write(chunk)
+    except BaseException:
+        if spool is not None:
+            spool.close()
+            os.remove(path)
+        raise
+    if spool is not None:
+        spool.close()
+        return StoredUpload(filename, size, digest.hexdigest(), path=path)
+    return StoredUpload(filename, size, digest.hexdigest(), data=bytes(buffer))
+
+
+async def receive_upload(
+    file: UploadFile,
+    max_size: Optional[int] = UPLOAD_MAX_FILE_SIZE,
+    budget: Optional[UploadBudget] = None,
+    memory_threshold: int = UPLOAD_MEMORY_THRESHOLD,
+) -> StoredUpload:
+    return await asyncio.to_thread(
+        receive, file.file, file.filename, max_size, budget, memory_threshold
+    )
+
+
+async def receive_uploads(
+    files: List[UploadFile],
+    max_file_size: Optional[int] = UPLOAD_MAX_FILE_SIZE,
+    max_total_size: Optional[int] = None,
+) -> List[StoredUpload]:
+    """Receive several uploads against a shared total limit, cleaning up on failure."""
+    budget = UploadBudget(max_total_size)
+    uploads = []
+    try:
+        for file in files:
+            uploads.append(await receive_upload(file, max_file_size, budget))
+    except BaseException:
+        for upload in uploads:
+            upload.cleanup()
+        raise
+    return uploads
+
+
+def expand_zip(
+    archive_upload: StoredUpload,
+    extensions: Iterable[str],
+    max_file_size: Optional[int],
+    budget: UploadBudget,
+) -> Tuple[List[StoredUpload], List[Tuple[str, str]]]:
+    """Stream the entries of a zip upload one at a time, without extracting it.
+
+    Returns the entries received, spooled to disk, and the (name, reason)
+    of those skipped. Every entry counts against `budget` as it is reached,
+    its uncompressed bytes included, so an archive cannot expand past the
+    request's file or size limits.
+    """
+    uploads, skipped = [], []
+    try:
+        with archive_upload.open() as source, zipfile.ZipFile(source) as archive:
+            for info in archive.infolist():
+                name = info.filename
+                if (
+                    info.is_dir()
+                    or name.startswith("__MACOSX/")
+                    or os.path.basename(name).startswith(".")
+                ):
+                    continue
+                if os.path.splitext(name)[1].lower() not in extensions:
+                    skipped.append((name, "unsupported file type"))
+                    continue
+                if max_file_size is not None and info.file_size > max_file_size:
+                    skipped.append(
+                        (name, f"exceeds size limit ({format_mb(max_file_size)})")
+                    )
+                    continue
+                budget.add_file()
+                try:
+                    with archive.open(info) as entry:
+                        uploads.append(
+                            receive(entry, name, max_file_size, budget, memory_threshold=0)
+                        )
+                except UploadTooLarge as e:
+                    # Declared smaller than it is: skip the entry, not the request
+                    if budget.exhausted:
+                        raise
+                    skipped.append((name, str(e)))
+                except zipfile.BadZipFile:
+                    # e.g. a CRC mismatch, the other entries may still be fine
+                    skipped.append((name, "corrupt archive entry"))
+    except BaseException:
+        for upload in uploads:
+            upload.cleanup()
+        raise
+    return uploads, skipped
+
+
+async def receive_bulk(
+    files: List[UploadFile],
+    extensions: Iterable[str],
+    max_file_size: Optional[int] = UPLOAD_MAX_FILE_SIZE,
+    max_total_size: Optional[int] = None,
+    max_files: Optional[int] = None,
+) -> Tuple[List[StoredUpload], List[Tuple[str, str]]]:
+    """Receive many files, zip archives expanded into their entries.
+
+    Every file is spooled to disk, so memory use does not grow with the
+    request. Unsupported, oversized and duplicate files are skipped with a
+    reason; going over `max_total_size` or `max_files` aborts the whole
+    request as soon as it happens.
+    """
+    extensions = tuple(extensions)
+    budget = UploadBudget(max_total_size, max_files)
+    uploads, skipped = [], []
+    try:
+        for file in files:
+            extension = os.path.splitext(file.filename)[1].lower()
+            if extension in ARCHIVE_EXTENSIONS:
+                archive = await receive_upload(file, max_total_size, memory_threshold=0)
+                try:
+                    entries, archive_skipped = await asyncio.to_thread(
+                        expand_zip, archive, extensions, max_file_size, budget
+                    )
+                except zipfile.BadZipFile:
+                    skipped.append((file.filename, "not a valid zip archive"))
+                    continue
+                finally:
+                    archive.cleanup()
+                uploads.extend(entries)
+                skipped.extend(archive_skipped)
+            elif extension not in extensions:
+                skipped.append((file.filename, "unsupported file type"))
+            else:
+                budget.add_file()
+                try:
+                    uploads.append(
+                        await receive_upload(
+                            file, max_file_size, budget, memory_threshold=0
+                        )
+                    )
+                except UploadTooLarge as e:
+                    if budget.exhausted:
+                        raise
+                    skipped.append((file.filename, str(e)))
+    except BaseException:
+        for upload in uploads:
+            upload.cleanup()
+        raise
+
+    unique, seen = [], set()
+    for upload in uploads:
+        if upload.filename in seen:
+            skipped.append((upload.filename, "duplicate file name"))
+            upload.cleanup()
+        else:
+            seen.add(upload.filename)
+            unique.append(upload)
+    return unique, skipped
@@ -0,0 +1,33 @@
+import os
+import tempfile
+import pytest
+
+# Importing the vector store builds the Gemini clients and the default store
+os.environ.setdefault("GOOGLE_API_KEY", "test")
+os.environ.setdefault("VECTOR_STORE_BACKEND", "local")
+os.environ.setdefault("LOCAL_VECTOR_STORE_DIR", tempfile.mkdtemp())
+
+# Manual scripts that call the agents and wait for input
+collect_ignore = [
+    "test.py",
+    "test_react_agent.py",
+    "test_analyze_agent.py",
+    "test_primary_chatbot.py",
+    "preprocessing_data.py",
+]
+
+
+def _bulk_write(self, requests, ordered=True, **kwargs):
+    # mongomock does not understand the bulk operations of recent pymongo versions
+    for request in requests:
+        self.update_one(request._filter, request._doc, upsert=request._upsert)
+
+
+@pytest.fixture
+def database(monkeypatch):
+    """In-memory Mongo database with the motor API."""
+    mongomock_motor = pytest.importorskip("mongomock_motor")
+    from mongomock.collection import Collection
+
+    monkeypatch.setattr(Collection, "bulk_write", _bulk_write)
+    return mongomock_motor.AsyncMongoMockClient()["test"]
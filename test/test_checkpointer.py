@@ -0,0 +1,82 @@
+import asyncio
+from langgraph.checkpoint.base import create_checkpoint, empty_checkpoint
+from src.config.checkpointer import MongoCheckpointSaver
+
+
+def make_saver(database, **kwargs) -> MongoCheckpointSaver:
+    return MongoCheckpointSaver(
+        database["checkpoints"], database["checkpoint_writes"], **kwargs
+    )
+
+
+def thread(checkpoint_id=None) -> dict:
+    configurable = {"thread_id": "agent:user:1", "checkpoint_ns": ""}
+    if checkpoint_id:
+        configurable["checkpoint_id"] = checkpoint_id
+    return {"configurable": configurable}
+
+
+def test_savers_sharing_collections_see_each_others_writes(database):
+    async def main():
+        first, second = make_saver(database), make_saver(database)
+        checkpoint = empty_checkpoint()
+        config = await first.aput(thread(), checkpoint, {"step": 0}, {})
+        loaded = await second.aget_tuple(thread())
+        assert loaded.checkpoint["id"] == checkpoint["id"]
+        assert loaded.metadata["step"] == 0
+
+        # Cached by the second saver, then written to through the first one
+        await first.aput_writes(config, [("messages", "hello")], "task")
+        loaded = await second.aget_tuple(thread())
+        assert loaded.pending_writes == [("task", "messages", "hello")]
+
+        following = create_checkpoint(checkpoint, None, 1)
+        await first.aput(config, following, {"step": 1}, {})
+        loaded = await second.aget_tuple(thread())
+        assert loaded.checkpoint["id"] == following["id"]
+        assert loaded.parent_config == config
+        assert loaded.pending_writes == []
+
+        await first.adelete_thread("agent:user:1")
+        assert await second.aget_tuple(thread()) is None
+
+    asyncio.run(main())
+
+
+def test_reads_a_given_checkpoint_and_lists_history(database):
+    async def main():
+        saver = make_saver(database)
+        checkpoint = empty_checkpoint()
+        config = await saver.aput(thread(), checkpoint, {"step": 0}, {})
+        following = create_checkpoint(checkpoint, None, 1)
+        await saver.aput(config, following, {"step": 1}, {})
+
+        loaded = await saver.aget_tuple(thread(checkpoint["id"]))
+        assert loaded.checkpoint["id"] == checkpoint["id"]
+        history = [item async for item in saver.alist(thread())]
+        assert [item.metadata["step"] for item in history] == [1, 0]
+        history = [item async for item in saver.alist(thread(), filter={"step": 0})]
+        assert [item.checkpoint["id"] for item in history] == [checkpoint["id"]]
+
+    asyncio.run(main())
+
+
+def test_hot_tier_is_bounded_by_bytes(database):
+    async def main():
+        saver = make_saver(database, cache_bytes=4096)
+        for index in range(20):
+            checkpoint = empty_checkpoint()
+            checkpoint["channel_values"] = {"messages": "x" * 1000}
+            await saver.aput(
+                {"configurable": {"thread_id": str(index), "checkpoint_ns": ""}},
+                checkpoint,
+                {},
+                {},
+            )
+        assert 0 < len(saver.hot) < 20
+        assert saver.hot.bytes <= 4096
+        # Evicted threads are read back from the database
+        loaded = await saver.aget_tuple({"configurable": {"thread_id": "0"}})
+        assert loaded.checkpoint["channel_values"] == {"messages": "x" * 1000}
+
+    asyncio.run(main())
@@ -0,0 +1,165 @@
+import io
+import os
+import asyncio
+from datetime import timedelta
+from src.config.ingestion_jobs import IngestionJobQueue, _now
+from src.utils.uploads import receive
+
+
+def make_queue(database, tmp_path, **kwargs) -> IngestionJobQueue:
+    options = dict(
+        spool_dir=str(tmp_path),
+        workers=1,
+        poll_seconds=0.05,
+        retry_seconds=0,
+        lease_seconds=3,
+    )
+    options.update(kwargs)
+    return IngestionJobQueue(database["ingestion_jobs"], **options)
+
+
+def upload(name: str, data: bytes = b"content"):
+    return receive(io.BytesIO(data), name)
+
+
+async def wait_for(queue: IngestionJobQueue, job_id: str, *statuses: str) -> dict:
+    for _ in range(100):
+        job = await queue.get(job_id)
+        if job["status"] in statuses:
+            return job
+        await asyncio.sleep(0.02)
+    raise AssertionError(f"job stayed {job['status']}")
+
+
+async def succeed(job, progress):
+    await progress.stage("embedding", chunks_total=2)
+    await progress.chunks(2, 2)
+    return {"chunks_total": 2}
+
+
+def test_resubmitting_an_upload_returns_its_job(database, tmp_path):
+    async def main():
+        queue = make_queue(database, tmp_path)
+        first = await queue.submit("bot", "user", upload("a.txt"))
+        second = await queue.submit("bot", "user", upload("a.txt"))
+        other = await queue.submit("bot", "user", upload("a.txt", b"changed"))
+        assert first["_id"] == second["_id"] != other["_id"]
+        assert first["host"] == queue.host
+        assert await database["ingestion_jobs"].count_documents({}) == 2
+
+    asyncio.run(main())
+
+
+def test_claimed_job_runs_and_removes_its_spool(database, tmp_path):
+    async def main():
+        queue = make_queue(database, tmp_path)
+        job = await queue.submit("bot", "user", upload("a.txt"))
+        assert os.path.exists(job["spool_path"])
+        queue.start(succeed)
+        job = await wait_for(queue, job["_id"], "succeeded")
+        await queue.stop()
+        assert job["attempts"] == 1
+        assert job["chunks_processed"] == 2
+        assert job["worker"] is None and job["finished_at"] is not None
+        assert not os.path.exists(job["spool_path"])
+
+    asyncio.run(main())
+
+
+def test_failed_attempt_is_retried_until_it_succeeds(database, tmp_path):
+    calls = []
+
+    async def flaky(job, progress):
+        calls.append(job["attempts"])
+        if job["attempts"] < 2:
+            raise RuntimeError("embedding service unavailable")
+        return await succeed(job, progress)
+
+    async def main():
+        queue = make_queue(database, tmp_path)
+        job = await queue.submit("bot", "user", upload("a.txt"))
+        queue.start(flaky)
+        job = await wait_for(queue, job["_id"], "succeeded")
+        await queue.stop()
+        assert calls == [1, 2]
+        assert job["error"] is None
+
+    asyncio.run(main())
+
+
+def test_bad_input_fails_without_retry(database, tmp_path):
+    async def invalid(job, progress):
+        raise ValueError("unsupported file")
+
+    async def main():
+        queue = make_queue(database, tmp_path)
+        job = await queue.submit("bot", "user", upload("a.txt"))
+        queue.start(invalid)
+        job = await wait_for(queue, job["_id"], "failed")
+        await queue.stop()
+        assert job["attempts"] == 1
+        assert job["error"] == "unsupported file"
+
+    asyncio.run(main())
+
+
+def test_expired_lease_is_claimed_again(database, tmp_path):
+    async def main():
+        queue = make_queue(database, tmp_path)
+        job = await queue.submit("bot", "user", upload("a.txt"))
+        # A worker that crashed mid-run stops renewing its lease
+        await database["ingestion_jobs"].update_one(
+            {"_id": job["_id"]},
+            {
+                "$set": {
+                    "status": "running",
+                    "worker": "crashed",
+                    "attempts": 1,
+                    "lease_until": _now() - timedelta(seconds=1),
+                }
+            },
+        )
+        queue.start(succeed)
+        job = await wait_for(queue, job["_id"], "succeeded")
+        await queue.stop()
+        assert job["attempts"] == 2
+
+    asyncio.run(main())
+
+
+def test_lost_lease_stops_the_handler_and_keeps_the_spool(database, tmp_path):
+    reached = []
+
+    async def stolen(job, progress):
+        await database["ingestion_jobs"].update_one(
+            {"_id": job["_id"]}, {"$set": {"worker": "other"}}
+        )
+        await progress.chunks(1, 2)
+        reached.append(True)
+        return {}
+
+    async def main():
+        queue = make_queue(database, tmp_path)
+        job = await queue.submit("bot", "user", upload("a.txt"))
+        queue.start(stolen)
+        await asyncio.sleep(0.3)
+        await queue.stop()
+        job = await queue.get(job["_id"])
+        assert not reached
+        assert job["status"] == "running" and job["worker"] == "other"
+        assert os.path.exists(job["spool_path"])
+
+    asyncio.run(main())
+
+
+def test_jobs_of_another_host_are_not_claimed(database, tmp_path):
+    async def main():
+        other = make_queue(database, tmp_path / "other", host="other")
+        job = await other.submit("bot", "user", upload("a.txt"))
+        queue = make_queue(database, tmp_path)
+        queue.start(succeed)
+        await asyncio.sleep(0.2)
+        await queue.stop()
+        assert (await queue.get(job["_id"]))["status"] == "queued"
+
+    asyncio.run(main())
@@ -0,0 +1,129 @@
+import asyncio
+import threading
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from src.config.chunk_registry import ChunkRegistry
+from src.config.chunk_store import LocalChunkTextStore
+from src.config.lexical_index import LexicalIndexStore
+from src.config.local_vector_store import LocalVectorStore
+from src.config.vector_store import PineconeVectorStoreCRUD
+
+
+class ConstantEmbeddings(Embeddings):
+    def embed_documents(self, texts):
+        return [[1.0, 0.0] for _ in texts]
+
+    def embed_query(self, text):
+        return [1.0, 0.0]
+
+
+def documents(*texts, bot_id="bot"):
+    return [Document(page_content=text, metadata={"bot_id": bot_id}) for text in texts]
+
+
+def log_lines(store: LexicalIndexStore, bot_id: str) -> int:
+    with open(store._bot(bot_id).path, encoding="utf-8") as f:
+        return sum(1 for _ in f)
+
+
+def test_search_returns_chunk_ids_above_the_floor(tmp_path):
+    store = LexicalIndexStore(str(tmp_path))
+    store.add_documents(
+        "bot",
+        documents("học phí kỳ một", "lịch thi kỳ hai", "hoc phi ky ba"),
+        ["1", "2", "3"],
+    )
+    hits = store.search("bot", "học phí", k=5)
+    assert [doc_id for doc_id, _ in hits] == ["1", "3"]
+    assert store.search("bot", "kỳ", k=5, min_score=5.0) == []
+    store.delete_documents("bot", ["1"])
+    assert [doc_id for doc_id, _ in store.search("bot", "học phí")] == ["3"]
+    assert store.search("other", "học phí") == []
+
+
+def test_changes_are_appended_and_compacted(tmp_path):
+    store = LexicalIndexStore(str(tmp_path))
+    ids = [str(i) for i in range(20)]
+    store.add_documents("bot", documents(*(f"chunk {i}" for i in ids)), ids)
+    assert log_lines(store, "bot") == 21
+    store.delete_documents("bot", ids[:2])
+    assert log_lines(store, "bot") == 23
+    # Over 30% of the records dead: the log is rewritten with the live chunks
+    store.delete_documents("bot", ids[2:6])
+    assert log_lines(store, "bot") == 15
+    assert store.ids("bot") == set(ids[6:])
+
+
+def test_stores_sharing_a_directory_see_each_others_changes(tmp_path):
+    first = LexicalIndexStore(str(tmp_path))
+    second = LexicalIndexStore(str(tmp_path))
+    first.add_documents("bot", documents("alpha beta", "gamma delta"), ["1", "2"])
+    hits = second.search("bot", "gamma", min_score=0)
+    assert [doc_id for doc_id, _ in hits] == ["2"]
+
+    second.delete_documents("bot", ["1", "2"])
+    second.add_documents("bot", documents("alpha omega"), ["3"])
+    hits = first.search("bot", "alpha", min_score=0)
+    assert [doc_id for doc_id, _ in hits] == ["3"]
+
+    first.drop("bot")
+    assert second.ids("bot") == set()
+
+
+def test_concurrent_writers_keep_every_change(tmp_path):
+    stores = [LexicalIndexStore(str(tmp_path)) for _ in range(2)]
+
+    def write(worker: int):
+        store = stores[worker % 2]
+        for i in range(30):
+            store.add_documents("bot", documents(f"w{worker}x{i}"), [f"{worker}-{i}"])
+            if i % 3 == 2:
+                store.delete_documents("bot", [f"{worker}-{i - 1}"])
+
+    threads = [threading.Thread(target=write, args=(worker,)) for worker in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    expected = {
+        f"{worker}-{i}" for worker in range(4) for i in range(30) if i % 3 != 1
+    }
+    assert stores[0].ids("bot") == stores[1].ids("bot") == expected
+    assert LexicalIndexStore(str(tmp_path)).ids("bot") == expected
+
+
+def test_lexical_search_resolves_text_and_backfills_legacy_chunks(database, tmp_path):
+    def make_crud(lexical_store):
+        return PineconeVectorStoreCRUD(
+            "test",
+            ConstantEmbeddings(),
+            "",
+            retrieval_mode="lexical",
+            vector_store=LocalVectorStore(
+                ConstantEmbeddings(), "test", directory=str(tmp_path / "vectors")
+            ),
+            lexical_store=lexical_store,
+            registry=ChunkRegistry(database["chunks"]),
+            text_store=LocalChunkTextStore(str(tmp_path / "texts")),
+        )
+
+    async def main():
+        lexical_store = LexicalIndexStore(str(tmp_path / "lexical"))
+        crud = make_crud(lexical_store)
+        await crud.add_documents(
+            documents("học phí kỳ một", "lịch thi kỳ hai"), ["1", "2"]
+        )
+        found = await crud.search("học phí", filter={"bot_id": "bot"})
+        # The lexical index only holds ids, the text comes from the text store
+        assert [(doc.id, doc.page_content) for doc in found] == [
+            ("1", "học phí kỳ một")
+        ]
+
+        # Chunks indexed before the lexical index existed
+        lexical_store.drop("bot")
+        crud = make_crud(lexical_store)
+        found = await crud.search("lịch thi", filter={"bot_id": "bot"})
+        assert [doc.id for doc in found] == ["2"]
+        assert lexical_store.ids("bot") == {"1", "2"}
+
+    asyncio.run(main())
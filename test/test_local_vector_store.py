@@ -0,0 +1,92 @@
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from src.config.local_vector_store import LocalVectorStore, match_filter
+
+
+class KeywordEmbeddings(Embeddings):
+    """One dimension per keyword, enough to tell the test documents apart."""
+
+    keywords = ("cat", "dog", "bird", "fish")
+
+    def embed_documents(self, texts):
+        return [self.embed_query(text) for text in texts]
+
+    def embed_query(self, text):
+        return [float(keyword in text) + 0.01 for keyword in self.keywords]
+
+
+def make_store(tmp_path) -> LocalVectorStore:
+    return LocalVectorStore(KeywordEmbeddings(), "test", directory=str(tmp_path))
+
+
+def test_search_stays_within_the_bot_partition(tmp_path):
+    store = make_store(tmp_path)
+    store.add_texts(
+        ["a cat", "a dog", "a cat again"],
+        [{"bot_id": "a"}, {"bot_id": "a"}, {"bot_id": "b"}],
+        ids=["1", "2", "3"],
+    )
+    results = store.similarity_search_with_score("cat", k=5, filter={"bot_id": "a"})
+    assert [doc.id for doc, _ in results] == ["1", "2"]
+    assert results[0][1] > results[1][1]
+    assert {doc.id for doc in store.similarity_search("cat", k=2)} == {"1", "3"}
+
+
+def test_get_and_delete_by_id_only_touch_the_given_bot(tmp_path):
+    store = make_store(tmp_path)
+    store.add_texts(["a cat"], [{"bot_id": "a"}], ids=["1"])
+    store.add_texts(["a dog"], [{"bot_id": "b"}], ids=["2"])
+    assert store.get_by_ids(["1", "2"], bot_id="a")[0].id == "1"
+    assert len(store.get_by_ids(["1", "2"], bot_id="a")) == 1
+    assert not store.delete(["2"], bot_id="a")
+    assert store.delete(["2"], bot_id="b")
+    assert [doc.id for doc in store.get_by_ids(["1", "2"])] == ["1"]
+
+
+def test_rewrites_and_deletes_survive_compaction_and_reload(tmp_path):
+    store = make_store(tmp_path)
+    ids = [str(i) for i in range(10)]
+    store.add_texts(["a cat"] * 10, [{"bot_id": "a"}] * 10, ids=ids)
+    store.add_texts(["a dog"], [{"bot_id": "a"}], ids=["0"])
+    partition = store.partition("a")
+    assert isinstance(partition.alive, np.ndarray)
+    assert partition.size == 10 and len(partition.records) == 11
+    # Deleting a third of the rows compacts the partition
+    store.delete(ids[1:5], bot_id="a")
+    assert len(partition.records) == partition.size == 6
+
+    reloaded = make_store(tmp_path)
+    assert reloaded.partition("a").size == 6
+    assert reloaded.get_by_ids(["0"], bot_id="a")[0].page_content == "a dog"
+    best = reloaded.similarity_search("dog", k=1, filter={"bot_id": "a"})
+    assert best[0].id == "0"
+
+
+def test_stores_sharing_a_directory_see_each_others_changes(tmp_path):
+    first, second = make_store(tmp_path), make_store(tmp_path)
+    first.add_texts(["a cat", "a dog"], [{"bot_id": "a"}] * 2, ids=["1", "2"])
+    assert second.partition("a").ids() == ["1", "2"]
+
+    second.add_texts(["a bird"], [{"bot_id": "a"}], ids=["3"])
+    second.delete(["1"], bot_id="a")
+    assert first.partition("a").ids() == ["2", "3"]
+    assert first.similarity_search("bird", k=1, filter={"bot_id": "a"})[0].id == "3"
+
+    # A compaction by one store is picked up by the other
+    first.partition("a").compact()
+    second.add_texts(["a fish"], [{"bot_id": "a"}], ids=["4"])
+    assert first.similarity_search("fish", k=1, filter={"bot_id": "a"})[0].id == "4"
+    assert first.partition("a").ids() == second.partition("a").ids() == ["2", "3", "4"]
+
+    first.drop_partition("a")
+    assert second.partition("a").ids() == []
+
+
+def test_match_filter_operators():
+    metadata = {"source": "a.pdf", "page": 3}
+    assert match_filter(metadata, {"source": "a.pdf", "page": {"$gte": 3}})
+    assert match_filter(
+        metadata, {"$or": [{"page": 1}, {"source": {"$in": ["a.pdf"]}}]}
+    )
+    assert not match_filter(metadata, {"page": {"$lt": 3}})
+    assert not match_filter(metadata, {"source": {"$nin": ["a.pdf"]}})
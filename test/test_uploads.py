@@ -0,0 +1,93 @@
+import io
+import os
+import asyncio
+import hashlib
+import zipfile
+import pytest
+from fastapi import UploadFile
+from src.utils.uploads import (
+    UploadBudget,
+    UploadTooLarge,
+    receive,
+    receive_bulk,
+    receive_uploads,
+)
+
+
+def upload_file(name: str, data: bytes) -> UploadFile:
+    return UploadFile(file=io.BytesIO(data), filename=name)
+
+
+def archive(entries: dict) -> bytes:
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as zip_file:
+        for name, data in entries.items():
+            zip_file.writestr(name, data)
+    return buffer.getvalue()
+
+
+def test_receive_hashes_and_spools_large_uploads():
+    data = b"x" * 100
+    small = receive(io.BytesIO(data), "a.txt", memory_threshold=1000)
+    large = receive(io.BytesIO(data), "a.txt", memory_threshold=10)
+    assert small.sha256 == large.sha256 == hashlib.sha256(data).hexdigest()
+    assert small.size == large.size == 100
+    assert small.path is None and os.path.exists(large.path)
+    assert large.read() == data
+    large.cleanup()
+
+
+def test_file_over_its_limit_is_rejected_with_its_name():
+    with pytest.raises(UploadTooLarge) as error:
+        receive(io.BytesIO(b"x" * 11), "big.txt", max_size=10)
+    assert error.value.filename == "big.txt"
+
+
+def test_total_limit_applies_across_files():
+    files = [upload_file("a.txt", b"x" * 6), upload_file("b.txt", b"y" * 6)]
+    with pytest.raises(UploadTooLarge) as error:
+        asyncio.run(receive_uploads(files, max_file_size=10, max_total_size=10))
+    assert error.value.filename is None
+
+
+def test_budget_counts_files():
+    budget = UploadBudget(None, max_files=1)
+    budget.add_file()
+    with pytest.raises(UploadTooLarge):
+        budget.add_file()
+
+
+def test_bulk_skips_bad_files_and_expands_archives():
+    files = [
+        upload_file("a.txt", b"a"),
+        upload_file("a.exe", b"b"),
+        upload_file("big.txt", b"x" * 20),
+        upload_file(
+            "docs.zip", archive({"c.txt": b"c", "a.txt": b"again", "d.bin": b"d"})
+        ),
+    ]
+    uploads, skipped = asyncio.run(
+        receive_bulk(files, (".txt",), max_file_size=10, max_total_size=10_000)
+    )
+    assert [upload.filename for upload in uploads] == ["a.txt", "c.txt"]
+    assert {name for name, _ in skipped} == {"a.exe", "big.txt", "d.bin", "a.txt"}
+    assert all(upload.path for upload in uploads)
+    for upload in uploads:
+        upload.cleanup()
+
+
+def test_bulk_archive_entries_count_against_the_limits():
+    many = archive({f"{i}.txt": b"x" for i in range(5)})
+    with pytest.raises(UploadTooLarge):
+        asyncio.run(
+            receive_bulk([upload_file("docs.zip", many)], (".txt",), max_files=3)
+        )
+    # Small once compressed, over the total limit once expanded
+    large = archive({f"{i}.txt": b"x" * 1000 for i in range(5)})
+    assert len(large) < 2000
+    with pytest.raises(UploadTooLarge):
+        asyncio.run(
+            receive_bulk(
+                [upload_file("docs.zip", large)], (".txt",), max_total_size=2000
+            )
+        )